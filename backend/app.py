@@ -24,6 +24,7 @@ from backend.config import (
     RESULTS_DIR
 )
 from backend.backtest.engine import run_backtest, preview_strategy
+from backend.backtest.screener import screen_universe
 from backend.backtest.data_source import DataSource
 
 app = Flask(__name__)
@@ -392,6 +393,45 @@ def get_bars(symbol):
         }), 500
 
 
+# ============================================
+# Screener Endpoints
+# ============================================
+
+@app.route('/api/screener/run', methods=['POST'])
+def run_screener():
+    """
+    Screen a watchlist (or spy503.csv) with entry-style conditions
+    Body: conditions, logic ('all'|'any'), tickers (optional), indicators (optional),
+          end_date (optional, default today), lookback_days (optional)
+    Returns the tickers whose latest bar fires
+    """
+    try:
+        config = request.get_json()
+        
+        if not config or not config.get('conditions'):
+            return jsonify({'error': 'conditions required'}), 400
+        
+        result = screen_universe(
+            conditions=config['conditions'],
+            tickers=config.get('tickers'),
+            logic=config.get('logic', 'all'),
+            indicators_config=config.get('indicators', {}),
+            end_date=config.get('end_date'),
+            lookback_days=int(config.get('lookback_days', 400))
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': result
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 # ============================================
 # Results/Tearsheet File Serving
 # ============================================
@@ -82,6 +82,29 @@ class DataSource:
         
         return out
     
+    def load_panel(self, symbols: list[str], start: str, end: str) -> pd.DataFrame:
+        """
+        Load OHLCV data for many symbols as one panel, reading each day file once.
+        
+        Args:
+            symbols: List of ticker symbols
+            start: Start date 'YYYY-MM-DD'
+            end: End date 'YYYY-MM-DD'
+            
+        Returns:
+            DataFrame with DatetimeIndex and (field, symbol) columns: panel['Close'] is
+            dates x symbols. Symbols without any bar are left out; gaps stay NaN
+        """
+        panel = self.flatfiles.get_daily_panel(symbols, start, end)
+        if panel.empty:
+            raise ValueError("No data loaded for any symbols")
+        
+        # One block per field, so panel['Close'] is a single dates x symbols array
+        panel = pd.concat({field: panel[field].astype("float64" if field == "Volume" else "float32")
+                           for field in OHLCV}, axis=1)
+        print(f"[DATA] Loaded {len(panel)} bars for {panel['Close'].shape[1]} of {len(symbols)} symbols")
+        return panel
+    
     def get_data(self, symbol: str, start: str = None, end: str = None) -> pd.DataFrame:
         """
         Load data for a single symbol.
@@ -108,3 +131,7 @@ def load_bars(symbols: list[str], start: str, end: str) -> dict[str, pd.DataFram
 def get_data(symbol: str, start: str = None, end: str = None) -> pd.DataFrame:
     """Load data for single symbol"""
     return _data_source.get_data(symbol, start, end)
+
+def load_panel(symbols: list[str], start: str, end: str) -> pd.DataFrame:
+    """Load a (field, symbol) panel for many symbols"""
+    return _data_source.load_panel(symbols, start, end)
@@ -7,7 +7,7 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Any, Optional
 from .data_source import load_bars
-from .indicators import Indicators
+from .planner import IndicatorPlan
 from .signals import SignalEvaluator, build_signals_from_config
 from .metrics import kpis_from_equity
 
@@ -59,11 +59,16 @@ class BacktestEngine:
         
         # Calculate indicators
         indicators_config = self.config.get('indicators', {})
-        indicators = Indicators.calculate_all(df, indicators_config)
-        print(f"[ENGINE] Calculated {len(indicators)} indicators")
+        plan = IndicatorPlan.from_config(indicators_config, self.config.get('entry_conditions', [])
+                                         + self.config.get('exit_conditions', []))
+        planned = plan.evaluate(df)
+        indicators = planned.outputs
+        stats = planned.stats
+        print(f"[ENGINE] Calculated {len(indicators)} indicators "
+              f"({stats['computed']} computations, {stats['saved']} shared)")
         
         # Build signals
-        entry_signal, exit_signal = build_signals_from_config(df, indicators, self.config)
+        entry_signal, exit_signal = build_signals_from_config(df, indicators, self.config, planned)
         print(f"[ENGINE] Entry signals: {entry_signal.sum()}, Exit signals: {exit_signal.sum()}")
         
         # Run simulation
@@ -239,14 +244,15 @@ def preview_strategy(symbol: str, start_date: str, end_date: str,
     df = data[symbol]
     
     # Calculate indicators
-    indicators = Indicators.calculate_all(df, indicators_config)
+    planned = IndicatorPlan.from_config(indicators_config, entry_conditions + exit_conditions).evaluate(df)
+    indicators = planned.outputs
     
     # Build signals
     config = {
         'entry_conditions': entry_conditions,
         'exit_conditions': exit_conditions
     }
-    entry_signal, exit_signal = build_signals_from_config(df, indicators, config)
+    entry_signal, exit_signal = build_signals_from_config(df, indicators, config, planned)
     
     return {
         'df': df,
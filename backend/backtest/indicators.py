@@ -5,11 +5,35 @@ Python implementations matching frontend/modules/indicators/calculations.js exac
 
 import numpy as np
 import pandas as pd
-from typing import Union, Tuple, Dict
+from typing import Union, Tuple, Dict, List
 
 EPS32 = np.finfo(np.float32).eps
 
 
+def _wma_values(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    WMA with weights 1..period (newest bar heaviest) as one convolution.
+    Any NaN inside a window makes that bar NaN; the first period-1 bars are NaN.
+    """
+    out = np.full(len(values), np.nan)
+    if period < 1 or len(values) < period:
+        return out
+    weights = np.arange(period, 0, -1, dtype='float64')  # reversed: convolve flips the kernel
+    out[period - 1:] = np.convolve(values, weights, mode='valid') / weights.sum()
+    return out
+
+
+def _kama_smooth(prices: np.ndarray, sc: np.ndarray) -> list:
+    """KAMA recursion kama[i] = kama[i-1] + sc[i] * (p[i] - kama[i-1]), seeded with p[0]."""
+    p, c = prices.tolist(), sc.tolist()
+    out = [p[0]]
+    k = p[0]
+    for i in range(1, len(p)):
+        k = k + c[i] * (p[i] - k)
+        out.append(k)
+    return out
+
+
 class Indicators:
     """Collection of technical indicator calculations"""
     
@@ -32,15 +56,7 @@ class Indicators:
         """Calculate Weighted Moving Average"""
         if isinstance(prices, np.ndarray):
             prices = pd.Series(prices)
-        
-        weights = np.arange(1, period + 1)
-        
-        def wma_calc(window):
-            if len(window) < period or np.any(np.isnan(window)):
-                return np.nan
-            return np.sum(weights * window) / np.sum(weights)
-        
-        return prices.rolling(window=period, min_periods=period).apply(wma_calc, raw=True)
+        return pd.Series(_wma_values(prices.to_numpy(dtype='float64'), period), index=prices.index)
     
     @staticmethod
     def calculate_hma(prices: Union[pd.Series, np.ndarray], period: int) -> pd.Series:
@@ -50,15 +66,13 @@ class Indicators:
         
         half_period = int(period / 2)
         sqrt_period = int(np.sqrt(period))
-        
-        wma_half = Indicators.calculate_wma(prices, half_period)
-        wma_full = Indicators.calculate_wma(prices, period)
+        values = prices.to_numpy(dtype='float64')
         
         # 2 * WMA(n/2) - WMA(n)
-        raw_hma = 2 * wma_half - wma_full
+        raw_hma = 2 * _wma_values(values, half_period) - _wma_values(values, period)
         
         # Final WMA of sqrt(n)
-        return Indicators.calculate_wma(raw_hma, sqrt_period)
+        return pd.Series(_wma_values(raw_hma, sqrt_period), index=prices.index)
     
     @staticmethod
     def calculate_kama(prices: Union[pd.Series, np.ndarray], period: int = 20, 
@@ -71,31 +85,29 @@ class Indicators:
         n = len(prices_array)
         kama = np.full(n, np.nan)
         
-        if n < period:
+        if n <= period:
             return pd.Series(kama, index=prices.index)
         
         fast_sc = 2 / (fast + 1)
         slow_sc = 2 / (slow + 1)
         
-        for i in range(period, n):
-            # Efficiency ratio
-            change = abs(prices_array[i] - prices_array[i - period])
-            volatility = sum(abs(prices_array[i - j] - prices_array[i - j - 1]) 
-                           for j in range(period))
-            
-            if volatility == 0:
-                er = 0
-            else:
-                er = change / volatility
-            
-            # Smoothing constant
-            sc = (er * (fast_sc - slow_sc) + slow_sc) ** 2
-            
-            # KAMA calculation
-            if i == period:
-                kama[i] = prices_array[i]
-            else:
-                kama[i] = kama[i - 1] + sc * (prices_array[i] - kama[i - 1])
+        # Efficiency ratio for every bar at once: the window's |bar-to-bar moves| are
+        # added one lag at a time, newest first, so each sum rounds like the per-bar loop did
+        moves = np.abs(np.diff(prices_array))
+        volatility = np.zeros(n - period, dtype=moves.dtype)
+        for j in range(period):
+            volatility += moves[period - j - 1:n - j - 1]
+        change = np.abs(prices_array[period:] - prices_array[:n - period])
+        flat = volatility == 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            er = change / volatility
+        
+        # Smoothing constant (a flat window has er = 0)
+        sc = ((er * (fast_sc - slow_sc) + slow_sc) ** 2).astype('float64')
+        sc[flat] = slow_sc ** 2
+        
+        # KAMA calculation (seeded with the price at bar `period`)
+        kama[period:] = _kama_smooth(prices_array[period:], sc)
         
         return pd.Series(kama, index=prices.index)
     
@@ -240,6 +252,65 @@ class Indicators:
         
         return {'macd': macd, 'signal': signal_line, 'histogram': histogram}
     
+    # ---- Multi-period batch API: one price array in, (n_periods x n_bars) array out ----
+    
+    @staticmethod
+    def calculate_sma_batch(prices: Union[pd.Series, np.ndarray], periods: List[int]) -> np.ndarray:
+        """
+        SMA for every period from one cumulative sum
+        A window containing NaN is NaN, like calculate_sma
+        """
+        values = np.asarray(prices, dtype='float64')
+        n = len(values)
+        nans = np.isnan(values)
+        csum = np.concatenate(([0.0], np.cumsum(np.where(nans, 0.0, values))))
+        cnan = np.concatenate(([0], np.cumsum(nans)))
+        out = np.full((len(periods), n), np.nan)
+        for row, period in enumerate(periods):
+            period = int(period)
+            if period < 1 or n < period:
+                continue
+            sma = (csum[period:] - csum[:n + 1 - period]) / period
+            sma[cnan[period:] > cnan[:n + 1 - period]] = np.nan
+            out[row, period - 1:] = sma
+        return out
+    
+    @staticmethod
+    def calculate_ema_batch(prices: Union[pd.Series, np.ndarray], periods: List[int]) -> np.ndarray:
+        """EMA for every period; rows match calculate_ema(prices, period)"""
+        prices = pd.Series(np.asarray(prices, dtype='float64'))
+        return np.array([prices.ewm(span=int(p), adjust=False, min_periods=int(p)).mean().to_numpy()
+                         for p in periods]).reshape(len(periods), len(prices))
+    
+    @staticmethod
+    def calculate_rsi_batch(prices: Union[pd.Series, np.ndarray], periods: List[int]) -> np.ndarray:
+        """
+        Wilder RSI for every period; gains/losses are split once for all periods
+        Rows match calculate_rsi(prices, period)
+        """
+        delta = pd.Series(np.asarray(prices, dtype='float64')).diff()
+        moves = pd.DataFrame({'gains': delta.where(delta > 0, 0), 'losses': -delta.where(delta < 0, 0)})
+        out = np.empty((len(periods), len(delta)))
+        for row, period in enumerate(periods):
+            avg = moves.ewm(alpha=1/period, adjust=False, min_periods=period).mean()
+            rsi = 100 - (100 / (1 + avg['gains'] / avg['losses']))
+            out[row] = rsi.fillna(50).to_numpy()
+        return out
+    
+    @staticmethod
+    def calculate_bb_batch(prices: Union[pd.Series, np.ndarray], periods: List[int],
+                           std_dev: float = 2.0) -> Dict[str, np.ndarray]:
+        """
+        Bollinger Bands for every period
+        Returns: dict with 'upper', 'middle', 'lower', each (n_periods x n_bars)
+        """
+        values = pd.Series(np.asarray(prices, dtype='float64'))
+        middle = Indicators.calculate_sma_batch(values, periods)
+        std = np.full_like(middle, np.nan)
+        for row, period in enumerate(periods):
+            std[row] = values.rolling(window=int(period), min_periods=int(period)).std().to_numpy()
+        return {'upper': middle + std * std_dev, 'middle': middle, 'lower': middle - std * std_dev}
+    
     @staticmethod
     def calculate_ma(prices: Union[pd.Series, np.ndarray], 
                     ma_type: str, period: int) -> pd.Series:
@@ -275,73 +346,17 @@ class Indicators:
                     'macd': {'fast': 12, 'slow': 26, 'signal': 9},
                     'bb': {'period': 20, 'std_dev': 2.0}
                 }
+                A list 'period' for rsi/bb/sma/ema/hma/wma/kama suffixes each key
+                with its period (RSI_14, BB_UPPER_20, ...)
+        
+        Evaluated through IndicatorPlan, so shared primitives (the EMA inside
+        KC and MACD, TR, RSI) are computed once.
         
         Returns:
             Dict mapping indicator names to their calculated values
         """
-        results = {}
-        
-        close = df['Close']
-        high = df['High']
-        low = df['Low']
-        
-        for indicator_name, params in indicators_config.items():
-            indicator_lower = indicator_name.lower()
-            
-            try:
-                if indicator_lower == 'rsi':
-                    period = params.get('period', 14)
-                    results['RSI'] = Indicators.calculate_rsi(close, period)
-                
-                elif indicator_lower == 'macd':
-                    fast = params.get('fast', 12)
-                    slow = params.get('slow', 26)
-                    signal = params.get('signal', 9)
-                    macd_data = Indicators.calculate_macd(close, fast, slow, signal)
-                    results['MACD'] = macd_data['macd']
-                    results['MACD_SIGNAL'] = macd_data['signal']
-                    results['MACD_HIST'] = macd_data['histogram']
-                
-                elif indicator_lower == 'bb' or indicator_lower == 'bollinger':
-                    period = params.get('period', 20)
-                    std_dev = params.get('std_dev', 2.0)
-                    bb_data = Indicators.calculate_bb(close, period, std_dev)
-                    results['BB_UPPER'] = bb_data['upper']
-                    results['BB_MIDDLE'] = bb_data['middle']
-                    results['BB_LOWER'] = bb_data['lower']
-                
-                elif indicator_lower == 'kc' or indicator_lower == 'keltner':
-                    period = params.get('period', 20)
-                    mult = params.get('multiplier', 2.0)
-                    kc_data = Indicators.calculate_kc(high, low, close, period, mult)
-                    results['KC_UPPER'] = kc_data['upper']
-                    results['KC_MIDDLE'] = kc_data['middle']
-                    results['KC_LOWER'] = kc_data['lower']
-                
-                elif indicator_lower == 'atr':
-                    period = params.get('period', 14)
-                    results['ATR'] = Indicators.calculate_atr(high, low, close, period)
-                
-                elif indicator_lower == 'stoch_rsi' or indicator_lower == 'stochrsi':
-                    rsi_period = params.get('rsi_period', 14)
-                    stoch_period = params.get('stoch_period', 14)
-                    k_smooth = params.get('k_smooth', 3)
-                    d_smooth = params.get('d_smooth', 3)
-                    stoch_data = Indicators.calculate_stoch_rsi(close, rsi_period, 
-                                                               stoch_period, k_smooth, d_smooth)
-                    results['STOCH_RSI_K'] = stoch_data['k']
-                    results['STOCH_RSI_D'] = stoch_data['d']
-                
-                elif indicator_lower in ['sma', 'ema', 'hma', 'wma', 'kama']:
-                    period = params.get('period', 20)
-                    ma = Indicators.calculate_ma(close, indicator_lower, period)
-                    results[f'{indicator_lower.upper()}_{period}'] = ma
-            
-            except Exception as e:
-                print(f"[INDICATORS] Error calculating {indicator_name}: {e}")
-                continue
-        
-        return results
+        from .planner import IndicatorPlan
+        return IndicatorPlan.from_config(indicators_config).evaluate(df).outputs
 
 
 # Convenience functions for backward compatibility
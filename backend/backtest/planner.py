@@ -0,0 +1,348 @@
+"""
+Indicator Planner
+Turns an indicators config plus the entry/exit condition lists into a DAG of
+primitive computations (EMA(n), SMA(n), rolling std(n), TR, RSI(n), ...).
+Nodes are keyed by what they compute, so shared work is deduplicated: KC(20)
+and an ema_20 condition share one EMA, MACD's signal line reuses its MACD
+node, Stoch RSI reuses RSI(n), ATR and KC share TR. Each node is evaluated
+once per request.
+
+Node keys are tuples: ('col', 'Close'), ('ema', source, n), ('sma', source, n),
+('std', source, n), ('tr',), ('rsi', source, n), ... where source is another node key.
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .indicators import Indicators
+from .signals import CHANNEL_BANDS
+
+Node = Tuple
+CLOSE: Node = ('col', 'Close')
+HIGH: Node = ('col', 'High')
+LOW: Node = ('col', 'Low')
+
+MA_KINDS = ('sma', 'ema', 'hma', 'wma', 'kama')
+
+
+def _deps(key: Node) -> List[Node]:
+    kind = key[0]
+    if kind == 'col':
+        return []
+    if kind == 'tr':
+        return [HIGH, LOW, CLOSE]
+    if kind == 'sub':
+        return [key[1], key[2]]
+    if kind == 'hma_raw':
+        return [('wma', key[1], int(key[2] / 2)), ('wma', key[1], key[2])]
+    if kind == 'stoch':
+        rsi = key[1]
+        return [rsi, ('rollmin', rsi, key[2]), ('rollmax', rsi, key[2])]
+    return [key[1]]
+
+
+def _by_column(func: Callable, values, *args):
+    """Apply a Series-only indicator to each column of a panel"""
+    if isinstance(values, pd.DataFrame):
+        return values.apply(lambda column: func(column, *args))
+    return func(values, *args)
+
+
+def _panel_rsi(prices: pd.DataFrame, period: int) -> pd.DataFrame:
+    """
+    calculate_rsi per column of a panel, with gains/losses kept NaN where a ticker has no
+    bar, so a late listing matches calculate_rsi on its own bars instead of seeding on zeros
+    """
+    delta = prices.diff()
+    listed = prices.notna()
+    gains = delta.where(delta > 0, 0).where(listed)
+    losses = (-delta.where(delta < 0, 0)).where(listed)
+    avg_gains = gains.ewm(alpha=1/period, adjust=False, min_periods=period).mean()
+    avg_losses = losses.ewm(alpha=1/period, adjust=False, min_periods=period).mean()
+    rs = avg_gains / avg_losses
+    return (100 - (100 / (1 + rs))).fillna(50)
+
+
+def _compute(key: Node, v: Dict[Node, pd.Series], df: pd.DataFrame) -> pd.Series:
+    kind = key[0]
+    if kind == 'col':
+        return df[key[1]]
+    if kind == 'ema':
+        return Indicators.calculate_ema(v[key[1]], key[2])
+    if kind == 'sma':
+        return Indicators.calculate_sma(v[key[1]], key[2])
+    if kind == 'std':
+        return v[key[1]].rolling(window=key[2], min_periods=key[2]).std()
+    if kind == 'wma':
+        return _by_column(Indicators.calculate_wma, v[key[1]], key[2])
+    if kind == 'kama':
+        return _by_column(Indicators.calculate_kama, v[key[1]], key[2], key[3], key[4])
+    if kind == 'rsi':
+        if isinstance(v[key[1]], pd.DataFrame):
+            return _panel_rsi(v[key[1]], key[2])
+        return Indicators.calculate_rsi(v[key[1]], key[2])
+    if kind == 'tr':
+        # Elementwise NaN-skipping max, so a panel (dates x tickers) works like a single Series
+        prev_close = v[CLOSE].shift(1)
+        tr1 = v[HIGH] - v[LOW]
+        tr2 = abs(v[HIGH] - prev_close)
+        tr3 = abs(v[LOW] - prev_close)
+        return np.fmax(np.fmax(tr1, tr2), tr3)
+    if kind == 'sub':
+        return v[key[1]] - v[key[2]]
+    if kind == 'hma_raw':
+        return 2 * v[('wma', key[1], int(key[2] / 2))] - v[('wma', key[1], key[2])]
+    if kind == 'rollmin':
+        return v[key[1]].rolling(window=key[2], min_periods=key[2]).min()
+    if kind == 'rollmax':
+        return v[key[1]].rolling(window=key[2], min_periods=key[2]).max()
+    if kind == 'stoch':
+        rsi, low, high = (v[k] for k in _deps(key))
+        return (((rsi - low) / (high - low)) * 100).fillna(50)
+    raise ValueError(f"Unknown indicator node {key!r}")
+
+
+class IndicatorPlan:
+    """
+    DAG of indicator nodes for one request
+    Outputs are named like Indicators.calculate_all; condition references
+    (bb_top_20, kc_mid_20, sma_50, rsi_14, ...) are registered for lookup
+    """
+
+    def __init__(self):
+        self.nodes: Dict[Node, None] = {}  # insertion order is a valid evaluation order
+        self.outputs: List[Tuple[str, Callable]] = []  # (indicator name, values -> {output: Series})
+        self.refs: Dict[Tuple, Callable] = {}  # condition reference key -> values -> Series
+        self.requested = 0  # nodes each indicator/reference would compute on its own, summed
+        self._request: set = set()
+
+    def node(self, key: Node) -> Node:
+        """Register a node and its dependencies (each stored once) and return its key"""
+        for dep in _deps(key):
+            self.node(dep)
+        if key[0] != 'col':
+            self._request.add(key)
+        self.nodes.setdefault(key, None)
+        return key
+
+    def _count_request(self):
+        self.requested += len(self._request)
+        self._request = set()
+
+    # ---- building blocks (node keys for the composite indicators) ----
+
+    def _ma(self, kind: str, period: int, source: Node = CLOSE) -> Node:
+        kind = kind.lower()
+        if kind == 'hma':
+            return self.node(('wma', self.node(('hma_raw', source, period)), int(np.sqrt(period))))
+        if kind == 'kama':
+            return self.node(('kama', source, period, 2, 30))
+        if kind not in ('ema', 'wma'):
+            kind = 'sma'
+        return self.node((kind, source, period))
+
+    def _bands(self, middle: Node, width: Node, mult: float) -> Callable:
+        def build(v):
+            return {'upper': v[middle] + (v[width] * mult), 'middle': v[middle],
+                    'lower': v[middle] - (v[width] * mult)}
+        return build
+
+    def bb(self, period: int, std_dev: float) -> Callable:
+        return self._bands(self._ma('sma', period), self.node(('std', CLOSE, period)), std_dev)
+
+    def kc(self, period: int, multiplier: float) -> Callable:
+        return self._bands(self._ma('ema', period), self.atr(period), multiplier)
+
+    def atr(self, period: int) -> Node:
+        return self.node(('ema', self.node(('tr',)), period))
+
+    def rsi(self, period: int) -> Node:
+        return self.node(('rsi', CLOSE, period))
+
+    def macd(self, fast: int, slow: int, signal: int) -> Callable:
+        macd = self.node(('sub', self._ma('ema', fast), self._ma('ema', slow)))
+        sig = self.node(('ema', macd, signal))
+        hist = self.node(('sub', macd, sig))
+        return lambda v: {'macd': v[macd], 'signal': v[sig], 'histogram': v[hist]}
+
+    def stoch_rsi(self, rsi_period: int, stoch_period: int, k_smooth: int, d_smooth: int) -> Callable:
+        k = self.node(('sma', self.node(('stoch', self.rsi(rsi_period), stoch_period)), k_smooth))
+        d = self.node(('sma', k, d_smooth))
+        return lambda v: {'k': v[k], 'd': v[d]}
+
+    # ---- request parsing ----
+
+    @classmethod
+    def from_config(cls, indicators_config: Dict[str, Any],
+                    conditions: List[Dict[str, Any]] = ()) -> 'IndicatorPlan':
+        """Plan for an indicators config (calculate_all format) plus condition references"""
+        plan = cls()
+        for indicator_name, params in (indicators_config or {}).items():
+            try:
+                plan.add_indicator(indicator_name, params)
+            except Exception as e:
+                print(f"[INDICATORS] Error calculating {indicator_name}: {e}")
+            plan._count_request()
+        for condition in conditions or ():
+            plan.add_condition(condition)
+        return plan
+
+    def add_indicator(self, indicator_name: str, params: Dict[str, Any]):
+        """One calculate_all entry; a list 'period' yields one suffixed output per period"""
+        name = indicator_name.lower()
+        builder = None
+
+        if name == 'rsi':
+            period = params.get('period', 14)
+            if isinstance(period, (list, tuple)):
+                nodes = {f'RSI_{p}': self.rsi(p) for p in period}
+                builder = lambda v: {k: v[n] for k, n in nodes.items()}
+            else:
+                node = self.rsi(period)
+                builder = lambda v: {'RSI': v[node]}
+
+        elif name == 'macd':
+            macd = self.macd(params.get('fast', 12), params.get('slow', 26), params.get('signal', 9))
+            builder = lambda v: dict(zip(('MACD', 'MACD_SIGNAL', 'MACD_HIST'), macd(v).values()))
+
+        elif name in ('bb', 'bollinger', 'kc', 'keltner'):
+            prefix = 'BB' if name in ('bb', 'bollinger') else 'KC'
+            period = params.get('period', 20)
+            if prefix == 'BB':
+                mult = params.get('std_dev', 2.0)
+                make = self.bb
+            else:
+                mult = params.get('multiplier', 2.0)
+                make = self.kc
+            if prefix == 'BB' and isinstance(period, (list, tuple)):
+                bands = {p: make(p, mult) for p in period}
+                builder = lambda v: {f'BB_{band.upper()}_{p}': s
+                                     for p, b in bands.items() for band, s in b(v).items()}
+            else:
+                bands = make(period, mult)
+                builder = lambda v: {f'{prefix}_{band.upper()}': s for band, s in bands(v).items()}
+
+        elif name == 'atr':
+            node = self.atr(params.get('period', 14))
+            builder = lambda v: {'ATR': v[node]}
+
+        elif name in ('stoch_rsi', 'stochrsi'):
+            stoch = self.stoch_rsi(params.get('rsi_period', 14), params.get('stoch_period', 14),
+                                   params.get('k_smooth', 3), params.get('d_smooth', 3))
+            builder = lambda v: dict(zip(('STOCH_RSI_K', 'STOCH_RSI_D'), stoch(v).values()))
+
+        elif name in MA_KINDS:
+            period = params.get('period', 20)
+            periods = period if isinstance(period, (list, tuple)) else [period]
+            nodes = {f'{name.upper()}_{p}': self._ma(name, p) for p in periods}
+            builder = lambda v: {k: v[n] for k, n in nodes.items()}
+
+        if builder is not None:
+            self.outputs.append((indicator_name, builder))
+
+    def add_condition(self, condition: Dict[str, Any]):
+        """Register the indicator series a condition's source/target refer to"""
+        channel_params = {k: condition[k] for k in ('bb_std', 'kc_mult') if k in condition}
+        refs = [(condition.get('source', 'close'), {**condition.get('params', {}), **channel_params})]
+        if isinstance(condition.get('target'), str):
+            refs.append((condition['target'], {**condition.get('target_params', {}), **channel_params}))
+        for name, params in refs:
+            key = ref_key(name, params)
+            if key is None or key in self.refs:
+                continue
+            if key[0] in ('bb', 'kc'):
+                _, band, period, mult = key
+                bands = self.bb(period, mult) if key[0] == 'bb' else self.kc(period, mult)
+                self.refs[key] = lambda v, bands=bands, band=band: bands(v)[CHANNEL_BANDS[band]]
+            else:
+                node = self.rsi(key[1]) if key[0] == 'rsi' else self._ma(key[0], key[1])
+                self.refs[key] = lambda v, node=node: v[node]
+            self._count_request()
+
+    # ---- evaluation ----
+
+    def stats(self) -> Dict[str, int]:
+        """Primitive computations requested by all indicators/conditions vs actually computed"""
+        computed = sum(1 for key in self.nodes if key[0] != 'col')
+        return {'requested': self.requested, 'computed': computed, 'saved': self.requested - computed}
+
+    def _batched(self, df: pd.DataFrame) -> Dict[Node, pd.Series]:
+        """RSI/EMA nodes sharing a price column run through the batch API together (rows are bit-identical)"""
+        values = {}
+        for kind, batch in (('rsi', Indicators.calculate_rsi_batch), ('ema', Indicators.calculate_ema_batch)):
+            groups: Dict[Node, List[Node]] = {}
+            for key in self.nodes:
+                if key[0] == kind and key[1][0] == 'col':
+                    groups.setdefault(key[1], []).append(key)
+            for source, keys in groups.items():
+                if len(keys) < 2:
+                    continue
+                prices = df[source[1]]
+                if not isinstance(prices, pd.Series):
+                    continue  # panels go column-wise through the per-node path
+                try:
+                    rows = batch(prices, [key[2] for key in keys])
+                except Exception:
+                    continue  # fall back to per-node evaluation
+                for key, row in zip(keys, rows):
+                    values[key] = pd.Series(row, index=prices.index)
+        return values
+
+    def evaluate(self, df: pd.DataFrame) -> 'PlanResult':
+        """Compute every node once, in dependency order, then assemble the outputs"""
+        values = self._batched(df)
+        for key in self.nodes:
+            if key in values:
+                continue
+            try:
+                values[key] = _compute(key, values, df)
+            except Exception as e:
+                print(f"[INDICATORS] Error calculating {key[0]}{key[1:]}: {e}")
+
+        outputs = {}
+        for indicator_name, builder in self.outputs:
+            try:
+                outputs.update(builder(values))
+            except Exception as e:
+                print(f"[INDICATORS] Error calculating {indicator_name}: {e}")
+        refs = {}
+        for key, builder in self.refs.items():
+            try:
+                refs[key] = builder(values)
+            except Exception:
+                continue
+        return PlanResult(outputs, refs, self.stats())
+
+
+def ref_key(name: str, params: Dict[str, Any]):
+    """
+    Key of a condition series reference, or None for plain columns/config indicators
+    bb_top_20 -> ('bb', 'top', 20, bb_std), kc_mid_20 -> ('kc', 'mid', 20, kc_mult),
+    sma_50 -> ('sma', 50), rsi_14 -> ('rsi', 14)
+    """
+    parts = str(name).lower().split('_')
+    if parts[0] in ('bb', 'kc') and len(parts) >= 3 and parts[1] in CHANNEL_BANDS:
+        period = int(parts[2]) if parts[2].isdigit() else 20
+        mult = params.get('bb_std', 2.0) if parts[0] == 'bb' else params.get('kc_mult', 2.0)
+        if isinstance(mult, (list, tuple)):
+            return None  # swept multipliers go through the evaluator's channel memo
+        return (parts[0], parts[1], period, float(mult))
+    if len(parts) == 2 and parts[0] in MA_KINDS + ('rsi',) and parts[1].isdigit():
+        return (parts[0], int(parts[1]))
+    return None
+
+
+class PlanResult:
+    """Evaluated plan: calculate_all-style outputs plus condition reference lookups"""
+
+    def __init__(self, outputs: Dict[str, pd.Series], refs: Dict[Tuple, pd.Series], stats: Dict[str, int]):
+        self.outputs = outputs
+        self.refs = refs
+        self.stats = stats
+
+    def lookup(self, name: str, params: Dict[str, Any]):
+        """Series for a condition reference (see ref_key), or None if not planned"""
+        key = ref_key(name, params)
+        return self.refs.get(key) if key is not None else None
@@ -0,0 +1,84 @@
+"""
+Universe Screener
+Evaluates a condition list (SignalEvaluator format) for every ticker of a watchlist
+or universe CSV at once: one pass over the Polygon day files builds a dates x tickers
+panel, indicators are computed column-wise, and the tickers whose latest bar fires
+are returned
+"""
+
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .data_source import load_panel
+from .planner import IndicatorPlan
+from .signals import ConditionPlan, SignalEvaluator
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_UNIVERSE = 'spy503.csv'
+
+
+def load_universe(path: str = None) -> List[str]:
+    """Tickers from a universe CSV with a Symbol column (default spy503.csv at the project root)"""
+    path = Path(path or DEFAULT_UNIVERSE)
+    if not path.is_absolute() and not path.exists():
+        path = PROJECT_ROOT / path
+    symbols = pd.read_csv(path)['Symbol'].dropna().astype(str).str.strip()
+    return list(dict.fromkeys(s for s in symbols if s))
+
+
+def screen(panel: pd.DataFrame, conditions: List[Dict[str, Any]], logic: str = 'all',
+           indicators_config: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Screen a (field, ticker) panel
+
+    Returns:
+        Dict with: matches (tickers whose latest bar fires), as_of (latest bar date per
+        match), screened (ticker count), computations (IndicatorPlan stats)
+    """
+    planned = IndicatorPlan.from_config(indicators_config or {}, conditions).evaluate(panel)
+    evaluator = SignalEvaluator(panel, planned.outputs, planned)
+    fired = ConditionPlan(conditions, logic).run(evaluator)
+
+    # Latest bar per ticker: the last row with a close (a ticker may not trade on the last date)
+    has_bar = panel['Close'].notna().to_numpy()
+    last = len(panel) - 1 - np.argmax(has_bar[::-1], axis=0)
+    columns = np.arange(has_bar.shape[1])
+    hit = fired[last, columns] & has_bar[last, columns]
+
+    tickers = panel['Close'].columns
+    dates = panel.index.strftime('%Y-%m-%d')
+    return {
+        'matches': [tickers[i] for i in np.flatnonzero(hit)],
+        'as_of': {tickers[i]: dates[last[i]] for i in np.flatnonzero(hit)},
+        'screened': len(tickers),
+        'computations': planned.stats,
+    }
+
+
+def screen_universe(conditions: List[Dict[str, Any]], tickers: List[str] = None, logic: str = 'all',
+                    indicators_config: Dict[str, Any] = None, end_date: str = None,
+                    lookback_days: int = 400) -> Dict[str, Any]:
+    """
+    Screen a watchlist (or spy503.csv when tickers is None) as of end_date (default today)
+    lookback_days of calendar history are loaded to warm up the indicators
+    """
+    t0 = time.perf_counter()
+    tickers = tickers or load_universe()
+    end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.now()
+    start = end - timedelta(days=lookback_days)
+
+    panel = load_panel(tickers, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+    t_load = time.perf_counter()
+    result = screen(panel, conditions, logic, indicators_config)
+
+    loaded = set(panel['Close'].columns)
+    result['missing'] = [t for t in tickers if t not in loaded]
+    result['seconds'] = {'load': round(t_load - t0, 3), 'screen': round(time.perf_counter() - t_load, 3)}
+    print(f"[SCREENER] {len(result['matches'])} of {result['screened']} tickers match "
+          f"({result['seconds']['load']}s load, {result['seconds']['screen']}s screen)")
+    return result
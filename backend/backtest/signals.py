@@ -3,23 +3,39 @@ Signals Module
 Evaluates entry/exit conditions from frontend condition builder format
 """
 
+import itertools
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Any, Union
 
+from .indicators import Indicators
+
+CHANNEL_BANDS = {'top': 'upper', 'mid': 'middle', 'bottom': 'lower'}
+
+# Condition knobs that sweep_signals_from_config accepts as lists (row order of a condition's sweep)
+SWEEP_KNOBS = ('bb_std', 'kc_mult', 'threshold_pct', 'delay_bars')
+
 
 class SignalEvaluator:
     """Evaluates entry/exit signals based on conditions"""
     
-    def __init__(self, df: pd.DataFrame, indicators: Dict[str, pd.Series]):
+    def __init__(self, df: pd.DataFrame, indicators: Dict[str, pd.Series], planned=None,
+                 memo: Dict[tuple, Dict[str, pd.Series]] = None):
         """
         Args:
-            df: DataFrame with OHLCV data
+            df: DataFrame with OHLCV data, or a panel with (field, ticker) columns
+                (see DataSource.load_panel) to evaluate every ticker at once
             indicators: Dict of calculated indicators
+            planned: Optional evaluated IndicatorPlan; condition references it covers are read from it
+            memo: Optional channel memo to share with another evaluator on the same df
         """
         self.df = df
         self.indicators = indicators
+        self.planned = planned
+        self.memo = memo if memo is not None else {}  # (indicator, period, multiplier, source) -> bands
         self.length = len(df)
+        self.tickers = df['Close'].columns if df.columns.nlevels > 1 else None
+        self.shape = (self.length,) if self.tickers is None else (self.length, len(self.tickers))
     
     def evaluate_conditions(self, conditions: List[Dict[str, Any]], 
                           logic: str = 'all') -> pd.Series:
@@ -33,28 +49,7 @@ class SignalEvaluator:
         Returns:
             Boolean series indicating when conditions are met
         """
-        if not conditions:
-            return pd.Series([False] * self.length, index=self.df.index)
-        
-        # Evaluate each condition
-        results = []
-        for condition in conditions:
-            result = self.evaluate_condition(condition)
-            results.append(result)
-        
-        # Combine with specified logic
-        if logic == 'all':
-            # AND all conditions
-            combined = results[0]
-            for result in results[1:]:
-                combined = combined & result
-        else:  # 'any'
-            # OR all conditions
-            combined = results[0]
-            for result in results[1:]:
-                combined = combined | result
-        
-        return combined
+        return pd.Series(ConditionPlan(conditions, logic).run(self), index=self.df.index)
     
     def evaluate_condition(self, condition: Dict[str, Any]) -> pd.Series:
         """
@@ -73,40 +68,7 @@ class SignalEvaluator:
             'params': {...}  # Additional params like periods
         }
         """
-        cond_type = condition.get('type', 'price')
-        comparison = condition.get('comparison', 'above')
-        
-        # Build params dict for channel indicators
-        channel_params = {}
-        if 'bb_std' in condition:
-            channel_params['bb_std'] = condition['bb_std']
-        if 'kc_mult' in condition:
-            channel_params['kc_mult'] = condition['kc_mult']
-        
-        # Get source series
-        source_params = {**condition.get('params', {}), **channel_params}
-        source = self._get_series(condition.get('source', 'close'), source_params)
-        
-        # Get target series or value
-        target = condition.get('target')
-        if isinstance(target, (int, float)):
-            target_series = pd.Series([float(target)] * self.length, index=self.df.index)
-        else:
-            target_params = {**condition.get('target_params', {}), **channel_params}
-            target_series = self._get_series(target, target_params)
-        
-        # Get advanced parameters
-        threshold_pct = condition.get('threshold_pct', 0)
-        delay_bars = condition.get('delay_bars', 0)
-        
-        # Evaluate comparison
-        signal = self._compare(source, target_series, comparison, threshold_pct)
-        
-        # Apply delay if specified
-        if delay_bars > 0:
-            signal = signal.shift(delay_bars).fillna(False)
-        
-        return signal
+        return pd.Series(ConditionPlan([condition]).run(self), index=self.df.index)
     
     def _get_series(self, name: str, params: Dict[str, Any]) -> pd.Series:
         """
@@ -127,59 +89,18 @@ class SignalEvaluator:
         if name_lower == 'volume':
             return self.df['Volume']
         
-        # Handle Bollinger Band channels: bb_top_20, bb_mid_20, bb_bottom_20
-        if name_lower.startswith('bb_'):
-            parts = name_lower.split('_')
-            if len(parts) >= 3:
-                band_type = parts[1]  # top, mid, bottom
-                period = int(parts[2]) if parts[2].isdigit() else 20
-                std_dev = params.get('bb_std', 2.0)
-                
-                # Calculate BB if not already present
-                bb_key = f'BB_{band_type.upper()}'
-                if bb_key not in self.indicators:
-                    from backend.backtest.indicators import Indicators
-                    close = self.df['Close']
-                    bb_data = Indicators.calculate_bb(close, period, std_dev)
-                    self.indicators['BB_UPPER'] = bb_data['upper']
-                    self.indicators['BB_MIDDLE'] = bb_data['middle']
-                    self.indicators['BB_LOWER'] = bb_data['lower']
-                
-                # Map band type to indicator key
-                if band_type == 'top':
-                    return self.indicators.get('BB_UPPER', pd.Series([0.0] * self.length, index=self.df.index))
-                elif band_type == 'mid':
-                    return self.indicators.get('BB_MIDDLE', pd.Series([0.0] * self.length, index=self.df.index))
-                elif band_type == 'bottom':
-                    return self.indicators.get('BB_LOWER', pd.Series([0.0] * self.length, index=self.df.index))
+        # Precomputed by the indicator plan
+        if self.planned is not None:
+            series = self.planned.lookup(name, params)
+            if series is not None:
+                return series
         
-        # Handle Keltner Channel: kc_top_20, kc_mid_20, kc_bottom_20
-        if name_lower.startswith('kc_'):
+        # Bollinger / Keltner channels: bb_top_20, kc_mid_20, bb_bottom_50, ...
+        if name_lower.startswith(('bb_', 'kc_')):
             parts = name_lower.split('_')
-            if len(parts) >= 3:
-                band_type = parts[1]  # top, mid, bottom
+            if len(parts) >= 3 and parts[1] in CHANNEL_BANDS:
                 period = int(parts[2]) if parts[2].isdigit() else 20
-                mult = params.get('kc_mult', 2.0)
-                
-                # Calculate KC if not already present
-                kc_key = f'KC_{band_type.upper()}'
-                if kc_key not in self.indicators:
-                    from backend.backtest.indicators import Indicators
-                    high = self.df['High']
-                    low = self.df['Low']
-                    close = self.df['Close']
-                    kc_data = Indicators.calculate_kc(high, low, close, period, mult)
-                    self.indicators['KC_UPPER'] = kc_data['upper']
-                    self.indicators['KC_MIDDLE'] = kc_data['middle']
-                    self.indicators['KC_LOWER'] = kc_data['lower']
-                
-                # Map band type to indicator key
-                if band_type == 'top':
-                    return self.indicators.get('KC_UPPER', pd.Series([0.0] * self.length, index=self.df.index))
-                elif band_type == 'mid':
-                    return self.indicators.get('KC_MIDDLE', pd.Series([0.0] * self.length, index=self.df.index))
-                elif band_type == 'bottom':
-                    return self.indicators.get('KC_LOWER', pd.Series([0.0] * self.length, index=self.df.index))
+                return self._channel(parts[0], period, params)[CHANNEL_BANDS[parts[1]]]
         
         # Indicators
         if name.upper() in self.indicators:
@@ -192,67 +113,174 @@ class SignalEvaluator:
         
         # Return zeros if not found
         print(f"[SIGNALS] Warning: Series '{name}' not found, returning zeros")
+        if self.tickers is not None:
+            return pd.DataFrame(0.0, index=self.df.index, columns=self.tickers)
         return pd.Series([0.0] * self.length, index=self.df.index)
     
-    def _compare(self, source: pd.Series, target: pd.Series, 
-                comparison: str, threshold_pct: float = 0) -> pd.Series:
+    def _channel(self, kind: str, period: int, params: Dict[str, Any]) -> Dict[str, pd.Series]:
         """
-        Compare two series with specified comparison operator
-        
-        Args:
-            source: Source data series
-            target: Target data series
-            comparison: Comparison operator ('above', 'crosses_above', etc.)
-            threshold_pct: For crosses, percentage beyond target required (0-10)
-                          Example: 2.0 means price must cross 2% beyond target
+        Bollinger ('bb') or Keltner ('kc') bands, memoized per (indicator, period, multiplier, source)
+        BB reads params 'bb_std' and an optional 'source' column; KC reads 'kc_mult' and uses HLC
         """
+        if kind == 'bb':
+            mult = float(params.get('bb_std', 2.0))
+            source = str(params.get('source', 'close')).capitalize()
+        else:
+            mult = float(params.get('kc_mult', 2.0))
+            source = 'Close'
+        key = (kind, period, mult, source)
+        if key not in self.memo:
+            if kind == 'bb':
+                self.memo[key] = Indicators.calculate_bb(self.df[source], period, mult)
+            else:
+                self.memo[key] = Indicators.calculate_kc(self.df['High'], self.df['Low'], self.df['Close'],
+                                                         period, mult)
+        return self.memo[key]
+
+
+# Comparison name -> ufunc; equals and the crosses are special-cased in ConditionPlan
+COMPARISONS = {
+    'above': np.greater, '>': np.greater,
+    'below': np.less, '<': np.less,
+    'greater_equal': np.greater_equal, '>=': np.greater_equal,
+    'less_equal': np.less_equal, '<=': np.less_equal,
+    'equals': None, '==': None,
+    'crosses_above': None, 'crosses_below': None,
+}
+
+
+class ConditionPlan:
+    """
+    A condition list compiled once into NumPy steps
+    run() evaluates it against any SignalEvaluator (new bars, new indicators)
+    without re-parsing: raw arrays, broadcast scalar targets, crosses from
+    shifted views, and an in-place AND/OR reduction into one boolean buffer.
+    """
+    
+    def __init__(self, conditions: List[Dict[str, Any]], logic: str = 'all'):
+        self.logic = logic
+        self.steps = [self._compile(condition) for condition in conditions or []]
+    
+    @staticmethod
+    def _compile(condition: Dict[str, Any]) -> tuple:
+        """(source ref, target ref or float64 scalar, comparison, threshold_pct, delay_bars)"""
+        comparison = condition.get('comparison', 'above')
+        if comparison not in COMPARISONS:
+            print(f"[SIGNALS] Unknown comparison: {comparison}, defaulting to 'above'")
+            comparison = 'above'
         
-        if comparison == 'above' or comparison == '>':
-            return source > target
-        
-        elif comparison == 'below' or comparison == '<':
-            return source < target
+        # Channel params apply to both sides
+        channel_params = {k: condition[k] for k in ('bb_std', 'kc_mult') if k in condition}
+        source = (condition.get('source', 'close'), {**condition.get('params', {}), **channel_params})
         
-        elif comparison == 'crosses_above':
-            # True when source crosses above target
-            # With threshold: must cross above target * (1 + threshold_pct/100)
-            prev_source = source.shift(1)
-            prev_target = target.shift(1)
-            
-            if threshold_pct > 0:
-                threshold_target = target * (1 + threshold_pct / 100)
-                return (prev_source <= prev_target) & (source >= threshold_target)
-            else:
-                return (prev_source <= prev_target) & (source > target)
+        target = condition.get('target')
+        if isinstance(target, (int, float)):
+            target = np.float64(target)  # float64 like the old constant Series, so float32 prices upcast
+        else:
+            target = (target, {**condition.get('target_params', {}), **channel_params})
         
-        elif comparison == 'crosses_below':
-            # True when source crosses below target
-            # With threshold: must cross below target * (1 - threshold_pct/100)
-            prev_source = source.shift(1)
-            prev_target = target.shift(1)
-            
+        return (source, target, comparison,
+                condition.get('threshold_pct', 0), condition.get('delay_bars', 0))
+    
+    def run(self, evaluator: 'SignalEvaluator') -> np.ndarray:
+        """Boolean array for the whole condition list: one per bar, or bars x tickers for a panel"""
+        combined = np.zeros(evaluator.shape, dtype=bool)
+        if not self.steps:
+            return combined
+        scratch = np.empty(evaluator.shape, dtype=bool)
+        step_out = np.empty(evaluator.shape, dtype=bool)
+        reduce = np.logical_and if self.logic == 'all' else np.logical_or
+        
+        for i, step in enumerate(self.steps):
+            out = combined if i == 0 else step_out
+            self._run_step(step, evaluator, out, scratch)
+            if i > 0:
+                reduce(combined, out, out=combined)
+        return combined
+    
+    @staticmethod
+    def _resolve(step: tuple, evaluator: 'SignalEvaluator') -> tuple:
+        """Source and target arrays for a step (a scalar target stays a float64 scalar)"""
+        source = evaluator._get_series(*step[0]).to_numpy()
+        target = step[1]
+        if not isinstance(target, np.float64):
+            target = evaluator._get_series(*target).to_numpy()
+        return source, target
+    
+    @staticmethod
+    def _run_step(step: tuple, evaluator: 'SignalEvaluator', out: np.ndarray, scratch: np.ndarray):
+        _, _, comparison, threshold_pct, delay_bars = step
+        source, target = ConditionPlan._resolve(step, evaluator)
+        scalar = np.ndim(target) == 0
+        
+        if comparison in ('crosses_above', 'crosses_below'):
+            # Previous bar on the near side of the target, current bar past it
+            # With threshold_pct: the current bar must clear target * (1 +/- threshold_pct/100)
+            above = comparison == 'crosses_above'
+            prev_cmp = np.less_equal if above else np.greater_equal
             if threshold_pct > 0:
-                threshold_target = target * (1 - threshold_pct / 100)
-                return (prev_source >= prev_target) & (source <= threshold_target)
+                now_cmp = np.greater_equal if above else np.less_equal
+                now_target = target * (1 + threshold_pct / 100 if above else 1 - threshold_pct / 100)
             else:
-                return (prev_source >= prev_target) & (source < target)
-        
-        elif comparison == 'equals' or comparison == '==':
-            return np.isclose(source, target, rtol=1e-5)
-        
-        elif comparison == 'greater_equal' or comparison == '>=':
-            return source >= target
-        
-        elif comparison == 'less_equal' or comparison == '<=':
-            return source <= target
+                now_cmp = np.greater if above else np.less
+                now_target = target
+            out[:1] = False
+            prev_cmp(source[:-1], target if scalar else target[:-1], out=out[1:])
+            now_cmp(source[1:], now_target if scalar else now_target[1:], out=scratch[1:])
+            np.logical_and(out[1:], scratch[1:], out=out[1:])
+        elif COMPARISONS[comparison] is None:  # equals
+            out[:] = np.isclose(source, target, rtol=1e-5)
+        else:
+            COMPARISONS[comparison](source, target, out=out)
         
+        if delay_bars > 0:
+            out[delay_bars:] = out[:-delay_bars].copy()
+            out[:delay_bars] = False
+    
+    @staticmethod
+    def _sweep_rows(step: tuple, evaluator: 'SignalEvaluator', thresholds: List[float],
+                    delays: List[int]) -> np.ndarray:
+        """
+        One step for every (threshold_pct, delay_bars) pair: (len(thresholds) * len(delays), n)
+        Source/target are resolved once; all thresholds run as one broadcast comparison
+        """
+        _, _, comparison, _, _ = step
+        source, target = ConditionPlan._resolve(step, evaluator)
+        scalar = np.ndim(target) == 0
+        n = evaluator.length
+        pct = np.asarray(thresholds, dtype='float64')
+        rows = np.empty((len(pct), n), dtype=bool)
+        
+        if comparison in ('crosses_above', 'crosses_below'):
+            above = comparison == 'crosses_above'
+            prev = (np.less_equal if above else np.greater_equal)(source[:-1], target if scalar else target[:-1])
+            now_target = target if scalar else target[1:]
+            rows[:, :1] = False
+            plain = pct <= 0
+            if plain.any():
+                rows[plain, 1:] = (np.greater if above else np.less)(source[1:], now_target) & prev
+            if not plain.all():
+                # Same dtype as target * python float in the single-variant path
+                factors = np.asarray([1 + p / 100 if above else 1 - p / 100 for p in pct[~plain]],
+                                     dtype=np.result_type(target, 1.0))
+                now_cmp = np.greater_equal if above else np.less_equal
+                rows[~plain, 1:] = now_cmp(source[None, 1:], factors[:, None] * now_target) & prev
         else:
-            print(f"[SIGNALS] Unknown comparison: {comparison}, defaulting to 'above'")
-            return source > target
+            # threshold_pct only applies to crosses
+            ConditionPlan._run_step(step[:3] + (0, 0), evaluator, rows[0], np.empty(n, dtype=bool))
+            rows[1:] = rows[0]
+        
+        out = np.zeros((len(pct), len(delays), n), dtype=bool)
+        for i, delay_bars in enumerate(delays):
+            if delay_bars <= 0:
+                out[:, i] = rows
+            elif delay_bars < n:
+                out[:, i, delay_bars:] = rows[:, :-delay_bars]
+        return out.reshape(-1, n)
 
 
 def build_signals_from_config(df: pd.DataFrame, indicators: Dict[str, pd.Series],
-                             config: Dict[str, Any]) -> tuple[pd.Series, pd.Series]:
+                             config: Dict[str, Any], planned=None) -> tuple[pd.Series, pd.Series]:
     """
     Build entry and exit signals from frontend config
     
@@ -260,25 +288,94 @@ def build_signals_from_config(df: pd.DataFrame, indicators: Dict[str, pd.Series]
         df: OHLCV DataFrame
         indicators: Dict of calculated indicators
         config: Config dict with 'entry_conditions', 'exit_conditions', etc.
+        planned: Optional evaluated IndicatorPlan (see planner.py)
     
     Returns:
         Tuple of (entry_signal, exit_signal) as boolean Series
     """
-    evaluator = SignalEvaluator(df, indicators)
+    evaluator = SignalEvaluator(df, indicators, planned)
     
     # Entry conditions
-    entry_conditions = config.get('entry_conditions', [])
-    entry_logic = config.get('entry_logic', 'all')
-    entry_signal = evaluator.evaluate_conditions(entry_conditions, entry_logic)
+    entry_plan = ConditionPlan(config.get('entry_conditions', []), config.get('entry_logic', 'all'))
+    entry_signal = pd.Series(entry_plan.run(evaluator), index=df.index)
     
     # Exit conditions
-    exit_conditions = config.get('exit_conditions', [])
-    exit_logic = config.get('exit_logic', 'all')
-    exit_signal = evaluator.evaluate_conditions(exit_conditions, exit_logic)
+    exit_plan = ConditionPlan(config.get('exit_conditions', []), config.get('exit_logic', 'all'))
+    exit_signal = pd.Series(exit_plan.run(evaluator), index=df.index)
     
     return entry_signal, exit_signal
 
 
+def sweep_signals_from_config(df: pd.DataFrame, indicators: Dict[str, pd.Series],
+                              config: Dict[str, Any], planned=None) -> tuple:
+    """
+    Sweep version of build_signals_from_config
+    
+    Any threshold_pct, delay_bars, bb_std or kc_mult given as a list in the entry or
+    exit conditions becomes a sweep axis; every combination is one variant. Indicators
+    are computed once (channel bands once per bb_std/kc_mult value) and each condition
+    is evaluated once per distinct setting of its own knobs, thresholds broadcast.
+    
+    Returns:
+        Tuple of (entry_matrix, exit_matrix, variants): boolean arrays of shape
+        (n_variants, n_bars), and one dict per variant row, e.g.
+        {'entry_conditions[0].threshold_pct': 0.5, 'exit_conditions[1].bb_std': 2.5}
+    """
+    evaluator = SignalEvaluator(df, indicators, planned)
+    sides = (('entry_conditions', 'entry_logic'), ('exit_conditions', 'exit_logic'))
+    
+    # Sweep axes: (side, condition index, knob, values)
+    axes = [(side, i, knob, list(condition[knob]))
+            for side, _ in sides
+            for i, condition in enumerate(config.get(side, []))
+            for knob in SWEEP_KNOBS if isinstance(condition.get(knob), (list, tuple))]
+    combos = list(itertools.product(*[range(len(axis[3])) for axis in axes]))
+    grid = np.array(combos, dtype=int).reshape(len(combos), len(axes))
+    if not len(grid):
+        raise ValueError("Sweep lists must not be empty")
+    variants = [{f'{side}[{i}].{knob}': values[j] for (side, i, knob, values), j in zip(axes, row)}
+                for row in grid]
+    
+    matrices = []
+    for side, logic_key in sides:
+        combined = np.zeros((len(grid), evaluator.length), dtype=bool)
+        reduce = np.logical_and if config.get(logic_key, 'all') == 'all' else np.logical_or
+        for i, condition in enumerate(config.get(side, [])):
+            columns = [a for a, axis in enumerate(axes) if axis[:2] == (side, i)]
+            rows = _sweep_condition(evaluator, condition)
+            if columns:
+                shape = tuple(len(axes[a][3]) for a in columns)
+                index = np.ravel_multi_index(tuple(grid[:, a] for a in columns), shape)
+            else:
+                index = np.zeros(len(grid), dtype=int)
+            if i == 0:
+                combined[:] = rows[index]
+            else:
+                reduce(combined, rows[index], out=combined)
+        matrices.append(combined)
+    
+    return matrices[0], matrices[1], variants
+
+
+def _sweep_condition(evaluator: SignalEvaluator, condition: Dict[str, Any]) -> np.ndarray:
+    """Rows for every combination of a condition's list knobs, in SWEEP_KNOBS order"""
+    def values(knob, default):
+        value = condition.get(knob, default)
+        return list(value) if isinstance(value, (list, tuple)) else [value]
+    
+    blocks = []
+    for bb_std, kc_mult in itertools.product(values('bb_std', None), values('kc_mult', None)):
+        variant = {k: v for k, v in condition.items() if k not in SWEEP_KNOBS}
+        if bb_std is not None:
+            variant['bb_std'] = bb_std
+        if kc_mult is not None:
+            variant['kc_mult'] = kc_mult
+        step = ConditionPlan._compile(variant)
+        blocks.append(ConditionPlan._sweep_rows(step, evaluator, values('threshold_pct', 0),
+                                                values('delay_bars', 0)))
+    return np.concatenate(blocks)
+
+
 # Legacy compatibility functions
 def build_signals(indicators: dict, **kwargs) -> tuple[pd.Series, pd.Series]:
     """
@@ -0,0 +1,390 @@
+"""
+Streaming Indicators Module
+Online counterparts of backend.backtest.indicators.Indicators: each object takes
+one new bar per update() call in O(1) and returns the value the batch function
+would give for that bar.
+
+EMA-family indicators (EMA, Wilder RSI, ATR, MACD, KC) follow pandas' ewm recursion
+step by step and match the batch output exactly. Rolling-window indicators (SMA,
+Bollinger, Stoch RSI smoothing) follow pandas' compensated rolling sums; they match
+exactly on a full replay and to float rounding after a warm start.
+
+Every class has from_history(...), taking the same inputs as the batch function,
+to warm-start from a batch computation instead of replaying the history bar by bar.
+"""
+
+import math
+from collections import deque
+from typing import Union, Dict
+
+import numpy as np
+import pandas as pd
+
+from .indicators import Indicators
+
+NAN = float('nan')
+
+
+def _floats(values: Union[pd.Series, np.ndarray, list]) -> list:
+    return np.asarray(values, dtype='float64').tolist()
+
+
+class OnlineEMA:
+    """EMA with pandas ewm(adjust=False) semantics: span=period, or an explicit alpha"""
+
+    def __init__(self, period: int = None, alpha: float = None, min_periods: int = None):
+        if alpha is None:
+            alpha = 2 / (period + 1)
+        self.alpha = alpha
+        self.min_periods = period if min_periods is None else min_periods
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        is_obs = x == x
+        self.nobs += is_obs
+        if self.weighted == self.weighted:
+            self.old_wt *= 1 - self.alpha
+            if is_obs:
+                if self.weighted != x:
+                    self.weighted = self.old_wt * self.weighted + self.alpha * x
+                    self.weighted /= self.old_wt + self.alpha
+                self.old_wt = 1.0
+        elif is_obs:
+            self.weighted = x
+        return self.weighted if self.nobs >= max(self.min_periods, 1) else NAN
+
+    @classmethod
+    def from_history(cls, prices, period: int = None, alpha: float = None,
+                     min_periods: int = None) -> 'OnlineEMA':
+        """Seed from the batch ewm of prices"""
+        ema = cls(period, alpha, min_periods)
+        values = pd.Series(np.asarray(prices, dtype='float64'))
+        if values.notna().any():
+            ema.weighted = float(values.ewm(alpha=ema.alpha, adjust=False).mean().iloc[-1])
+            ema.nobs = int(values.notna().sum())
+            # bars after the last observation keep decaying the old weight
+            trailing = len(values) - 1 - int(np.flatnonzero(values.notna().to_numpy())[-1])
+            for _ in range(trailing):
+                ema.old_wt *= 1 - ema.alpha
+        return ema
+
+
+class OnlineSMA:
+    """SMA with pandas rolling(period, min_periods=period).mean() semantics"""
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.window = deque()
+        self._reset()
+
+    def _reset(self):
+        self.nobs = 0
+        self.sum = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.neg = 0
+        self.same = 0
+        self.prev = None
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        if self.prev is None or self.period == 1:
+            # pandas starts a fresh window on the first bar (and on every bar when period is 1)
+            self._reset()
+            self.window.clear()
+            self.prev = x
+        if len(self.window) == self.period:
+            old = self.window.popleft()
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.comp_remove
+                t = self.sum + y
+                self.comp_remove = t - self.sum - y
+                self.sum = t
+                self.neg -= math.copysign(1.0, old) < 0
+        self.window.append(x)
+        if x == x:
+            self.nobs += 1
+            y = x - self.comp_add
+            t = self.sum + y
+            self.comp_add = t - self.sum - y
+            self.sum = t
+            self.neg += math.copysign(1.0, x) < 0
+            self.same = self.same + 1 if x == self.prev else 1
+            self.prev = x
+        return self.value()
+
+    def value(self) -> float:
+        if self.nobs < self.period or self.nobs == 0:
+            return NAN
+        if self.same >= self.nobs:
+            return self.prev
+        result = self.sum / self.nobs
+        if self.neg == 0 and result < 0:
+            return 0.0
+        if self.neg == self.nobs and result > 0:
+            return 0.0
+        return result
+
+    @classmethod
+    def from_history(cls, prices, period: int) -> 'OnlineSMA':
+        """Seed with the last `period` values (a fresh window, as pandas starts one)"""
+        sma = cls(period)
+        for x in _floats(prices)[-sma.period:]:
+            sma.update(x)
+        return sma
+
+
+class OnlineStd:
+    """Rolling sample std with pandas rolling(period, min_periods=period).std() semantics"""
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.window = deque()
+        self.nobs = 0
+        self.mean = 0.0
+        self.ssqdm = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        if len(self.window) == self.period:
+            old = self.window.popleft()
+            if old == old:
+                self.nobs -= 1
+                if self.nobs:
+                    prev_mean = self.mean - self.comp_remove
+                    y = old - self.comp_remove
+                    t = y - self.mean
+                    self.comp_remove = t + self.mean - y
+                    self.mean = self.mean - t / self.nobs
+                    self.ssqdm = self.ssqdm - (old - prev_mean) * (old - self.mean)
+                else:
+                    self.mean = self.ssqdm = 0.0
+        self.window.append(x)
+        if x == x:
+            self.nobs += 1
+            prev_mean = self.mean - self.comp_add
+            y = x - self.comp_add
+            t = y - self.mean
+            self.comp_add = t + self.mean - y
+            self.mean = self.mean + t / self.nobs
+            self.ssqdm = self.ssqdm + (x - prev_mean) * (x - self.mean)
+        if self.nobs < self.period or self.nobs < 2:
+            return NAN
+        var = self.ssqdm / (self.nobs - 1)
+        return math.sqrt(var) if var > 0 else 0.0
+
+    @classmethod
+    def from_history(cls, prices, period: int) -> 'OnlineStd':
+        """Seed with the last `period` values"""
+        std = cls(period)
+        for x in _floats(prices)[-std.period:]:
+            std.update(x)
+        return std
+
+
+class OnlineRollingExtreme:
+    """Rolling min or max over `period` bars (monotonic deque, amortized O(1))"""
+
+    def __init__(self, period: int, mode: str = 'min'):
+        self.period = int(period)
+        self.better = (lambda a, b: a <= b) if mode == 'min' else (lambda a, b: a >= b)
+        self.candidates = deque()  # (bar, value), best first
+        self.observed = deque()    # NaN-or-not flags of the window
+        self.nobs = 0
+        self.bars = 0
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        if x == x:
+            while self.candidates and self.better(x, self.candidates[-1][1]):
+                self.candidates.pop()
+            self.candidates.append((self.bars, x))
+        self.observed.append(x == x)
+        self.nobs += x == x
+        if len(self.observed) > self.period:
+            self.nobs -= self.observed.popleft()
+        self.bars += 1
+        while self.candidates and self.candidates[0][0] <= self.bars - 1 - self.period:
+            self.candidates.popleft()
+        if self.nobs < self.period:
+            return NAN
+        return self.candidates[0][1]
+
+    @classmethod
+    def from_history(cls, values, period: int, mode: str = 'min') -> 'OnlineRollingExtreme':
+        ext = cls(period, mode)
+        values = _floats(values)
+        ext.bars = max(len(values) - ext.period, 0)
+        for x in values[-ext.period:]:
+            ext.update(x)
+        return ext
+
+
+class OnlineRSI:
+    """Wilder RSI; matches Indicators.calculate_rsi (50 while warming up or flat)"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.avg_gain = OnlineEMA(alpha=1/period, min_periods=period)
+        self.avg_loss = OnlineEMA(alpha=1/period, min_periods=period)
+        self.last = None
+
+    def update(self, price: float) -> float:
+        price = float(price)
+        delta = NAN if self.last is None else price - self.last
+        self.last = price
+        g = self.avg_gain.update(delta if delta > 0 else 0.0)
+        l = self.avg_loss.update(-delta if delta < 0 else -0.0)
+        return _rsi_value(g, l)
+
+    @classmethod
+    def from_history(cls, prices, period: int = 14) -> 'OnlineRSI':
+        rsi = cls(period)
+        delta = pd.Series(np.asarray(prices, dtype='float64')).diff()
+        rsi.avg_gain = OnlineEMA.from_history(delta.where(delta > 0, 0), alpha=1/period, min_periods=period)
+        rsi.avg_loss = OnlineEMA.from_history(-delta.where(delta < 0, 0), alpha=1/period, min_periods=period)
+        rsi.last = _floats(prices)[-1]
+        return rsi
+
+
+def _rsi_value(avg_gain: float, avg_loss: float) -> float:
+    if avg_gain != avg_gain or avg_loss != avg_loss:
+        return 50.0
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else 50.0
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+class OnlineBB:
+    """Bollinger Bands; update returns {'upper', 'middle', 'lower'} like calculate_bb"""
+
+    def __init__(self, period: int = 20, std_dev: float = 2.0):
+        self.std_dev = std_dev
+        self.sma = OnlineSMA(period)
+        self.std = OnlineStd(period)
+
+    def update(self, price: float) -> Dict[str, float]:
+        middle = self.sma.update(price)
+        std = self.std.update(price)
+        return {'upper': middle + std * self.std_dev, 'middle': middle, 'lower': middle - std * self.std_dev}
+
+    @classmethod
+    def from_history(cls, prices, period: int = 20, std_dev: float = 2.0) -> 'OnlineBB':
+        bb = cls(period, std_dev)
+        bb.sma = OnlineSMA.from_history(prices, period)
+        bb.std = OnlineStd.from_history(prices, period)
+        return bb
+
+
+class OnlineATR:
+    """Average True Range (EMA of true range); matches calculate_atr"""
+
+    def __init__(self, period: int = 14):
+        self.ema = OnlineEMA(period)
+        self.prev_close = NAN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        high, low, close = float(high), float(low), float(close)
+        ranges = [r for r in (high - low, abs(high - self.prev_close), abs(low - self.prev_close)) if r == r]
+        self.prev_close = close
+        return self.ema.update(max(ranges) if ranges else NAN)
+
+    @classmethod
+    def from_history(cls, high, low, close, period: int = 14) -> 'OnlineATR':
+        atr = cls(period)
+        high, low, close = (pd.Series(np.asarray(v, dtype='float64')) for v in (high, low, close))
+        prev_close = close.shift(1)
+        tr = pd.concat([high - low, abs(high - prev_close), abs(low - prev_close)], axis=1).max(axis=1)
+        atr.ema = OnlineEMA.from_history(tr, period)
+        atr.prev_close = float(close.iloc[-1])
+        return atr
+
+
+class OnlineKC:
+    """Keltner Channels; update returns {'upper', 'middle', 'lower'} like calculate_kc"""
+
+    def __init__(self, period: int = 20, multiplier: float = 2.0):
+        self.multiplier = multiplier
+        self.ema = OnlineEMA(period)
+        self.atr = OnlineATR(period)
+
+    def update(self, high: float, low: float, close: float) -> Dict[str, float]:
+        middle = self.ema.update(close)
+        atr = self.atr.update(high, low, close)
+        return {'upper': middle + atr * self.multiplier, 'middle': middle,
+                'lower': middle - atr * self.multiplier}
+
+    @classmethod
+    def from_history(cls, high, low, close, period: int = 20, multiplier: float = 2.0) -> 'OnlineKC':
+        kc = cls(period, multiplier)
+        kc.ema = OnlineEMA.from_history(close, period)
+        kc.atr = OnlineATR.from_history(high, low, close, period)
+        return kc
+
+
+class OnlineMACD:
+    """MACD; update returns {'macd', 'signal', 'histogram'} like calculate_macd"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = OnlineEMA(fast)
+        self.slow = OnlineEMA(slow)
+        self.signal = OnlineEMA(signal)
+
+    def update(self, price: float) -> Dict[str, float]:
+        macd = self.fast.update(price) - self.slow.update(price)
+        signal = self.signal.update(macd)
+        return {'macd': macd, 'signal': signal, 'histogram': macd - signal}
+
+    @classmethod
+    def from_history(cls, prices, fast: int = 12, slow: int = 26, signal: int = 9) -> 'OnlineMACD':
+        macd = cls(fast, slow, signal)
+        batch = Indicators.calculate_macd(pd.Series(np.asarray(prices, dtype='float64')), fast, slow, signal)
+        macd.fast = OnlineEMA.from_history(prices, fast)
+        macd.slow = OnlineEMA.from_history(prices, slow)
+        macd.signal = OnlineEMA.from_history(batch['macd'], signal)
+        return macd
+
+
+class OnlineStochRSI:
+    """Stochastic RSI; update returns {'k', 'd'} like calculate_stoch_rsi"""
+
+    def __init__(self, rsi_period: int = 14, stoch_period: int = 14, k_smooth: int = 3, d_smooth: int = 3):
+        self.rsi = OnlineRSI(rsi_period)
+        self.low = OnlineRollingExtreme(stoch_period, 'min')
+        self.high = OnlineRollingExtreme(stoch_period, 'max')
+        self.k = OnlineSMA(k_smooth)
+        self.d = OnlineSMA(d_smooth)
+
+    def update(self, price: float) -> Dict[str, float]:
+        rsi = self.rsi.update(price)
+        return self._smooth(rsi, self.low.update(rsi), self.high.update(rsi))
+
+    def _smooth(self, rsi: float, low: float, high: float) -> Dict[str, float]:
+        if high - low == 0 or high != high or low != low:
+            stoch = 50.0
+        else:
+            stoch = ((rsi - low) / (high - low)) * 100
+        k = self.k.update(stoch)
+        return {'k': k, 'd': self.d.update(k)}
+
+    @classmethod
+    def from_history(cls, prices, rsi_period: int = 14, stoch_period: int = 14,
+                     k_smooth: int = 3, d_smooth: int = 3) -> 'OnlineStochRSI':
+        stoch = cls(rsi_period, stoch_period, k_smooth, d_smooth)
+        prices = pd.Series(np.asarray(prices, dtype='float64'))
+        rsi = Indicators.calculate_rsi(prices, rsi_period)
+        rsi_min = rsi.rolling(window=stoch_period, min_periods=stoch_period).min()
+        rsi_max = rsi.rolling(window=stoch_period, min_periods=stoch_period).max()
+        raw = (((rsi - rsi_min) / (rsi_max - rsi_min)) * 100).fillna(50)
+        stoch.rsi = OnlineRSI.from_history(prices, rsi_period)
+        stoch.low = OnlineRollingExtreme.from_history(rsi, stoch_period, 'min')
+        stoch.high = OnlineRollingExtreme.from_history(rsi, stoch_period, 'max')
+        stoch.k = OnlineSMA.from_history(raw, k_smooth)
+        stoch.d = OnlineSMA.from_history(Indicators.calculate_sma(raw, k_smooth), d_smooth)
+        return stoch
@@ -4,18 +4,36 @@ Downloads and caches historical data from Polygon's S3 flat files using AWS cred
 Much faster than API calls for backtesting
 """
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import boto3
 from pathlib import Path
 from datetime import datetime, timedelta
 import io
 import gzip
+import json
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION, MASSIVE_S3_ENDPOINT, MASSIVE_S3_BUCKET, DATA_CACHE_DIR
 
+BAR_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+# Appending rewrites every ticker's year file, so preload_range folds new day files in batches;
+# until then get_daily_bars reads the uncompacted tail from the day files
+COMPACT_BATCH_DAYS = 20
+
+# A day's flat file is published the next morning, so S3 misses are only remembered
+# (manifest 'missing', never asked again) for weekdays at least this old
+MISSING_DAY_MIN_AGE_DAYS = 3
+
+
 class PolygonFlatFiles:
     def __init__(self, cache_dir=None):
         self.cache_dir = Path(cache_dir) if cache_dir else DATA_CACHE_DIR
@@ -33,6 +51,10 @@ class PolygonFlatFiles:
         
         self.bucket = MASSIVE_S3_BUCKET
         
+        # Per-ticker columnar store compacted from the day files (see compact())
+        self.store_dir = self.cache_dir / 'by_ticker'
+        self._manifest_lock = threading.Lock()
+        
     def get_daily_bars(self, ticker, start_date, end_date):
         """
         Get daily bars for a ticker from flat files
@@ -43,6 +65,10 @@ class PolygonFlatFiles:
             start_date: Start date (str 'YYYY-MM-DD' or datetime)
             end_date: End date (str 'YYYY-MM-DD' or datetime)
             
+        Compacted days are read from the ticker's own store files; every other weekday
+        (not compacted yet) goes through the whole-market day files, except days S3 is
+        known not to have
+            
         Returns:
             DataFrame with columns: date, open, high, low, close, volume
         """
@@ -53,9 +79,21 @@ class PolygonFlatFiles:
         
         # Collect all data
         all_data = []
+        manifest = self._load_manifest()
+        compacted = set(manifest['dates'])
+        missing = set(manifest.get('missing', []))
+        if compacted:
+            stored = self._read_store(ticker, start_date, end_date)
+            if stored is not None:
+                all_data.append(stored)
         current_date = start_date
         
         while current_date <= end_date:
+            day = current_date.strftime('%Y-%m-%d')
+            if current_date.weekday() >= 5 or day in compacted or day in missing:
+                current_date += timedelta(days=1)
+                continue
+            
             # Download or load from cache
             df = self._get_day_file(current_date)
             if df is not None and ticker in df['ticker'].values:
@@ -86,6 +124,74 @@ class PolygonFlatFiles:
             'volume': 'Volume'
         })
     
+    def get_daily_panel(self, tickers, start_date, end_date, workers=8):
+        """
+        Get daily bars for many tickers from one pass over the day files
+        Each weekday file is read once (only the bar columns, cached files in parallel)
+        and filtered to the requested tickers, then pivoted to dates x tickers
+        
+        Args:
+            tickers: List of stock symbols
+            start_date: Start date (str 'YYYY-MM-DD' or datetime)
+            end_date: End date (str 'YYYY-MM-DD' or datetime)
+            workers: Threads reading day files
+            
+        Returns:
+            DataFrame indexed by date with (field, ticker) columns, fields Open/High/Low/Close/Volume;
+            NaN where a ticker has no bar, tickers never seen are left out
+        """
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, '%Y-%m-%d')
+        if isinstance(end_date, str):
+            end_date = datetime.strptime(end_date, '%Y-%m-%d')
+        
+        dates = []
+        missing = set(self._load_manifest().get('missing', []))
+        current_date = start_date
+        while current_date <= end_date:
+            # no day files on weekends or on days S3 is known not to have
+            if current_date.weekday() < 5 and current_date.strftime('%Y-%m-%d') not in missing:
+                dates.append(current_date)
+            current_date += timedelta(days=1)
+        
+        tickers = list(dict.fromkeys(tickers))
+        wanted = pa.array(tickers, type=pa.string())
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            days = list(pool.map(lambda date: self._get_day_bars(date, wanted), dates))
+        
+        # Fill dates x tickers matrices straight from the filtered day tables
+        columns = pd.Index(tickers)
+        rows = [(date, day) for date, day in zip(dates, days) if day is not None]
+        if not rows:
+            return pd.DataFrame()
+        matrices = {field: np.full((len(rows), len(tickers)), np.nan) for field in BAR_FIELDS}
+        for i, (_, day) in enumerate(rows):
+            cols = columns.get_indexer(day['ticker'].to_numpy(zero_copy_only=False))
+            for field in BAR_FIELDS:
+                matrices[field][i, cols] = day[field].to_numpy(zero_copy_only=False)
+        
+        seen = ~np.isnan(matrices['close']).all(axis=0)
+        index = pd.DatetimeIndex([pd.Timestamp(date.date()) for date, _ in rows], name='date')
+        return pd.concat({field.capitalize(): pd.DataFrame(matrix[:, seen], index=index, columns=columns[seen])
+                          for field, matrix in matrices.items()}, axis=1)
+    
+    def _get_day_bars(self, date, tickers):
+        """ticker + OHLCV columns of one day file filtered to tickers (pyarrow Table), cache first"""
+        columns = ['ticker'] + BAR_FIELDS
+        cache_file = self.cache_dir / f"{date.strftime('%Y-%m-%d')}.parquet"
+        table = None
+        if cache_file.exists():
+            try:
+                table = pq.read_table(cache_file, columns=columns)
+            except Exception:
+                pass  # fall through to _get_day_file, which re-downloads
+        if table is None:
+            df = self._get_day_file(date)
+            if df is None:
+                return None
+            table = pa.Table.from_pandas(df[columns], preserve_index=False)
+        return table.filter(pc.is_in(table['ticker'], value_set=tickers))
+    
     def _get_day_file(self, date):
         """Download or load a single day's flat file from S3 using AWS credentials"""
         # Check cache first
@@ -121,11 +227,118 @@ class PolygonFlatFiles:
             
         except self.s3_client.exceptions.NoSuchKey:
             print(f"[POLYGON] No data available for {date.strftime('%Y-%m-%d')} (weekend/holiday)")
+            if (datetime.now() - date).days >= MISSING_DAY_MIN_AGE_DAYS:
+                self._update_manifest('missing', [date.strftime('%Y-%m-%d')])
             return None
         except Exception as e:
             print(f"[POLYGON] Error downloading {date}: {e}")
             return None
     
+    # ---- Per-ticker store: by_ticker/<TICKER>/<year>.parquet, sorted by date ----
+    
+    def compact(self, min_new_days=1):
+        """
+        Fold cached day files into the per-ticker store
+        Only day files not compacted yet are read, so after new downloads this is an
+        incremental append. The store then serves exactly the days listed in the manifest;
+        days without a compacted file still go through the day files
+        
+        Args:
+            min_new_days: Do nothing until at least this many day files are pending
+            
+        Returns:
+            Number of day files added
+        """
+        done = set(self._load_manifest()['dates'])
+        new = sorted(p for p in self.cache_dir.glob('????-??-??.parquet') if p.stem not in done)
+        if len(new) < min_new_days:
+            return 0
+        
+        for year in sorted({p.stem[:4] for p in new}):
+            files = [p for p in new if p.stem[:4] == year]
+            days = []
+            for path in files:
+                try:
+                    df = pd.read_parquet(path, columns=['ticker', 'window_start'] + BAR_FIELDS)
+                except Exception as e:
+                    print(f"[POLYGON] Skipping unreadable {path.name}: {e}")
+                    continue
+                df['date'] = pd.to_datetime(pd.to_datetime(df['window_start'], unit='ns').dt.date)
+                df[BAR_FIELDS] = df[BAR_FIELDS].astype('float64')  # older files have integer volume
+                days.append(df.drop(columns='window_start'))
+                done.add(path.stem)
+            if days:
+                self._append_year(year, pd.concat(days, ignore_index=True))
+            self._update_manifest('dates', done)
+            print(f"[POLYGON] Compacted {len(days)} day files for {year}")
+        
+        return len(new)
+    
+    def _append_year(self, year, bars):
+        """Merge one year of bars (ticker, date, OHLCV) into each ticker's year file"""
+        bars = bars.sort_values(['ticker', 'date'], kind='stable')
+        table = pa.Table.from_pandas(bars.drop(columns='ticker'), preserve_index=False)
+        tickers = bars['ticker'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, tickers[1:] != tickers[:-1]])
+        ends = np.r_[starts[1:], len(tickers)]
+        
+        # Zero-copy slice per ticker, concatenated onto the existing year file (re-sorted only
+        # when back-filling older days). The manifest is saved after the whole year, so a crash
+        # in between can leave days in some files that are compacted again: those are replaced
+        for ticker, start, end in zip(tickers[starts], starts, ends):
+            path = self._store_file(ticker, year)
+            part = table.slice(start, end - start)
+            if path.exists():
+                stored = pq.read_table(path)
+                part = part.cast(stored.schema)
+                stored = stored.filter(pc.invert(pc.is_in(stored['date'], value_set=part['date'])))
+                backfill = stored.num_rows and part['date'][0].as_py() < stored['date'][-1].as_py()
+                part = pa.concat_tables([stored, part])
+                if backfill:
+                    part = part.sort_by('date')
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(part, path)
+    
+    def _read_store(self, ticker, start_date, end_date):
+        """Stored bars of one ticker between two dates, shaped like the day-file rows"""
+        frames = []
+        for year in range(start_date.year, end_date.year + 1):
+            path = self._store_file(ticker, str(year))
+            if path.exists():
+                frames.append(pd.read_parquet(path))
+        if not frames:
+            return None
+        df = pd.concat(frames, ignore_index=True)
+        df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+        if df.empty:
+            return None
+        return df.assign(date=df['date'].dt.date)
+    
+    def _store_file(self, ticker, year):
+        return self.store_dir / ticker.replace('/', '_') / f"{year}.parquet"
+    
+    def _load_manifest(self):
+        path = self.store_dir / 'manifest.json'
+        if not path.exists():
+            return {'dates': []}
+        with open(path) as f:
+            return json.load(f)
+    
+    def _update_manifest(self, key, days):
+        """Add days to one manifest list; compact() and S3 misses (from threads) share the file"""
+        with self._manifest_lock:
+            manifest = self._load_manifest()
+            manifest[key] = sorted(set(manifest.get(key, [])) | set(days))
+            self._save_manifest(manifest)
+    
+    def _save_manifest(self, manifest):
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.store_dir / 'manifest.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        tmp.replace(self.store_dir / 'manifest.json')
+    
     def preload_range(self, start_date, end_date):
         """
         Pre-download a date range for faster subsequent access
@@ -139,8 +352,13 @@ class PolygonFlatFiles:
         current_date = start_date
         downloaded = 0
         cached = 0
+        missing = set(self._load_manifest().get('missing', []))
         
         while current_date <= end_date:
+            if current_date.weekday() >= 5 or current_date.strftime('%Y-%m-%d') in missing:
+                current_date += timedelta(days=1)
+                continue
+            
             cache_file = self.cache_dir / f"{current_date.strftime('%Y-%m-%d')}.parquet"
             
             if cache_file.exists():
@@ -152,6 +370,9 @@ class PolygonFlatFiles:
             current_date += timedelta(days=1)
         
         print(f"[POLYGON] Preload complete: {downloaded} downloaded, {cached} from cache")
+        
+        # Append the new day files to the per-ticker store
+        self.compact(min_new_days=COMPACT_BATCH_DAYS)
 
 
 # Example usage
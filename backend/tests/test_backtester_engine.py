@@ -0,0 +1,816 @@
+#!/usr/bin/env python3
+"""
+Parity tests: vectorized engine kernel vs reference per-bar loop (backtester/engine.py)
+"""
+import json
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backtester.settings import CONFIG
+from backtester.engine import run_symbol, run_grid
+from backtester.grid import rsi_param_grid
+from backtester.indicators import (
+    rsi_sma, rsi_sma_batch, rsi_sma_state, compute_basic, compute_basic_batch, OnlineRsiSma,
+)
+from backtester.parallel import iter_grid, iter_grid_top, grid_pool
+from backtester import parallel as parallel_mod
+from backtester.search import successive_halving, iter_halving
+from backtester.portfolio_engine import (
+    simulate_portfolio, _simulate_portfolio_loop, rebalance_schedule, run_portfolio_kernel, iter_prices,
+)
+from backtester import data as data_mod
+from backtester.portfolio_grid import iter_portfolio_grid
+from backtester.universe import load_universe, simulate_universe
+from backtester import universe as universe_mod
+from backtester.walkforward import iter_walk_forward, walk_forward_windows
+from backtester.montecarlo import monte_carlo
+from backtester import db as bt_db
+import run_backtest as driver
+
+
+def _sample_bars(n=1500, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    idx = pd.date_range('2000-01-03', periods=n, freq='B', tz='UTC')
+    return pd.DataFrame({
+        'Open': open_.astype('float32'),
+        'High': (np.maximum(open_, close) * 1.01).astype('float32'),
+        'Low': (np.minimum(open_, close) * 0.99).astype('float32'),
+        'Close': close.astype('float32'),
+        'Volume': np.full(n, 1e6),
+    }, index=idx)
+
+
+def _assert_same(a, b):
+    assert np.array_equal(a['equity'].to_numpy(), b['equity'].to_numpy())
+    assert a['equity'].index.equals(b['equity'].index)
+    assert a['events'] == b['events']
+    for k, v in a['metrics'].items():
+        w = b['metrics'][k]
+        if isinstance(v, float) and np.isnan(v):
+            assert np.isnan(w), k
+        else:
+            assert v == w, k
+
+
+def test_kernel_matches_loop():
+    df = _sample_bars()
+    saved = CONFIG['ORDER_TYPE']
+    try:
+        for order_type in ('MOO', 'MOC'):
+            CONFIG['ORDER_TYPE'] = order_type
+            for buy, sell in [(30, 70), (45, 55), (5, 95), (40, 60)]:
+                params = dict(rsi_period=14, rsi_buy_below=buy, rsi_sell_above=sell)
+                _assert_same(run_symbol(df, engine='vectorized', **params),
+                             run_symbol(df, engine='loop', **params))
+    finally:
+        CONFIG['ORDER_TYPE'] = saved
+
+
+def test_kernel_matches_loop_rsi_bb():
+    df = _sample_bars(seed=11)
+    params = dict(rsi_period=10, rsi_bb_period=20, rsi_bb_std_dev=1.5, use_rsi_bb=True)
+    _assert_same(run_symbol(df, engine='vectorized', **params),
+                 run_symbol(df, engine='loop', **params))
+
+
+def test_kernel_unaffordable_entry():
+    df = _sample_bars(n=300)
+    saved = CONFIG['INITIAL_CAPITAL']
+    CONFIG['INITIAL_CAPITAL'] = 50.0  # around one share: many entries are skipped
+    try:
+        params = dict(rsi_period=14, rsi_buy_below=45, rsi_sell_above=55)
+        res = run_symbol(df, engine='vectorized', **params)
+        _assert_same(res, run_symbol(df, engine='loop', **params))
+    finally:
+        CONFIG['INITIAL_CAPITAL'] = saved
+
+
+def test_run_grid_matches_per_param_runs():
+    df = _sample_bars(n=800)
+    cfg = {'RSI_PERIOD': [10, 14], 'RSI_BUY_BELOW': [25, 35], 'RSI_SELL_ABOVE': [65, 75]}
+    params_list = rsi_param_grid(cfg)
+    out = list(run_grid(df, params_list))
+    assert [p for p, _ in out] == params_list
+    for params, res in out:
+        _assert_same(res, run_symbol(df, **params))
+
+
+def test_rsi_sma_batch_matches_single():
+    df = _sample_bars(n=600, seed=11)
+    periods = [2, 7, 14, 30, 599, 600, 900]
+    batch = rsi_sma_batch(df['Close'], periods)
+    assert batch.shape == (len(periods), len(df)) and batch.dtype == np.float32
+    for row, period in zip(batch, periods):
+        assert np.array_equal(row, rsi_sma(df['Close'], period).to_numpy(), equal_nan=True)
+
+    params_list = rsi_param_grid({'RSI_PERIOD': [10, 14], 'USE_RSI_BB': True, 'RSI_BB_PERIOD': [20], 'RSI_BB_STD_DEV': [2.0]})
+    for key, ind in compute_basic_batch(df, params_list).items():
+        ref = compute_basic(df, rsi_period=key[0], rsi_bb_period=key[1], rsi_bb_std_dev=key[2])
+        assert list(ind) == list(ref) and all(ind[k].equals(ref[k]) for k in ref)
+
+
+def test_online_rsi_sma_matches_batch():
+    close = _sample_bars(n=500, seed=13)['Close']
+    full = rsi_sma(close, 14).to_numpy()
+    online = OnlineRsiSma(14)
+    assert np.array_equal([online.update(c) for c in close], full, equal_nan=True)
+
+    # warm start from the batch state of the first 300 bars
+    warm = OnlineRsiSma(14, rsi_sma_state(close.iloc[:300], 14))
+    assert np.array_equal([warm.update(c) for c in close.iloc[300:]], full[300:], equal_nan=True)
+    assert warm.state()["bars"] == len(close)
+
+
+def test_batch_engine_matches_kernel():
+    df = _sample_bars(n=1200, seed=3)
+    cfg = {'RSI_PERIOD': [14], 'RSI_BUY_BELOW': [5, 20, 33.3, 45], 'RSI_SELL_ABOVE': [55, 66.6, 80, 95]}
+    params_list = rsi_param_grid(cfg)
+    batched = list(run_grid(df, params_list, engine='batch'))
+    assert [p for p, _ in batched] == params_list
+    for params, res in batched:
+        _assert_same(res, run_symbol(df, engine='vectorized', **params))
+
+
+def test_parallel_grid_matches_serial():
+    dfs = {'AAA': _sample_bars(n=900, seed=1), 'BBB': _sample_bars(n=700, seed=2)}
+    cfg = {'RSI_PERIOD': [10, 14], 'RSI_BUY_BELOW': [25, 35], 'RSI_SELL_ABOVE': [65, 75]}
+    params_list = rsi_param_grid(cfg)
+    serial = list(iter_grid(dfs, ['AAA', 'BBB'], params_list, workers=1))
+    parallel = list(iter_grid(dfs, ['AAA', 'BBB'], params_list, workers=2))
+    assert [(s, p) for s, p, _ in serial] == [(s, p) for s, p, _ in parallel]
+    for (_, _, a), (_, _, b) in zip(serial, parallel):
+        _assert_same(a, b)
+
+
+def _worker_segments():
+    return len(parallel_mod._ATTACHED), len(parallel_mod._FRAMES)
+
+
+def test_reused_pool_drops_finished_sweeps():
+    dfs = {s: _sample_bars(n=300, seed=k) for k, s in enumerate(['AAA', 'BBB', 'CCC'])}
+    params_list = rsi_param_grid({'RSI_PERIOD': [14], 'RSI_BUY_BELOW': [30], 'RSI_SELL_ABOVE': [70]})
+    with grid_pool(1) as pool:
+        for sym in dfs:
+            list(iter_grid(dfs, [sym], params_list, workers=2, pool=pool))
+        # one frame (5 columns + index) stays mapped, not one per finished sweep
+        assert pool.submit(_worker_segments).result() == (6, 1)
+
+
+def test_metrics_only_matches_full_metrics():
+    df = _sample_bars(n=1000, seed=5)
+    params_list = rsi_param_grid({'RSI_PERIOD': [14], 'RSI_BUY_BELOW': [20, 30, 40],
+                                  'RSI_SELL_ABOVE': [60, 70, 80]})
+    for engine in ('vectorized', 'batch'):
+        fast = list(run_grid(df, params_list, engine=engine, metrics_only=True))
+        full = list(run_grid(df, params_list, engine=engine))
+        for (_, a), (_, b) in zip(fast, full):
+            assert a['equity'] is None and a['events'] is None
+            for k, v in b['metrics'].items():
+                w = a['metrics'][k]
+                if v is None or w is None:
+                    assert v is w, k
+                else:
+                    assert np.isclose(v, w, rtol=1e-9, equal_nan=True), k
+
+
+def test_grid_top_reruns_only_top_combos():
+    dfs = {'AAA': _sample_bars(n=900, seed=1)}
+    params_list = rsi_param_grid({'RSI_PERIOD': [14], 'RSI_BUY_BELOW': [20, 30, 40],
+                                  'RSI_SELL_ABOVE': [60, 70, 80]})
+    out = list(iter_grid_top(dfs, ['AAA'], params_list, workers=1))
+    assert [p for _, p, _ in out] == params_list
+    full = [res for _, _, res in out if res['equity'] is not None]
+    assert 1 <= len(full) <= CONFIG['PRINT_TOP_K']
+    best = max(r['metrics']['total_return'] for _, _, r in out)
+    assert any(r['metrics']['total_return'] == best for r in full)
+
+
+def test_successive_halving():
+    df = _sample_bars(n=1500, seed=9)
+    params_list = rsi_param_grid({'RSI_PERIOD': [10, 14], 'RSI_BUY_BELOW': [20, 30, 40],
+                                  'RSI_SELL_ABOVE': [60, 70, 80]})
+    a = successive_halving(df, params_list, eta=3, min_bars=200, keep=2, seed=1, workers=1)
+    b = successive_halving(df, params_list, eta=3, min_bars=200, keep=2, seed=1, workers=1)
+    assert a == b
+    assert [r['bars'] for r in a['rungs']] == [200, 600, 1500]
+    assert [r['candidates'] for r in a['rungs']] == [18, 6, 2]
+    assert a['bar_evals'] == 200 * 18 + 600 * 6 + 1500 * 2
+    assert a['saved_bar_evals'] == 1500 * 18 - a['bar_evals']
+    assert all(p in params_list for p in a['survivors'])
+
+    # the full-length rung's full-mode runs are the survivors' results: no second pass
+    c = successive_halving(df, params_list, eta=3, min_bars=200, keep=2, seed=1, workers=1, full_results=True)
+    results = c.pop('results')
+    assert c == a
+    ref = list(run_grid(df, a['survivors']))
+    assert [p for p, _ in results] == [p for p, _ in ref]
+    for (_, r), (_, q) in zip(results, ref):
+        _assert_same(r, q)
+    serial = list(iter_halving({'AAA': df, 'BBB': _sample_bars(n=900, seed=3)}, ['AAA', 'BBB'], params_list, workers=1))
+    pooled = list(iter_halving({'AAA': df, 'BBB': _sample_bars(n=900, seed=3)}, ['AAA', 'BBB'], params_list, workers=2))
+    assert [(s, p) for s, p, _ in serial] == [(s, p) for s, p, _ in pooled]
+    for (_, _, r), (_, _, q) in zip(serial, pooled):
+        _assert_same(r, q)
+
+    # a first rung covering the whole history is the plain grid
+    full = successive_halving(df, params_list, min_bars=len(df), workers=1)
+    assert full['survivors'] == params_list and full['saved_bar_evals'] == 0
+
+
+def test_resume_matches_full_run():
+    df = _sample_bars(n=1200, seed=4)
+    params = dict(rsi_period=14, rsi_buy_below=40, rsi_sell_above=60)
+    full = run_symbol(df, **params)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = bt_db.init_db(tmp)
+        for cut in (10, 600, 1199):
+            first = run_symbol(df.iloc[:cut], return_state=True, **params)
+            bt_db.save_engine_state(db_file, 'r1', 'AAA', params, first['state'])
+            state = bt_db.load_engine_state(db_file, 'r1', 'AAA', params)
+            step = run_symbol(df.iloc[cut:cut + 1], state=state, return_state=True, **params)
+            rest = run_symbol(df.iloc[cut + 1:], state=step['state'], **params)
+            _assert_same(full, rest)
+            assert step['events'] == [e for e in full['events'] if e['ts'] <= df.index[cut]]
+
+
+def test_portfolio_resume_matches_full_run():
+    data = {s: _sample_bars(n=600, seed=k) for k, s in enumerate(['AAA', 'BBB', 'SPY'])}
+    data['BBB'] = data['BBB'].drop(data['BBB'].index[[50, 320]])
+    idx = data['AAA'].index
+
+    def adapter_until(cut):
+        def adapter(sym, start=None, end=None):
+            df = data[sym]
+            if start:
+                df = df[df.index >= pd.Timestamp(start, tz='UTC')]
+            return df[df.index < cut]
+        return adapter
+
+    keys = ['TICKERS', 'PORTFOLIO_STRATEGIES', 'PORTFOLIO_WEIGHTS', 'BENCHMARK_ENABLED',
+            'BENCHMARK_SYMBOL', 'START', 'END']
+    saved = {k: CONFIG.get(k) for k in keys}
+    CONFIG.update(
+        TICKERS=['AAA', 'BBB'], PORTFOLIO_WEIGHTS=None, START=None, END=None,
+        BENCHMARK_ENABLED=True, BENCHMARK_SYMBOL='SPY',
+        PORTFOLIO_STRATEGIES={'AAA': dict(rsi_period=14, rsi_buy_below=35, rsi_sell_above=65),
+                              'BBB': dict(rsi_period=5, rsi_buy_below=30, rsi_sell_above=70)},
+    )
+    try:
+        full = simulate_portfolio(adapter_until(idx[-1] + pd.Timedelta(days=1)))
+        first = simulate_portfolio(adapter_until(idx[300]), return_state=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = bt_db.init_db(tmp)
+            bt_db.save_engine_state(db_file, 'p1', bt_db.PORTFOLIO_STATE_TICKER, {}, first.state)
+            state = bt_db.load_engine_state(db_file, 'p1', bt_db.PORTFOLIO_STATE_TICKER)
+        res = simulate_portfolio(adapter_until(idx[-1] + pd.Timedelta(days=1)), state=state)
+        for a, b in [(res.equity, full.equity), (res.buyhold_equity, full.buyhold_equity),
+                     (res.benchmark_equity, full.benchmark_equity)]:
+            assert a.equals(b) and a.index.equals(b.index)
+        for t in full.per_ticker_equity:
+            assert res.per_ticker_equity[t].equals(full.per_ticker_equity[t])
+            assert np.array_equal(res.per_ticker_positions[t], full.per_ticker_positions[t])
+        assert res.positions.dtype == full.positions.dtype and np.array_equal(res.positions, full.positions)
+        assert state['positions_history'].shape == (len(first.equity), 2)  # one matrix, not a series per ticker
+        assert res.trades == full.trades
+        for k, v in full.metrics.items():
+            w = res.metrics[k]
+            assert v == w or (np.isnan(v) and np.isnan(w)), k
+    finally:
+        CONFIG.update(saved)
+
+
+def test_portfolio_matrix_matches_loop():
+    data = {s: _sample_bars(n=700, seed=k + 10).astype({'Close': 'float64'})
+            for k, s in enumerate(['AAA', 'BBB', 'CCC', 'SPY'])}
+    data['CCC'] = data['CCC'].drop(data['CCC'].index[[3, 90, 91, 400]])
+
+    def adapter(sym, start=None, end=None):
+        return data[sym]
+
+    keys = ['TICKERS', 'PORTFOLIO_STRATEGIES', 'PORTFOLIO_WEIGHTS', 'BENCHMARK_ENABLED', 'BENCHMARK_SYMBOL',
+            'START', 'END', 'ENTRY_FEES_BPS', 'EXIT_FEES_BPS', 'SLIP_OPEN_BPS', 'SLIP_CLOSE_BPS']
+    saved = {k: CONFIG.get(k) for k in keys}
+    CONFIG.update(
+        TICKERS=['AAA', 'BBB', 'CCC'], PORTFOLIO_WEIGHTS={'AAA': 0.5, 'BBB': 0.3, 'CCC': 0.4},
+        START=None, END=None, BENCHMARK_ENABLED=True, BENCHMARK_SYMBOL='SPY',
+        ENTRY_FEES_BPS=2, EXIT_FEES_BPS=3, SLIP_OPEN_BPS=1, SLIP_CLOSE_BPS=4,
+        PORTFOLIO_STRATEGIES={'AAA': dict(rsi_period=14, rsi_buy_below=40, rsi_sell_above=60),
+                              'BBB': dict(rsi_period=7, rsi_buy_below=30, rsi_sell_above=70),
+                              'CCC': dict(rsi_period=3, rsi_buy_below=35, rsi_sell_above=65)},
+    )
+    try:
+        res = simulate_portfolio(adapter)
+        ref = _simulate_portfolio_loop(adapter)
+        for a, b in [(res.equity, ref.equity), (res.buyhold_equity, ref.buyhold_equity),
+                     (res.benchmark_equity, ref.benchmark_equity)]:
+            assert a.equals(b) and a.index.equals(b.index)
+        for t in ref.per_ticker_equity:
+            assert res.per_ticker_equity[t].equals(ref.per_ticker_equity[t])
+            assert np.array_equal(res.per_ticker_positions[t], ref.per_ticker_positions[t])
+        assert len(res.trades) > 20 and res.trades == ref.trades
+        for k, v in ref.metrics.items():
+            w = res.metrics[k]
+            assert v == w or (np.isnan(v) and np.isnan(w)), k
+    finally:
+        CONFIG.update(saved)
+
+
+def test_portfolio_grid_matches_simulate():
+    data = {s: _sample_bars(n=500, seed=k + 20).astype({'Close': 'float64'})
+            for k, s in enumerate(['AAA', 'BBB', 'SPY'])}
+
+    def adapter(sym, start=None, end=None):
+        return data[sym]
+
+    grid = {'AAA': [dict(rsi_period=14, rsi_buy_below=35, rsi_sell_above=65),
+                    dict(rsi_period=7, rsi_buy_below=30, rsi_sell_above=70)],
+            'BBB': [dict(rsi_period=7, rsi_buy_below=40, rsi_sell_above=60),
+                    dict(rsi_period=7, rsi_buy_below=25, rsi_sell_above=75),
+                    dict(rsi_period=21, rsi_buy_below=35, rsi_sell_above=65)]}
+    keys = ['TICKERS', 'PORTFOLIO_STRATEGIES', 'PORTFOLIO_PARAM_GRID', 'PORTFOLIO_WEIGHTS',
+            'BENCHMARK_ENABLED', 'BENCHMARK_SYMBOL', 'START', 'END']
+    saved = {k: CONFIG.get(k) for k in keys}
+    CONFIG.update(TICKERS=['AAA', 'BBB'], PORTFOLIO_PARAM_GRID=grid, PORTFOLIO_WEIGHTS=None,
+                  START=None, END=None, BENCHMARK_ENABLED=True, BENCHMARK_SYMBOL='SPY')
+    try:
+        seen = []
+        serial = list(iter_portfolio_grid(adapter, workers=1, report=lambda *a: seen.append(a)))
+        parallel = list(iter_portfolio_grid(adapter, workers=2))
+        assert seen == [(6, 4, 1)]  # AAA: 14, 7 / BBB: 7, 21
+        assert [c for c, _, _ in serial] == list(range(6))
+        assert [s for _, s, _ in serial] == [s for _, s, _ in parallel]
+        for (combo_id, strategies, m), (_, _, mp) in zip(serial, parallel):
+            CONFIG['PORTFOLIO_STRATEGIES'] = strategies
+            full = simulate_portfolio(adapter).metrics
+            assert set(m) == set(full) and set(mp) == set(full)
+            for k, v in full.items():
+                assert v == m[k] == mp[k] or (np.isnan(v) and np.isnan(m[k]) and np.isnan(mp[k])), k
+    finally:
+        CONFIG.update(saved)
+
+
+def test_universe_matches_portfolio():
+    universe = load_universe('spy503.csv')
+    assert len(universe) == 502 and 'BRK-B' in universe and 'MMM' in universe
+    tickers = universe[:12]
+    data = {t: _sample_bars(n=400, seed=k + 40).astype({'Close': 'float64'}) for k, t in enumerate(tickers)}
+
+    def adapter(sym, start=None, end=None):
+        if sym == tickers[3]:
+            raise ValueError(f"No data for {sym}")
+        return data[sym]
+
+    keys = ['TICKERS', 'PORTFOLIO_STRATEGIES', 'PORTFOLIO_WEIGHTS', 'PORTFOLIO_UNIVERSE_STRATEGY',
+            'BENCHMARK_ENABLED', 'START', 'END', 'UNIVERSE_REPORT_EVERY', 'RESUME_FROM_RUN']
+    saved = {k: CONFIG.get(k) for k in keys}
+    default = dict(rsi_period=7, rsi_buy_below=35, rsi_sell_above=65)
+    CONFIG.update(PORTFOLIO_STRATEGIES={tickers[0]: dict(rsi_period=14, rsi_buy_below=40, rsi_sell_above=60)},
+                  PORTFOLIO_UNIVERSE_STRATEGY=default, PORTFOLIO_WEIGHTS={'SPY': 1.0},
+                  BENCHMARK_ENABLED=False, START=None, END=None, UNIVERSE_REPORT_EVERY=5)
+    try:
+        res = simulate_universe(adapter, tickers)
+        assert list(res.skipped) == [tickers[3]]
+        assert [(c['stage'], c['tickers']) for c in res.scaling] == \
+            [('load', 5), ('load', 10), ('align', 11), ('simulate', 11)]
+
+        loaded = [t for t in tickers if t != tickers[3]]
+        CONFIG.update(TICKERS=loaded, PORTFOLIO_WEIGHTS=None,
+                      PORTFOLIO_STRATEGIES={t: CONFIG['PORTFOLIO_STRATEGIES'].get(t, default) for t in loaded})
+        full = simulate_portfolio(adapter)
+        assert res.equity.equals(full.equity) and res.trades == full.trades
+        assert list(res.per_ticker_equity) == loaded
+
+        CONFIG['RESUME_FROM_RUN'] = 'r0'
+        try:
+            simulate_universe(adapter, tickers)
+            assert False, "universe runs cannot resume"
+        except ValueError as e:
+            assert 'RESUME_FROM_RUN' in str(e)
+    finally:
+        CONFIG.update(saved)
+
+    # resource is Unix-only; the universe module must still import and report without it
+    rss = sys.modules.get('resource')
+    sys.modules['resource'] = None
+    try:
+        assert np.isnan(universe_mod.peak_rss_mb())
+    finally:
+        if rss is None:
+            del sys.modules['resource']
+        else:
+            sys.modules['resource'] = rss
+
+
+def test_portfolio_concurrent_load():
+    data = {s: _sample_bars(n=500, seed=k + 80).astype({'Close': 'float64'})
+            for k, s in enumerate(['AAA', 'BBB', 'CCC', 'QQQ'])}
+    lock, active, peak = threading.Lock(), [0], [0]
+
+    def adapter(sym, start=None, end=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            time.sleep(0.05)
+            if sym == 'CCC':
+                raise ConnectionError("timeout")
+            return data[sym]
+        finally:
+            with lock:
+                active[0] -= 1
+
+    keys = ['TICKERS', 'PORTFOLIO_STRATEGIES', 'PORTFOLIO_WEIGHTS', 'BENCHMARK_ENABLED', 'BENCHMARK_SYMBOL',
+            'START', 'END', 'PORTFOLIO_LOAD_WORKERS']
+    saved = {k: CONFIG.get(k) for k in keys}
+    strat = dict(rsi_period=10, rsi_buy_below=40, rsi_sell_above=60)
+    CONFIG.update(TICKERS=['AAA', 'BBB', 'CCC'], PORTFOLIO_STRATEGIES={t: strat for t in ['AAA', 'BBB', 'CCC']},
+                  PORTFOLIO_WEIGHTS={'AAA': 0.5, 'BBB': 0.25, 'CCC': 0.25}, BENCHMARK_ENABLED=True,
+                  BENCHMARK_SYMBOL='QQQ', START=None, END=None, PORTFOLIO_LOAD_WORKERS=4)
+    try:
+        res = simulate_portfolio(adapter)
+        assert peak[0] > 1
+        assert res.load_summary.loaded == ['AAA', 'BBB', 'QQQ']
+        assert res.load_summary.failed == {'CCC': 'ConnectionError: timeout'}
+        assert list(res.per_ticker_equity) == ['AAA', 'BBB'] and res.benchmark_equity is not None
+
+        CONFIG.update(TICKERS=['AAA', 'BBB'], PORTFOLIO_WEIGHTS={'AAA': 0.5 / 0.75, 'BBB': 0.25 / 0.75},
+                      PORTFOLIO_LOAD_WORKERS=1)
+        ref = simulate_portfolio(adapter)
+        assert res.equity.equals(ref.equity) and res.trades == ref.trades
+        assert res.benchmark_equity.equals(ref.benchmark_equity)
+        assert list(res.weights) == ['AAA', 'BBB'] and res.weights == ref.weights
+
+        # the benchmark failing only drops its curve; every ticker failing is an error
+        CONFIG.update(BENCHMARK_SYMBOL='CCC')
+        assert simulate_portfolio(adapter).benchmark_equity is None
+        CONFIG.update(TICKERS=['CCC'], PORTFOLIO_WEIGHTS=None)
+        try:
+            simulate_portfolio(adapter)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError when no symbol loads")
+    finally:
+        CONFIG.update(saved)
+
+
+def test_yfinance_downloads_run_one_at_a_time():
+    lock, active, peak = threading.Lock(), [0], [0]
+
+    def download(symbol, **kw):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        idx = pd.date_range('2020-01-01', periods=3, name='Date')
+        return pd.DataFrame({'Close': [float(ord(symbol[0]))] * 3}, index=idx)
+
+    saved, yf_download = CONFIG.get('DATA_DIR'), data_mod.yf.download
+    data_mod.yf.download = download
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            CONFIG['DATA_DIR'] = tmp  # no local CSVs: every symbol goes to yfinance
+            prices = dict(iter_prices(data_mod.get_data, ['AAA', 'BBB', 'CCC', 'DDD'], None, None, workers=4))
+    finally:
+        data_mod.yf.download = yf_download
+        CONFIG['DATA_DIR'] = saved
+    assert peak[0] == 1
+    assert list(prices) == ['AAA', 'BBB', 'CCC', 'DDD']
+    assert all((df['close'] == ord(s[0])).all() for s, df in prices.items())
+
+
+def test_portfolio_union_calendar():
+    data = {s: _sample_bars(n=600, seed=k + 60).astype({'Close': 'float64'})
+            for k, s in enumerate(['AAA', 'BBB', 'CCC'])}
+
+    def adapter(sym, start=None, end=None):
+        return data[sym]
+
+    keys = ['TICKERS', 'PORTFOLIO_STRATEGIES', 'PORTFOLIO_WEIGHTS', 'PORTFOLIO_CALENDAR',
+            'BENCHMARK_ENABLED', 'START', 'END']
+    saved = {k: CONFIG.get(k) for k in keys}
+    CONFIG.update(TICKERS=['AAA', 'BBB', 'CCC'], PORTFOLIO_WEIGHTS=None, BENCHMARK_ENABLED=False,
+                  START=None, END=None,
+                  PORTFOLIO_STRATEGIES={t: dict(rsi_period=5, rsi_buy_below=40, rsi_sell_above=60)
+                                        for t in ['AAA', 'BBB', 'CCC']})
+    try:
+        # identical calendars: union == intersection
+        CONFIG['PORTFOLIO_CALENDAR'] = 'intersection'
+        inter = simulate_portfolio(adapter)
+        CONFIG['PORTFOLIO_CALENDAR'] = 'union'
+        union = simulate_portfolio(adapter)
+        assert union.equity.equals(inter.equity) and union.trades == inter.trades
+        assert union.buyhold_equity.equals(inter.buyhold_equity)
+
+        # BBB lists late, CCC has a gap and delists early
+        idx = data['AAA'].index
+        data['BBB'] = data['BBB'].iloc[200:]
+        data['CCC'] = data['CCC'].iloc[:450].drop(idx[300:310])
+        res = simulate_portfolio(adapter)
+        assert res.equity.index.equals(idx)
+        gap, late = set(idx[300:310]) | set(idx[450:]), set(idx[:200])
+        for tr in res.trades:
+            assert not (tr['ticker'] == 'BBB' and tr['date'] in late)
+            assert not (tr['ticker'] == 'CCC' and tr['date'] in gap)
+        assert any(tr['ticker'] == 'BBB' for tr in res.trades)
+        assert (res.per_ticker_positions['CCC'][449:] == 0).all() and res.positions.shape == (600, 3)
+        assert (res.per_ticker_equity['BBB'].iloc[:200] == 0).all()
+        assert not res.equity.isna().any() and not res.buyhold_equity.isna().any()
+    finally:
+        CONFIG.update(saved)
+
+
+def test_portfolio_no_entry_on_last_bar():
+    # BBB delists on row 2, where its RSI crosses buy_below exactly
+    close = np.array([[10.0, 20.0], [10.0, 20.0], [10.0, 20.0], [10.0, 20.0], [10.0, 20.0]])
+    rsi = np.array([[50.0, 50.0], [50.0, 50.0], [50.0, 30.0], [50.0, 50.0], [50.0, 50.0]])
+    tradable = np.ones_like(close, dtype=bool)
+    tradable[3:, 1] = False
+    out = run_portfolio_kernel(close, rsi, np.array([30.0, 30.0]), np.array([70.0, 70.0]),
+                               np.array([0.5, 0.5]), cash=1000.0, positions=np.zeros(2, dtype='int64'),
+                               cost_basis=np.zeros(2), utilization=1.0, fees_bps=(0.0, 0.0),
+                               slip_bps=(0.0, 0.0), tradable=tradable, last_bar=np.array([-1, 2]))
+    assert out['trades'] == []
+    assert (out['positions'][:, 1] == 0).all()
+    assert (out['equity'] == 1000.0).all()
+
+
+def test_portfolio_rebalancing():
+    idx = pd.date_range('2001-01-25', periods=70, freq='B', tz='UTC')
+    monthly = rebalance_schedule(idx, 'monthly')
+    assert list(idx[monthly].month) == [2, 3, 4, 5]
+    assert list(idx[rebalance_schedule(idx, 'quarterly')].month) == [4]
+    assert rebalance_schedule(idx, 'monthly', prev=pd.Timestamp('2000-12-29', tz='UTC'))[0]
+    assert rebalance_schedule(idx, 'drift') is None
+
+    data = {s: _sample_bars(n=700, seed=k + 80).astype({'Close': 'float64'})
+            for k, s in enumerate(['AAA', 'BBB', 'CCC'])}
+
+    def adapter_until(cut):
+        def adapter(sym, start=None, end=None):
+            df = data[sym]
+            if start:
+                df = df[df.index >= pd.Timestamp(start, tz='UTC')]
+            return df[df.index < cut]
+        return adapter
+
+    keys = ['TICKERS', 'PORTFOLIO_STRATEGIES', 'PORTFOLIO_WEIGHTS', 'PORTFOLIO_REBALANCE',
+            'PORTFOLIO_DRIFT_BAND', 'PORTFOLIO_TARGET_UTILIZATION', 'BENCHMARK_ENABLED', 'START', 'END']
+    saved = {k: CONFIG.get(k) for k in keys}
+    CONFIG.update(TICKERS=['AAA', 'BBB', 'CCC'], PORTFOLIO_WEIGHTS={'AAA': 0.5, 'BBB': 0.3, 'CCC': 0.2},
+                  PORTFOLIO_TARGET_UTILIZATION=0.9, BENCHMARK_ENABLED=False, START=None, END=None,
+                  PORTFOLIO_STRATEGIES={t: dict(rsi_period=14, rsi_buy_below=45, rsi_sell_above=80)
+                                        for t in ['AAA', 'BBB', 'CCC']})
+    end = data['AAA'].index[-1] + pd.Timedelta(days=1)
+    target = {'AAA': 0.45, 'BBB': 0.27, 'CCC': 0.18}
+    try:
+        CONFIG['PORTFOLIO_REBALANCE'] = 'monthly'
+        res = simulate_portfolio(adapter_until(end))
+        sched = set(res.equity.index[rebalance_schedule(res.equity.index, 'monthly')])
+        rebal = [tr for tr in res.trades if tr.get('reason') == 'rebalance']
+        assert rebal and all(tr['date'] in sched for tr in rebal)
+        for dt in {tr['date'] for tr in rebal}:
+            for t, w in target.items():
+                eq = res.per_ticker_equity[t].loc[dt]
+                if eq > 0:  # within one share of target after the rebalance
+                    px = data[t]['Close'].loc[dt] * 1.01
+                    assert abs(eq / res.equity.loc[dt] - w) <= px / res.equity.loc[dt], (dt, t)
+
+        # resumed run with a month boundary at the cut matches a full run
+        cut = res.equity.index[res.equity.index.is_month_start | (res.equity.index.day <= 3)][20]
+        first = simulate_portfolio(adapter_until(cut), return_state=True)
+        resumed = simulate_portfolio(adapter_until(end), state=first.state)
+        assert resumed.equity.equals(res.equity) and resumed.trades == res.trades
+
+        CONFIG.update(PORTFOLIO_REBALANCE='drift', PORTFOLIO_DRIFT_BAND=0.03)
+        res = simulate_portfolio(adapter_until(end))
+        assert any(tr.get('reason') == 'rebalance' for tr in res.trades)
+        for t, w in target.items():
+            eq = res.per_ticker_equity[t]
+            held = eq > 0
+            assert ((eq[held] / res.equity[held] - w).abs() <= 0.03 + 0.01).all(), t
+    finally:
+        CONFIG.update(saved)
+
+
+def test_walk_forward():
+    assert walk_forward_windows(10, 4, 2) == [(0, 4, 6), (2, 6, 8), (4, 8, 10)]
+    assert walk_forward_windows(11, 4, 3, 2) == [(0, 4, 7), (2, 6, 9), (4, 8, 11)]
+    dfs = {'AAA': _sample_bars(n=1400, seed=1), 'BBB': _sample_bars(n=1100, seed=2)}
+    params_list = rsi_param_grid({'RSI_PERIOD': [10, 14], 'RSI_BUY_BELOW': [25, 35],
+                                  'RSI_SELL_ABOVE': [65, 75]})
+    kw = dict(train_bars=500, test_bars=250)
+    seen = {}
+    serial = list(iter_walk_forward(dfs, ['AAA', 'BBB'], params_list, workers=1,
+                                    report=lambda sym, runs: seen.setdefault(sym, runs), **kw))
+    parallel = list(iter_walk_forward(dfs, ['AAA', 'BBB'], params_list, workers=2, **kw))
+    for (sa, pa, a), (sb, pb, b) in zip(serial, parallel):
+        assert sa == sb and pa == pb
+        _assert_same(a, b)
+
+    # out-of-sample curve covers the test bars only and chains window levels
+    sym, params, res = serial[0]
+    windows = params['walk_forward']
+    assert len(windows) == res['metrics']['wf_windows'] == 4
+    assert res['equity'].index[0] == dfs['AAA'].index[500]
+    assert len(res['equity']) == 1400 - 500
+    assert res['equity'].iloc[0] == CONFIG['INITIAL_CAPITAL']
+
+    # trade stats are exact sums of the windows' round trips; no placeholder rsi_* keys
+    pnls = [pnl for run in seen['AAA'] for pnl in run['result']['round_trip_pnls']]
+    m = res['metrics']
+    assert res['round_trip_pnls'] == pnls and len(pnls) > 0
+    assert m['win_rate'] == sum(pnl > 0 for pnl in pnls) / len(pnls)
+    assert m['avg_trade_pnl'] == sum(pnls) / len(pnls)
+    assert 'rsi_period' not in params and 'rsi_buy_below' not in params
+
+
+def test_monte_carlo():
+    df = _sample_bars(n=1500, seed=8)
+    params_list = rsi_param_grid({'RSI_PERIOD': [14], 'RSI_BUY_BELOW': [30, 45],
+                                  'RSI_SELL_ABOVE': [55, 70]})
+    batched = list(run_grid(df, params_list, engine='batch'))
+    for params, res in batched:
+        assert res['round_trip_pnls'] == run_symbol(df, engine='loop', **params)['round_trip_pnls']
+
+    pnls = max((res['round_trip_pnls'] for _, res in batched), key=len)
+    a = monte_carlo(pnls, years=6, n_paths=5000, seed=3, chunk_paths=1000)
+    b = monte_carlo(pnls, years=6, n_paths=5000, seed=3, chunk_paths=1000, workers=3)
+    for k in ('cagr', 'maxdd', 'sharpe'):
+        assert a[k].shape == (5000,)
+        assert np.array_equal(a[k], b[k], equal_nan=True)
+    assert 0.0 <= a['prob_loss'] <= 1.0
+    assert (a['maxdd'] >= 0).all() and (a['maxdd'] <= 1).all()
+    assert a['summary']['cagr']['p5'] <= a['summary']['cagr']['p95']
+
+
+def test_driver_saves_every_combo():
+    dfs = {'AAA': _sample_bars(n=600, seed=5), 'BBB': _sample_bars(n=600, seed=6)}
+    keys = ['TICKERS', 'RSI_PERIOD', 'RSI_BUY_BELOW', 'RSI_SELL_ABOVE', 'SAVE_DB', 'DB_PATH', 'RUN_ID',
+            'PORTFOLIO_MODE', 'SAVE_METRICS', 'GRID_WORKERS', 'BENCHMARK_ENABLED', 'MONTE_CARLO']
+    saved = {k: CONFIG.get(k) for k in keys}
+    load_bars = driver.load_bars
+    driver.load_bars = lambda symbols: {s: dfs[s] for s in symbols}  # no yfinance download
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            driver.run_backtest(dict(TICKERS=['AAA', 'BBB'], RSI_PERIOD=[14], RSI_BUY_BELOW=[30, 40],
+                                     RSI_SELL_ABOVE=[60, 70], SAVE_DB=True, DB_PATH=tmp, RUN_ID='d1',
+                                     PORTFOLIO_MODE=False, SAVE_METRICS=False, GRID_WORKERS=1,
+                                     BENCHMARK_ENABLED=False, MONTE_CARLO=False))
+            with sqlite3.connect(bt_db.init_db(tmp)) as con:
+                rows = con.execute("SELECT ticker, params_json, equity_json FROM strategies "
+                                   "WHERE run_id = 'd1'").fetchall()
+    finally:
+        driver.load_bars = load_bars
+        CONFIG.update(saved)
+    combos = {(t, p['rsi_buy_below'], p['rsi_sell_above'])
+              for t, p in ((t, json.loads(p)) for t, p, _ in rows)}
+    assert len(rows) == len(combos) == 8
+    assert all(eq is not None for _, _, eq in rows)
+
+
+def test_driver_portfolio_grid_saves_best_combo():
+    data = {s: _sample_bars(n=500, seed=k + 20).astype({'Close': 'float64'})
+            for k, s in enumerate(['AAA', 'BBB'])}
+    grid = {'AAA': [dict(rsi_period=14, rsi_buy_below=35, rsi_sell_above=65),
+                    dict(rsi_period=7, rsi_buy_below=30, rsi_sell_above=70)],
+            'BBB': [dict(rsi_period=7, rsi_buy_below=40, rsi_sell_above=60),
+                    dict(rsi_period=21, rsi_buy_below=35, rsi_sell_above=65)]}
+    keys = ['TICKERS', 'PORTFOLIO_MODE', 'PORTFOLIO_USE_PARAM_GRID', 'PORTFOLIO_PARAM_GRID', 'PORTFOLIO_STRATEGIES',
+            'PORTFOLIO_WEIGHTS', 'PORTFOLIO_UNIVERSE', 'SAVE_DB', 'DB_PATH', 'RUN_ID', 'GRID_WORKERS',
+            'BENCHMARK_ENABLED', 'START', 'END', 'MAKE_TEARSHEET', 'TOP_BY', 'MONTE_CARLO']
+    saved = {k: CONFIG.get(k) for k in keys}
+    get_data = driver.get_data
+    driver.get_data = lambda sym, start=None, end=None: data[sym]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            driver.run_backtest(dict(TICKERS=['AAA', 'BBB'], PORTFOLIO_MODE=True, PORTFOLIO_USE_PARAM_GRID=True,
+                                     PORTFOLIO_PARAM_GRID=grid, PORTFOLIO_WEIGHTS=None, PORTFOLIO_UNIVERSE=None,
+                                     SAVE_DB=True, DB_PATH=tmp, RUN_ID='g1', GRID_WORKERS=1,
+                                     BENCHMARK_ENABLED=False, START=None, END=None, MAKE_TEARSHEET=False,
+                                     TOP_BY=['sharpe'], MONTE_CARLO=False))
+            with sqlite3.connect(bt_db.init_db(tmp)) as con:
+                combos = con.execute("SELECT combo_id, params_json, sharpe FROM portfolio_grid "
+                                     "WHERE run_id = 'g1' ORDER BY combo_id").fetchall()
+                rows = con.execute("SELECT sharpe, equity_json FROM portfolio WHERE run_id = 'g1'").fetchall()
+    finally:
+        driver.get_data = get_data
+        CONFIG.update(saved)
+    assert [c for c, _, _ in combos] == list(range(4))
+    # the frontend reads one portfolio row per run: the best combo, with its curve
+    assert len(rows) == 1 and rows[0][1] is not None
+    assert rows[0][0] == max(sharpe for _, _, sharpe in combos)
+
+
+def test_driver_resumes_single_strategy_runs():
+    full = {'AAA': _sample_bars(n=600, seed=5), 'BBB': _sample_bars(n=600, seed=6)}
+    keys = ['TICKERS', 'RSI_PERIOD', 'RSI_BUY_BELOW', 'RSI_SELL_ABOVE', 'SAVE_DB', 'DB_PATH', 'RUN_ID',
+            'PORTFOLIO_MODE', 'SAVE_METRICS', 'GRID_WORKERS', 'BENCHMARK_ENABLED', 'MONTE_CARLO',
+            'SAVE_ENGINE_STATE', 'RESUME_FROM_RUN']
+    saved = {k: CONFIG.get(k) for k in keys}
+    load_bars = driver.load_bars
+    base = dict(TICKERS=['AAA', 'BBB'], RSI_PERIOD=[14], RSI_BUY_BELOW=[30, 40], RSI_SELL_ABOVE=[60, 70],
+                SAVE_DB=True, PORTFOLIO_MODE=False, SAVE_METRICS=False, GRID_WORKERS=1,
+                BENCHMARK_ENABLED=False, MONTE_CARLO=False)
+
+    def run(tmp, bars, **kw):
+        driver.load_bars = lambda symbols: {s: full[s].iloc[:bars] for s in symbols}
+        driver.run_backtest({**base, 'DB_PATH': tmp, **kw})
+        with sqlite3.connect(bt_db.init_db(tmp)) as con:
+            return {(t, p): (eq, m, ev) for t, p, eq, m, ev in con.execute(
+                "SELECT ticker, params_json, equity_json, metrics_json, events_json FROM strategies "
+                "WHERE run_id = ?",
+                (kw['RUN_ID'],))}
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            run(tmp, 400, RUN_ID='n1', SAVE_ENGINE_STATE=True, RESUME_FROM_RUN=None)
+            resumed = run(tmp, 600, RUN_ID='n2', SAVE_ENGINE_STATE=True, RESUME_FROM_RUN='n1')
+            fresh = run(tmp, 600, RUN_ID='f', SAVE_ENGINE_STATE=False, RESUME_FROM_RUN=None)
+            with sqlite3.connect(bt_db.init_db(tmp)) as con:
+                states = con.execute("SELECT run_id, bars FROM engine_state ORDER BY run_id").fetchall()
+    finally:
+        driver.load_bars = load_bars
+        CONFIG.update(saved)
+    assert len(fresh) == 8 and resumed.keys() == fresh.keys()
+    for key, row in fresh.items():
+        assert resumed[key] == row, key
+    assert states == [('n1', 400)] * 8 + [('n2', 600)] * 8
+
+
+def test_driver_saves_traded_portfolio_weights():
+    data = {s: _sample_bars(n=400, seed=k + 80).astype({'Close': 'float64'}) for k, s in enumerate(['AAA', 'BBB'])}
+
+    def adapter(sym, start=None, end=None):
+        if sym == 'CCC':
+            raise ConnectionError("timeout")
+        return data[sym]
+
+    keys = ['TICKERS', 'PORTFOLIO_MODE', 'PORTFOLIO_USE_PARAM_GRID', 'PORTFOLIO_STRATEGIES', 'PORTFOLIO_WEIGHTS',
+            'PORTFOLIO_UNIVERSE', 'SAVE_DB', 'DB_PATH', 'RUN_ID', 'BENCHMARK_ENABLED', 'START', 'END',
+            'MAKE_TEARSHEET', 'MONTE_CARLO', 'SAVE_ENGINE_STATE', 'RESUME_FROM_RUN']
+    saved = {k: CONFIG.get(k) for k in keys}
+    strat = dict(rsi_period=10, rsi_buy_below=40, rsi_sell_above=60)
+    get_data = driver.get_data
+    driver.get_data = adapter
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            driver.run_backtest(dict(TICKERS=['AAA', 'BBB', 'CCC'], PORTFOLIO_MODE=True, PORTFOLIO_USE_PARAM_GRID=False,
+                                     PORTFOLIO_STRATEGIES={t: strat for t in ['AAA', 'BBB', 'CCC']},
+                                     PORTFOLIO_WEIGHTS={'AAA': 0.5, 'BBB': 0.25, 'CCC': 0.25},
+                                     PORTFOLIO_UNIVERSE=None, SAVE_DB=True, DB_PATH=tmp, RUN_ID='w1',
+                                     BENCHMARK_ENABLED=False, START=None, END=None, MAKE_TEARSHEET=False,
+                                     MONTE_CARLO=False, SAVE_ENGINE_STATE=False, RESUME_FROM_RUN=None))
+            with sqlite3.connect(bt_db.init_db(tmp)) as con:
+                weights = dict(con.execute("SELECT ticker, target_weight FROM portfolio_weights WHERE run_id = 'w1'"))
+    finally:
+        driver.get_data = get_data
+        CONFIG.update(saved)
+    # the failed ticker is left out and the rest are renormalized
+    assert weights == {'AAA': 0.5 / 0.75, 'BBB': 0.25 / 0.75}
+
+
+if __name__ == "__main__":
+    test_kernel_matches_loop()
+    test_kernel_matches_loop_rsi_bb()
+    test_kernel_unaffordable_entry()
+    test_run_grid_matches_per_param_runs()
+    test_rsi_sma_batch_matches_single()
+    test_online_rsi_sma_matches_batch()
+    test_batch_engine_matches_kernel()
+    test_parallel_grid_matches_serial()
+    test_reused_pool_drops_finished_sweeps()
+    test_metrics_only_matches_full_metrics()
+    test_grid_top_reruns_only_top_combos()
+    test_successive_halving()
+    test_resume_matches_full_run()
+    test_portfolio_resume_matches_full_run()
+    test_portfolio_matrix_matches_loop()
+    test_portfolio_grid_matches_simulate()
+    test_universe_matches_portfolio()
+    test_portfolio_concurrent_load()
+    test_yfinance_downloads_run_one_at_a_time()
+    test_portfolio_union_calendar()
+    test_portfolio_no_entry_on_last_bar()
+    test_portfolio_rebalancing()
+    test_walk_forward()
+    test_monte_carlo()
+    test_driver_saves_every_combo()
+    test_driver_resumes_single_strategy_runs()
+    test_driver_portfolio_grid_saves_best_combo()
+    test_driver_saves_traded_portfolio_weights()
+    print("✓ Engine parity tests passed")
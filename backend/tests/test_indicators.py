@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Parity tests: backend Indicators vs straightforward reference implementations
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backtest.indicators import Indicators
+from backtest.planner import IndicatorPlan
+from backtest.signals import (
+    ConditionPlan, SignalEvaluator, build_signals_from_config, sweep_signals_from_config,
+)
+from backtest.streaming import (
+    OnlineEMA, OnlineSMA, OnlineRSI, OnlineBB, OnlineATR, OnlineKC, OnlineMACD, OnlineStochRSI,
+)
+
+
+def _sample_close(n=800, seed=3):
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range("2020-01-01", periods=n, tz="UTC")
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), index=idx)
+
+
+def _wma_reference(prices, period):
+    """Per-bar rolling apply (the original calculate_wma)."""
+    weights = np.arange(1, period + 1)
+
+    def wma_calc(window):
+        if len(window) < period or np.any(np.isnan(window)):
+            return np.nan
+        return np.sum(weights * window) / np.sum(weights)
+
+    return prices.rolling(window=period, min_periods=period).apply(wma_calc, raw=True)
+
+
+def _hma_reference(prices, period):
+    raw_hma = 2 * _wma_reference(prices, int(period / 2)) - _wma_reference(prices, period)
+    return _wma_reference(raw_hma, int(np.sqrt(period)))
+
+
+def _kama_reference(prices, period=20, fast=2, slow=30):
+    """Per-bar loop with the window volatility summed term by term (the original calculate_kama)."""
+    p = prices.to_numpy()
+    kama = np.full(len(p), np.nan)
+    fast_sc, slow_sc = 2 / (fast + 1), 2 / (slow + 1)
+    for i in range(period, len(p)):
+        change = abs(p[i] - p[i - period])
+        volatility = sum(abs(p[i - j] - p[i - j - 1]) for j in range(period))
+        er = 0 if volatility == 0 else change / volatility
+        sc = (er * (fast_sc - slow_sc) + slow_sc) ** 2
+        kama[i] = p[i] if i == period else kama[i - 1] + sc * (p[i] - kama[i - 1])
+    return pd.Series(kama, index=prices.index)
+
+
+def _assert_close(a, b):
+    assert a.index.equals(b.index)
+    assert np.array_equal(np.isnan(a.to_numpy()), np.isnan(b.to_numpy()))
+    np.testing.assert_allclose(a.to_numpy(), b.to_numpy(), rtol=1e-12, atol=0, equal_nan=True)
+
+
+def test_wma_hma_match_reference():
+    close = _sample_close()
+    gappy = close.copy()
+    gappy.iloc[[50, 51, 300]] = np.nan
+    for prices in (close, gappy, close.astype("float32")):
+        for period in (1, 2, 3, 9, 20, 55):
+            _assert_close(Indicators.calculate_wma(prices, period), _wma_reference(prices, period))
+            _assert_close(Indicators.calculate_hma(prices, period), _hma_reference(prices, period))
+    # arrays in, RangeIndex out; too-short input is all NaN
+    _assert_close(Indicators.calculate_wma(close.to_numpy(), 10), _wma_reference(pd.Series(close.to_numpy()), 10))
+    assert Indicators.calculate_wma(close.iloc[:5], 10).isna().all()
+
+
+def test_kama_matches_reference():
+    close = _sample_close(n=3000)
+    flat = close.copy()
+    flat.iloc[100:160] = flat.iloc[100]  # zero-volatility windows
+    gappy = close.copy()
+    gappy.iloc[[5, 700]] = np.nan  # NaN before the seed bar clears; after it, KAMA stays NaN
+    for period, fast, slow in ((20, 2, 30), (10, 2, 30), (5, 3, 20), (1, 2, 30)):
+        for prices in (close, flat, gappy):
+            ours = Indicators.calculate_kama(prices, period, fast, slow)
+            ref = _kama_reference(prices, period, fast, slow)
+            assert ours.index.equals(ref.index)
+            assert np.array_equal(ours.to_numpy(), ref.to_numpy(), equal_nan=True)
+        # float32 scalars square through libm powf, which can round 1 ulp away from the array square
+        f32 = close.astype("float32")
+        np.testing.assert_allclose(Indicators.calculate_kama(f32, period, fast, slow).to_numpy(),
+                                   _kama_reference(f32, period, fast, slow).to_numpy(), rtol=1e-8, equal_nan=True)
+    assert Indicators.calculate_kama(close.iloc[:10], 20).isna().all()
+    assert Indicators.calculate_kama(close.iloc[:20], 20).isna().all()
+
+def test_batch_api_matches_single_period():
+    close = _sample_close(n=1000).astype("float32")
+    gappy = close.copy()
+    gappy.iloc[[40, 600]] = np.nan
+    periods = [2, 9, 14, 20, 50, 2000]
+    for prices in (close, gappy):
+        sma = Indicators.calculate_sma_batch(prices, periods)
+        ema = Indicators.calculate_ema_batch(prices, periods)
+        rsi = Indicators.calculate_rsi_batch(prices, periods)
+        bb = Indicators.calculate_bb_batch(prices, periods, 2.5)
+        assert sma.shape == ema.shape == rsi.shape == bb['upper'].shape == (len(periods), len(prices))
+        for i, p in enumerate(periods):
+            _assert_close(pd.Series(sma[i], index=prices.index), Indicators.calculate_sma(prices, p))
+            assert np.array_equal(ema[i], Indicators.calculate_ema(prices, p).to_numpy(), equal_nan=True)
+            assert np.array_equal(rsi[i], Indicators.calculate_rsi(prices, p).to_numpy(), equal_nan=True)
+            single = Indicators.calculate_bb(prices, p, 2.5)
+            for band in ('upper', 'middle', 'lower'):
+                _assert_close(pd.Series(bb[band][i], index=prices.index), single[band])
+
+    df = pd.DataFrame({'Close': close, 'High': close * 1.01, 'Low': close * 0.99})
+    out = Indicators.calculate_all(df, {'rsi': {'period': [7, 14]}, 'sma': {'period': [10, 30]},
+                                        'bb': {'period': [20], 'std_dev': 2.0}, 'wma': {'period': [5]}})
+    assert set(out) == {'RSI_7', 'RSI_14', 'SMA_10', 'SMA_30', 'BB_UPPER_20', 'BB_MIDDLE_20', 'BB_LOWER_20', 'WMA_5'}
+    assert out['RSI_14'].equals(Indicators.calculate_rsi(close, 14))
+    _assert_close(out['WMA_5'], Indicators.calculate_wma(close, 5))
+
+
+def _ohlc(n=900, seed=5):
+    close = _sample_close(n=n, seed=seed).astype("float32")
+    rng = np.random.default_rng(seed)
+    high = (close * (1 + rng.uniform(0, 0.01, n))).astype("float32")
+    low = (close * (1 - rng.uniform(0, 0.01, n))).astype("float32")
+    return high, low, close
+
+
+def _stream(make, bars):
+    """Run bars through a fresh online indicator; dict outputs become {key: array}."""
+    obj, rows = make(), []
+    for bar in bars:
+        rows.append(obj.update(*bar))
+    if isinstance(rows[0], dict):
+        return {k: np.array([r[k] for r in rows]) for k in rows[0]}
+    return np.array(rows)
+
+
+def _assert_stream(ours, batch, exact=True):
+    if isinstance(batch, dict):
+        for k in batch:
+            _assert_stream(ours[k], batch[k], exact)
+        return
+    batch = np.asarray(batch, dtype="float64")
+    if exact:
+        assert np.array_equal(ours, batch, equal_nan=True)
+    else:
+        np.testing.assert_allclose(ours, batch, rtol=1e-10, atol=1e-10, equal_nan=True)
+
+
+def test_streaming_matches_batch():
+    high, low, close = _ohlc()
+    gappy = close.copy()
+    gappy.iloc[[30, 31, 500]] = np.nan
+    hlc = list(zip(high, low, close))
+    for prices in (close, gappy):
+        p1 = [(x,) for x in prices]
+        _assert_stream(_stream(lambda: OnlineEMA(12), p1), Indicators.calculate_ema(prices, 12))
+        _assert_stream(_stream(lambda: OnlineSMA(20), p1), Indicators.calculate_sma(prices, 20))
+        _assert_stream(_stream(lambda: OnlineSMA(1), p1), Indicators.calculate_sma(prices, 1))
+        _assert_stream(_stream(lambda: OnlineRSI(14), p1), Indicators.calculate_rsi(prices, 14))
+        _assert_stream(_stream(lambda: OnlineMACD(12, 26, 9), p1), Indicators.calculate_macd(prices, 12, 26, 9))
+        _assert_stream(_stream(lambda: OnlineBB(20, 2.0), p1), Indicators.calculate_bb(prices, 20, 2.0))
+    p1 = [(x,) for x in close]
+    _assert_stream(_stream(lambda: OnlineStochRSI(14, 14, 3, 3), p1), Indicators.calculate_stoch_rsi(close, 14, 14, 3, 3))
+    _assert_stream(_stream(lambda: OnlineATR(14), hlc), Indicators.calculate_atr(high, low, close, 14))
+    _assert_stream(_stream(lambda: OnlineKC(20, 2.0), hlc), Indicators.calculate_kc(high, low, close, 20, 2.0))
+
+
+def test_streaming_warm_start():
+    high, low, close = _ohlc(n=700, seed=9)
+    cut = 400
+    head = (high.iloc[:cut], low.iloc[:cut], close.iloc[:cut])
+    tail_p = [(x,) for x in close.iloc[cut:]]
+    tail_hlc = list(zip(high.iloc[cut:], low.iloc[cut:], close.iloc[cut:]))
+
+    def tail(batch):
+        return {k: v.iloc[cut:] for k, v in batch.items()} if isinstance(batch, dict) else batch.iloc[cut:]
+
+    # EMA-family state comes straight from the batch ewm: exact
+    _assert_stream(_stream(lambda: OnlineEMA.from_history(head[2], 12), tail_p), tail(Indicators.calculate_ema(close, 12)))
+    _assert_stream(_stream(lambda: OnlineRSI.from_history(head[2], 14), tail_p), tail(Indicators.calculate_rsi(close, 14)))
+    _assert_stream(_stream(lambda: OnlineMACD.from_history(head[2]), tail_p), tail(Indicators.calculate_macd(close)))
+    _assert_stream(_stream(lambda: OnlineATR.from_history(*head, 14), tail_hlc),
+                   tail(Indicators.calculate_atr(high, low, close, 14)))
+    # rolling windows restart their compensated sums: equal to rounding
+    _assert_stream(_stream(lambda: OnlineKC.from_history(*head, 20), tail_hlc),
+                   tail(Indicators.calculate_kc(high, low, close, 20)))
+    _assert_stream(_stream(lambda: OnlineBB.from_history(head[2], 20), tail_p),
+                   tail(Indicators.calculate_bb(close, 20)), exact=False)
+    _assert_stream(_stream(lambda: OnlineStochRSI.from_history(head[2]), tail_p),
+                   tail(Indicators.calculate_stoch_rsi(close)), exact=False)
+
+
+def test_indicator_plan_shares_primitives():
+    high, low, close = _ohlc()
+    df = pd.DataFrame({'Open': close, 'High': high, 'Low': low, 'Close': close, 'Volume': 1.0})
+
+    # KC(20) = EMA(close, 20) + EMA(TR, 20); the EMA 20 and ATR 20 requests reuse both
+    plan = IndicatorPlan.from_config({'kc': {'period': 20}, 'ema': {'period': 20}, 'atr': {'period': 20}})
+    assert plan.stats() == {'requested': 6, 'computed': 3, 'saved': 3}
+
+    config = {'kc': {'period': 20, 'multiplier': 1.5}, 'ema': {'period': [12, 20]}, 'atr': {'period': 20},
+              'macd': {}, 'rsi': {'period': 14}, 'stoch_rsi': {}, 'bb': {'period': 20, 'std_dev': 2.5},
+              'hma': {'period': 16}, 'kama': {'period': 10}}
+    conditions = [
+        {'source': 'close', 'comparison': 'crosses_above', 'target': 'kc_top_20', 'kc_mult': 1.5},
+        {'source': 'ema_12', 'comparison': 'above', 'target': 'bb_mid_20', 'bb_std': 3.0},
+        {'source': 'rsi_14', 'comparison': 'below', 'target': 30},
+    ]
+    plan = IndicatorPlan.from_config(config, conditions)
+    planned = plan.evaluate(df)
+    assert planned.stats['saved'] > 0
+
+    out = planned.outputs
+    kc = Indicators.calculate_kc(high, low, close, 20, 1.5)
+    bb = Indicators.calculate_bb(close, 20, 2.5)
+    macd = Indicators.calculate_macd(close)
+    stoch = Indicators.calculate_stoch_rsi(close)
+    expected = {
+        'KC_UPPER': kc['upper'], 'KC_MIDDLE': kc['middle'], 'KC_LOWER': kc['lower'],
+        'EMA_12': Indicators.calculate_ema(close, 12), 'EMA_20': Indicators.calculate_ema(close, 20),
+        'ATR': Indicators.calculate_atr(high, low, close, 20),
+        'MACD': macd['macd'], 'MACD_SIGNAL': macd['signal'], 'MACD_HIST': macd['histogram'],
+        'RSI': Indicators.calculate_rsi(close, 14),
+        'STOCH_RSI_K': stoch['k'], 'STOCH_RSI_D': stoch['d'],
+        'BB_UPPER': bb['upper'], 'BB_MIDDLE': bb['middle'], 'BB_LOWER': bb['lower'],
+        'HMA_16': Indicators.calculate_hma(close, 16), 'KAMA_10': Indicators.calculate_kama(close, 10),
+    }
+    assert list(out) == list(expected)
+    for key, series in expected.items():
+        assert np.array_equal(out[key].to_numpy(), series.to_numpy(), equal_nan=True), key
+    assert Indicators.calculate_all(df, config).keys() == out.keys()
+
+    # condition references resolve to planned series with their own channel params
+    assert planned.lookup('kc_top_20', {'kc_mult': 1.5}).equals(kc['upper'])
+    assert planned.lookup('bb_mid_20', {'bb_std': 3.0}).equals(bb['middle'])
+    assert planned.lookup('sma_50', {}) is None
+    entry, _ = build_signals_from_config(df, out, {'entry_conditions': conditions[:1]}, planned)
+    assert entry.equals((close.shift(1) <= kc['upper'].shift(1)) & (close > kc['upper']))
+
+
+def test_channel_memo_keeps_periods_apart():
+    high, low, close = _ohlc()
+    df = pd.DataFrame({'Open': close, 'High': high, 'Low': low, 'Close': close, 'Volume': 1.0})
+    config_bb = Indicators.calculate_bb(close, 10, 1.0)
+    indicators = {'BB_UPPER': config_bb['upper']}
+    evaluator = SignalEvaluator(df, indicators)
+
+    assert evaluator._get_series('bb_top_20', {}).equals(Indicators.calculate_bb(close, 20)['upper'])
+    assert evaluator._get_series('bb_bottom_50', {'bb_std': 2.5}).equals(Indicators.calculate_bb(close, 50, 2.5)['lower'])
+    assert evaluator._get_series('kc_mid_30', {'kc_mult': 1.5}).equals(Indicators.calculate_kc(high, low, close, 30, 1.5)['middle'])
+    assert evaluator.indicators['BB_UPPER'] is config_bb['upper']  # config indicators are left alone
+
+    # one computation per distinct band, shared by the entry and exit lists
+    evaluator.memo.clear()
+    entry = [{'source': 'close', 'comparison': 'above', 'target': 'bb_top_20'},
+             {'source': 'close', 'comparison': 'above', 'target': 'bb_bottom_50'}]
+    exit_ = [{'source': 'close', 'comparison': 'below', 'target': 'bb_mid_20'},
+             {'source': 'close', 'comparison': 'below', 'target': 'bb_mid_20', 'bb_std': 3.0}]
+    evaluator.evaluate_conditions(entry)
+    evaluator.evaluate_conditions(exit_)
+    assert sorted(evaluator.memo) == [('bb', 20, 2.0, 'Close'), ('bb', 20, 3.0, 'Close'), ('bb', 50, 2.0, 'Close')]
+
+
+def _condition_reference(evaluator, condition):
+    """Per-condition pandas evaluation (the original SignalEvaluator.evaluate_condition)."""
+    channel = {k: condition[k] for k in ('bb_std', 'kc_mult') if k in condition}
+    source = evaluator._get_series(condition.get('source', 'close'), {**condition.get('params', {}), **channel})
+    target = condition.get('target')
+    if isinstance(target, (int, float)):
+        target = pd.Series([float(target)] * evaluator.length, index=evaluator.df.index)
+    else:
+        target = evaluator._get_series(target, {**condition.get('target_params', {}), **channel})
+    comparison, pct = condition.get('comparison', 'above'), condition.get('threshold_pct', 0)
+    prev_source, prev_target = source.shift(1), target.shift(1)
+    if comparison == 'crosses_above':
+        threshold = target * (1 + pct / 100)
+        signal = (prev_source <= prev_target) & ((source >= threshold) if pct > 0 else (source > target))
+    elif comparison == 'crosses_below':
+        threshold = target * (1 - pct / 100)
+        signal = (prev_source >= prev_target) & ((source <= threshold) if pct > 0 else (source < target))
+    elif comparison == 'equals':
+        signal = pd.Series(np.isclose(source, target, rtol=1e-5), index=source.index)
+    else:
+        signal = {'above': source > target, 'below': source < target,
+                  '>=': source >= target, '<=': source <= target}[comparison]
+    if condition.get('delay_bars', 0) > 0:
+        signal = signal.shift(condition['delay_bars']).fillna(False)
+    return signal.astype(bool)
+
+
+def test_condition_plan_matches_pandas():
+    high, low, close = _ohlc()
+    df = pd.DataFrame({'Open': close, 'High': high, 'Low': low, 'Close': close, 'Volume': 1.0})
+    indicators = {'RSI': Indicators.calculate_rsi(close, 14), 'SMA_20': Indicators.calculate_sma(close, 20)}
+    level = float(close.iloc[300])  # a float32 price compared against a float64 constant
+    conditions = [
+        {'source': 'close', 'comparison': 'crosses_above', 'target': 'sma_20'},
+        {'source': 'close', 'comparison': 'crosses_below', 'target': 'bb_bottom_20', 'bb_std': 1.5, 'threshold_pct': 0.5},
+        {'source': 'close', 'comparison': 'crosses_above', 'target': level, 'threshold_pct': 1.0, 'delay_bars': 2},
+        {'source': 'close', 'comparison': 'below', 'target': level},
+        {'source': 'close', 'comparison': 'equals', 'target': level},
+        {'source': 'rsi', 'comparison': '<=', 'target': 45, 'delay_bars': 3},
+        {'source': 'kc_mid_20', 'comparison': 'above', 'target': 'sma_20', 'kc_mult': 1.0},
+    ]
+    evaluator = SignalEvaluator(df, indicators)
+    refs = [_condition_reference(evaluator, c) for c in conditions]
+    for condition, ref in zip(conditions, refs):
+        assert evaluator.evaluate_condition(condition).equals(ref), condition
+    for logic in ('all', 'any'):
+        for subset in (conditions[:1], conditions[:4], conditions):
+            combined = refs[0].copy()
+            for ref in refs[1:len(subset)]:
+                combined = combined & ref if logic == 'all' else combined | ref
+            assert evaluator.evaluate_conditions(subset, logic).equals(combined)
+    assert not evaluator.evaluate_conditions([]).any()
+
+    # compiled once, re-run on a shorter history
+    plan = ConditionPlan(conditions[:4], 'any')
+    tail = df.iloc[500:]
+    tail_eval = SignalEvaluator(tail, {k: v.iloc[500:] for k, v in indicators.items()})
+    expected = np.logical_or.reduce([_condition_reference(tail_eval, c).to_numpy() for c in conditions[:4]])
+    assert np.array_equal(plan.run(tail_eval), expected)
+
+
+def test_sweep_matches_single_variants():
+    high, low, close = _ohlc()
+    df = pd.DataFrame({'Open': close, 'High': high, 'Low': low, 'Close': close, 'Volume': 1.0})
+    indicators = {'SMA_20': Indicators.calculate_sma(close, 20), 'RSI': Indicators.calculate_rsi(close, 14)}
+    config = {
+        'entry_conditions': [
+            {'source': 'close', 'comparison': 'crosses_below', 'target': 'bb_bottom_20',
+             'bb_std': [1.5, 2.0, 2.5], 'threshold_pct': [0, 0.25, 1.0], 'delay_bars': [0, 2]},
+            {'source': 'rsi', 'comparison': 'below', 'target': 45, 'threshold_pct': [0, 1.0]},
+        ],
+        'exit_conditions': [
+            {'source': 'close', 'comparison': 'crosses_above', 'target': 'kc_top_20', 'kc_mult': [1.0, 2.0]},
+            {'source': 'close', 'comparison': 'crosses_above', 'target': 'sma_20', 'delay_bars': 1},
+        ],
+        'exit_logic': 'any',
+    }
+    entry, exit_, variants = sweep_signals_from_config(df, indicators, config)
+    assert entry.shape == exit_.shape == (3 * 3 * 2 * 2 * 2, len(df))
+    for row, variant in enumerate(variants):
+        single = {k: [dict(c) for c in v] if isinstance(v, list) else v for k, v in config.items()}
+        for key, value in variant.items():
+            side, rest = key.split('[')
+            index, knob = rest.split('].')
+            single[side][int(index)][knob] = value
+        ref_entry, ref_exit = build_signals_from_config(df, indicators, single)
+        assert np.array_equal(entry[row], ref_entry.to_numpy()), variant
+        assert np.array_equal(exit_[row], ref_exit.to_numpy()), variant
+
+    # no lists: one variant equal to build_signals_from_config
+    plain = {'entry_conditions': [{'source': 'close', 'comparison': 'above', 'target': 'sma_20'}]}
+    entry, exit_, variants = sweep_signals_from_config(df, indicators, plain)
+    assert variants == [{}] and entry.shape == (1, len(df)) and not exit_.any()
+    assert np.array_equal(entry[0], build_signals_from_config(df, indicators, plain)[0].to_numpy())
+
+
+if __name__ == "__main__":
+    test_wma_hma_match_reference()
+    test_kama_matches_reference()
+    test_batch_api_matches_single_period()
+    test_streaming_matches_batch()
+    test_streaming_warm_start()
+    test_indicator_plan_shares_primitives()
+    test_channel_memo_keeps_periods_apart()
+    test_condition_plan_matches_pandas()
+    test_sweep_matches_single_variants()
+    print("✓ Indicator parity tests passed")
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Parity tests: panel screener / day-file panel vs per-ticker evaluation
+"""
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.polygon_flatfiles import PolygonFlatFiles
+from backtest.planner import IndicatorPlan
+from backtest.screener import load_universe, screen
+from backtest.signals import ConditionPlan, SignalEvaluator
+
+
+def _write_day_files(cache_dir, tickers, dates, seed=11):
+    """Synthetic Polygon day files; returns {ticker: OHLCV frame} as a single-ticker load would."""
+    rng = np.random.default_rng(seed)
+    closes = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (len(dates), len(tickers))), axis=0))
+    per_ticker = {t: [] for t in tickers}
+    for d, date in enumerate(dates):
+        rows = []
+        for j, ticker in enumerate(tickers):
+            if (j == 1 and d < 40) or (j == 2 and d >= len(dates) - 3):
+                continue  # late listing / stopped trading
+            c = closes[d, j]
+            bar = dict(ticker=ticker, volume=1e6 + j, open=c * 0.998, close=c, high=c * 1.01, low=c * 0.99,
+                       window_start=int(pd.Timestamp(date).value), transactions=100)
+            rows.append(bar)
+            per_ticker[ticker].append({'date': pd.Timestamp(date), **bar})
+        rows.append(dict(ticker='OTHER', volume=1.0, open=1.0, close=1.0, high=1.0, low=1.0,
+                         window_start=int(pd.Timestamp(date).value), transactions=1))
+        pd.DataFrame(rows).to_parquet(Path(cache_dir) / f"{date.strftime('%Y-%m-%d')}.parquet")
+
+    frames = {}
+    for ticker, rows in per_ticker.items():
+        if not rows:
+            continue
+        df = pd.DataFrame(rows).set_index('date')[['open', 'high', 'low', 'close', 'volume']]
+        df.columns = [c.capitalize() for c in df.columns]
+        frames[ticker] = df.astype({'Open': 'float32', 'High': 'float32', 'Low': 'float32',
+                                    'Close': 'float32', 'Volume': 'float64'})
+    return frames
+
+
+def test_screen_matches_per_ticker():
+    tickers = [f'T{i:02d}' for i in range(30)] + ['BRK.B']
+    dates = pd.bdate_range('2024-01-01', periods=160)
+    conditions = [
+        {'source': 'rsi_14', 'comparison': 'above', 'target': 45},
+        {'source': 'close', 'comparison': 'above', 'target': 'sma_20'},
+        {'source': 'close', 'comparison': 'below', 'target': 'kc_top_10', 'kc_mult': 1.5},
+        {'source': 'ema_5', 'comparison': 'above', 'target': 'hma_9'},
+    ]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        frames = _write_day_files(cache_dir, tickers, dates)
+        panel = PolygonFlatFiles(cache_dir=cache_dir).get_daily_panel(
+            tickers + ['MISSING'], dates[0].strftime('%Y-%m-%d'), dates[-1].strftime('%Y-%m-%d'))
+    panel = pd.concat({f: panel[f].astype('float64' if f == 'Volume' else 'float32')
+                       for f in ('Open', 'High', 'Low', 'Close', 'Volume')}, axis=1)
+    assert list(panel['Close'].columns) == tickers
+    assert panel.index.equals(pd.DatetimeIndex(dates))
+
+    # Panel columns and column-wise indicators equal the single-ticker path
+    for ticker, df in frames.items():
+        for field in df.columns:
+            assert np.array_equal(panel[field][ticker].dropna().to_numpy(), df[field].to_numpy())
+    planned = IndicatorPlan.from_config({}, conditions).evaluate(panel)
+    for ticker in ('T05', 'T01', 'T02'):  # full history, late listing, stopped trading
+        bars = frames[ticker].index
+        single = IndicatorPlan.from_config({}, conditions).evaluate(frames[ticker])
+        for key, series in single.refs.items():
+            ours = planned.refs[key][ticker].loc[bars].to_numpy()
+            assert np.array_equal(ours, series.to_numpy(), equal_nan=True), (ticker, key)
+
+    evaluators = {}
+    for ticker, df in frames.items():
+        one = IndicatorPlan.from_config({}, conditions).evaluate(df)
+        evaluators[ticker] = SignalEvaluator(df, one.outputs, one)
+    for logic in ('all', 'any'):
+        expected = [t for t, ev in evaluators.items() if ConditionPlan(conditions, logic).run(ev)[-1]]
+        result = screen(panel, conditions, logic)
+        assert result['matches'] == expected
+        assert result['screened'] == len(tickers)
+        for ticker in result['matches']:
+            assert result['as_of'][ticker] == frames[ticker].index[-1].strftime('%Y-%m-%d')
+        if logic == 'all':
+            assert 0 < len(expected) < len(tickers)
+
+
+def test_ticker_store_matches_day_files():
+    tickers = ['AAA', 'LATE', 'GONE', 'BRK.B']  # LATE lists in the appended days
+    dates = pd.bdate_range('2023-12-11', periods=45)  # every weekday has a file: no S3 lookups
+    with tempfile.TemporaryDirectory() as staging, tempfile.TemporaryDirectory() as cache_dir:
+        all_days = _write_day_files(staging, tickers, dates)
+        files = sorted(Path(staging).glob('*.parquet'))
+
+        def arrive(paths):
+            for path in paths:
+                shutil.copy(path, cache_dir)
+
+        arrive(files[:40])
+        pf = PolygonFlatFiles(cache_dir=cache_dir)
+        day_file = pf._get_day_file
+        start, end, last = '2023-12-12', '2024-01-15', dates[-1].strftime('%Y-%m-%d')
+        expected = {t: pf.get_daily_bars(t, start, end) for t in tickers}
+
+        assert pf.compact() == 40
+        assert sorted(p.name for p in (pf.store_dir / 'AAA').iterdir()) == ['2023.parquet', '2024.parquet']
+        pf._get_day_file = None  # compacted days must not touch the day files
+        for ticker in tickers:
+            pd.testing.assert_frame_equal(pf.get_daily_bars(ticker, start, end), expected[ticker])
+        assert pf.get_daily_bars('MISSING', start, end).empty
+
+        # new day files are read from the day files until the next compaction appends them
+        arrive(files[40:])
+        pf._get_day_file = day_file
+        tail = pf.get_daily_bars('AAA', start, last)
+        assert np.array_equal(tail['Close'].to_numpy(dtype='float32'), all_days['AAA'].loc[start:, 'Close'].to_numpy())
+        late = pf.get_daily_bars('LATE', start, last)
+        assert len(late) == 5
+        assert pf.compact(min_new_days=6) == 0  # batched: the 5 new files wait
+        assert pf.compact() == 5 and pf.compact() == 0
+        pf._get_day_file = None
+        pd.testing.assert_frame_equal(pf.get_daily_bars('AAA', start, last), tail)
+        pd.testing.assert_frame_equal(pf.get_daily_bars('LATE', start, last), late)
+
+        # back-filled older days merge into the existing year files in date order
+        _write_day_files(cache_dir, tickers, pd.bdate_range('2023-12-01', periods=6), seed=2)
+        assert pf.compact() == 6
+        day_files_only = PolygonFlatFiles(cache_dir=cache_dir)
+        day_files_only.store_dir = Path(cache_dir) / 'no_store'
+        for ticker in tickers:
+            pd.testing.assert_frame_equal(pf.get_daily_bars(ticker, '2023-12-01', last),
+                                          day_files_only.get_daily_bars(ticker, '2023-12-01', last))
+
+
+def test_ticker_store_reads_holes_from_day_files():
+    tickers = ['AAA', 'BBB']
+    dates = pd.bdate_range('2024-01-01', periods=20)  # every weekday has a file: no S3 lookups
+    with tempfile.TemporaryDirectory() as staging, tempfile.TemporaryDirectory() as cache_dir:
+        all_days = _write_day_files(staging, tickers, dates)
+        files = sorted(Path(staging).glob('*.parquet'))
+        for path in files[:5] + files[15:]:
+            shutil.copy(path, cache_dir)
+        pf = PolygonFlatFiles(cache_dir=cache_dir)
+        assert pf.compact() == 10
+
+        # days cached after the compaction fall inside the compacted range but are not in the store
+        for path in files[5:15]:
+            shutil.copy(path, cache_dir)
+        start, end = dates[0].strftime('%Y-%m-%d'), dates[-1].strftime('%Y-%m-%d')
+        bars = pf.get_daily_bars('AAA', start, end)
+        assert bars.index.equals(pd.DatetimeIndex(dates))
+        assert np.array_equal(bars['Close'].to_numpy(dtype='float32'), all_days['AAA']['Close'].to_numpy())
+        assert pf.compact() == 10
+        pd.testing.assert_frame_equal(pf.get_daily_bars('AAA', start, end), bars)
+
+
+def test_ticker_store_recompacts_after_a_crash():
+    tickers = ['AAA', 'BBB']
+    dates = pd.bdate_range('2024-01-01', periods=15)
+    with tempfile.TemporaryDirectory() as staging, tempfile.TemporaryDirectory() as cache_dir:
+        _write_day_files(staging, tickers, dates)
+        files = sorted(Path(staging).glob('*.parquet'))
+        for path in files[:10]:
+            shutil.copy(path, cache_dir)
+        pf = PolygonFlatFiles(cache_dir=cache_dir)
+        assert pf.compact() == 10
+
+        # the year files are rewritten but the process dies before the manifest is saved
+        for path in files[10:]:
+            shutil.copy(path, cache_dir)
+
+        def crash(key, days):
+            raise RuntimeError('killed')
+
+        pf._update_manifest = crash
+        try:
+            pf.compact()
+        except RuntimeError:
+            pass
+        del pf._update_manifest
+        assert pf.compact() == 5
+        start, end = dates[0].strftime('%Y-%m-%d'), dates[-1].strftime('%Y-%m-%d')
+        day_files_only = PolygonFlatFiles(cache_dir=cache_dir)
+        day_files_only.store_dir = Path(cache_dir) / 'no_store'
+        for ticker in tickers:
+            bars = pf.get_daily_bars(ticker, start, end)
+            assert bars.index.is_unique
+            pd.testing.assert_frame_equal(bars, day_files_only.get_daily_bars(ticker, start, end))
+
+
+def test_missing_days_are_not_fetched_again():
+    dates = pd.bdate_range('2024-01-08', periods=10)
+    holiday = pd.Timestamp('2024-01-15')  # weekday without a day file
+    with tempfile.TemporaryDirectory() as cache_dir:
+        _write_day_files(cache_dir, ['AAA'], dates.drop(holiday))
+        lookups = []
+
+        def no_such_key(pf):
+            def get_object(Bucket, Key):
+                lookups.append(Key)
+                raise pf.s3_client.exceptions.NoSuchKey({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+            return get_object
+
+        pf = PolygonFlatFiles(cache_dir=cache_dir)
+        pf.s3_client.get_object = no_such_key(pf)
+        start, end = dates[0].strftime('%Y-%m-%d'), dates[-1].strftime('%Y-%m-%d')
+        bars = pf.get_daily_bars('AAA', start, end)
+        assert len(bars) == 9
+        assert lookups == ['us_stocks_sip/day_aggs_v1/2024/01/2024-01-15.csv.gz']  # weekends never go to S3
+
+        fresh = PolygonFlatFiles(cache_dir=cache_dir)
+        fresh.s3_client.get_object = no_such_key(fresh)
+        pd.testing.assert_frame_equal(fresh.get_daily_bars('AAA', start, end), bars)
+        assert len(fresh.get_daily_panel(['AAA'], start, end)) == 9
+        fresh.preload_range(start, end)
+        assert len(lookups) == 1
+
+
+def test_load_universe():
+    universe = load_universe()
+    assert len(universe) == 502 and 'BRK.B' in universe and 'AAPL' in universe
+
+
+if __name__ == "__main__":
+    test_screen_matches_per_ticker()
+    test_ticker_store_matches_day_files()
+    test_ticker_store_reads_holes_from_day_files()
+    test_ticker_store_recompacts_after_a_crash()
+    test_missing_days_are_not_fetched_again()
+    test_load_universe()
+    print("✓ Screener parity tests passed")
@@ -5,6 +5,7 @@ Benchmark and buy-hold helpers.
 from __future__ import annotations
 import pandas as pd
 import yfinance as yf
+from .data import DOWNLOAD_LOCK
 
 OHLCV = ["Open", "High", "Low", "Close", "Volume"]
 
@@ -29,10 +30,11 @@ def load_benchmark(symbol: str, *, start: str | None, end: str | None, auto_adju
     """
     Return OHLCV for benchmark with UTC index and float dtypes.
     """
-    df = yf.download(
-        symbol, start=start, end=end, interval="1d",
-        auto_adjust=auto_adjust, progress=False, group_by="column"
-    )
+    with DOWNLOAD_LOCK:
+        df = yf.download(
+            symbol, start=start, end=end, interval="1d",
+            auto_adjust=auto_adjust, progress=False, group_by="column"
+        )
     if df.empty:
         raise ValueError(f"No benchmark data for {symbol}")
     df = _normalize_columns(df).astype({
@@ -47,7 +47,11 @@ PORTFOLIO_WEIGHTS = {           # Fixed allocation weights (sum to 1.0, or None
     "QQQ": 0.60,
 }
 PORTFOLIO_TARGET_UTILIZATION = 0.95  # Portion of capital to deploy (0.0–1.0)
-PORTFOLIO_USE_PARAM_GRID = False  # False = use PORTFOLIO_STRATEGIES, True = use PORTFOLIO_PARAM_GRID
+PORTFOLIO_CALENDAR = "intersection"  # "intersection" = dates every ticker has, "union" = all dates, skip tickers without a bar
+PORTFOLIO_LOAD_WORKERS = 8       # Threads fetching ticker + benchmark prices at once (1 = one at a time; yfinance downloads are serialized)
+PORTFOLIO_REBALANCE = None        # None, "monthly", "quarterly" or "drift": resize held positions back to target weight
+PORTFOLIO_DRIFT_BAND = 0.05       # Drift rebalancing: trade when a held weight is this far (absolute) from target
+PORTFOLIO_USE_PARAM_GRID = False  # False = use PORTFOLIO_STRATEGIES, True = run every PORTFOLIO_PARAM_GRID combo (portfolio_grid rows), best by TOP_BY saved in full
 PORTFOLIO_STRATEGIES = {
     "SPY": {
         "rsi_period": 14,
@@ -60,6 +64,13 @@ PORTFOLIO_STRATEGIES = {
         "rsi_sell_above": 75,
     },
 }
+PORTFOLIO_UNIVERSE = None        # CSV with a Symbol column (e.g. "spy503.csv") = trade that universe at equal weight instead of TICKERS
+PORTFOLIO_UNIVERSE_STRATEGY = {  # Universe: strategy for symbols without a PORTFOLIO_STRATEGIES entry
+    "rsi_period": 14,
+    "rsi_buy_below": 30,
+    "rsi_sell_above": 70,
+}
+UNIVERSE_REPORT_EVERY = 100      # Universe: report wall time / peak RSS every N loaded tickers
 PORTFOLIO_PARAM_GRID = {
     "SPY": [
         {"rsi_period": 14, "rsi_buy_below": 40, "rsi_sell_above": 80},
@@ -78,6 +89,7 @@ ENTRY_FEES_BPS = 10            # Entry transaction fees in basis points
 SLIP_OPEN_BPS = 2              # Entry slippage in basis points
 EXIT_FEES_BPS = 10             # Exit transaction fees in basis points
 SLIP_CLOSE_BPS = 2             # Exit slippage in basis points
+ENGINE = "vectorized"          # Simulation engine: "vectorized" (array kernel), "batch" (whole threshold grid in one pass) or "loop" (reference per-bar loop)
 
 #========================= Data Source =========================
 SOURCE = "yfinance"            # Data source: "yfinance" (only option currently)
@@ -89,6 +101,21 @@ RSI_PERIOD = [14]              # RSI lookback period(s) - list for parameter gri
 # RSI_PERIOD = [12,13,14,15,16,17,18,19]  # Full grid example
 RSI_BUY_BELOW = [5,10,15,20,25,30,35,40,45]    # Buy threshold(s)
 RSI_SELL_ABOVE = [55,60,65,70,75,80,85,90,95]  # Sell threshold(s)
+GRID_WORKERS = None            # Grid worker processes (None = one per core, 1 = serial)
+GRID_METRICS_ONLY = False      # True = KPI-only sweep, then full re-run of top combos (TOP_BY / PRINT_TOP_K)
+TOP_BY = ["total_return"]      # Metric(s) used to rank combos
+PRINT_TOP_K = 3                # Combos kept per symbol and metric
+SEARCH_MODE = "grid"           # "grid" = every combo on full history, "halving" = successive halving
+HALVING_ETA = 3                # Halving: keep 1/ETA of combos per rung, grow the window ETA-fold
+HALVING_MIN_BARS = 504         # Halving: first-rung window (bars)
+HALVING_SEED = 0               # Halving: tie-break seed (reproducible survivors)
+WALK_FORWARD = False           # True = rolling train/test optimization, stitched out-of-sample curve
+WF_TRAIN_BARS = 756            # Walk-forward: train window (bars)
+WF_TEST_BARS = 252             # Walk-forward: test window (bars)
+WF_STEP_BARS = None            # Walk-forward: window advance (None = WF_TEST_BARS)
+MONTE_CARLO = False            # Bootstrap closed-trade PnLs into synthetic paths (mc_* metrics)
+MC_PATHS = 10000               # Monte Carlo: number of paths
+MC_SEED = 0                    # Monte Carlo: root seed (reproducible distributions)
 
 #========================= Output & Storage =========================
 # CSV Export
@@ -99,6 +126,8 @@ SAVE_METRICS = True            # Export metrics to CSV
 SAVE_DB = True                 # Save results to SQLite database
 DB_PATH = "./results/db"       # Database folder (backtests.db will be created here)
 SAVE_TRADES = True             # Store individual trade records
+SAVE_ENGINE_STATE = False      # Store end-of-run engine state (per symbol/params, or the portfolio) for incremental resume
+RESUME_FROM_RUN = None         # run_id whose saved states to continue (only new bars are simulated); plain grid or portfolio
 
 # Tearsheets (generated on-demand from frontend)
 TEARSHEETS_DIR = "./results/tearsheets"
@@ -3,12 +3,17 @@ Fetch OHLCV via yfinance. Normalize columns whether single- or multi-index.
 No caching.
 """
 import os
+import threading
 import pandas as pd
 import yfinance as yf
 from .settings import get
 
 OHLCV = ["Open", "High", "Low", "Close", "Volume"]
 
+# yf.download keeps its results in module globals, so concurrent calls (portfolio
+# loads run on a thread pool) can swap each other's frames: one download at a time
+DOWNLOAD_LOCK = threading.Lock()
+
 def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
     Return a DataFrame with columns exactly OHLCV.
@@ -52,15 +57,16 @@ def load_bars(symbols: list[str]) -> dict[str, pd.DataFrame]:
 
     out: dict[str, pd.DataFrame] = {}
     for s in symbols:
-        df = yf.download(
-            s,
-            start=start,
-            end=end,
-            interval="1d",
-            auto_adjust=auto_adjust,
-            progress=False,
-            group_by="column",  # prefer field-first layout
-        )
+        with DOWNLOAD_LOCK:
+            df = yf.download(
+                s,
+                start=start,
+                end=end,
+                interval="1d",
+                auto_adjust=auto_adjust,
+                progress=False,
+                group_by="column",  # prefer field-first layout
+            )
         if df.empty:
             continue
 
@@ -116,7 +122,8 @@ def get_data(symbol: str, start=None, end=None):
     # 2) yfinance fallback
     if df is None:
         try:
-            yf_df = yf.download(symbol, start=start, end=end, progress=False, auto_adjust=False)
+            with DOWNLOAD_LOCK:
+                yf_df = yf.download(symbol, start=start, end=end, progress=False, auto_adjust=False)
             if not yf_df.empty:
                 yf_df.index.name = "date"
                 df = yf_df
@@ -12,14 +12,22 @@ Schema (version 1):
             total_return REAL, cagr REAL, sharpe REAL, sortino REAL,
             vol REAL, maxdd REAL,
             FOREIGN KEY(run_id) REFERENCES runs(run_id))
+  portfolio_grid(run_id TEXT, combo_id INTEGER, params_json TEXT, metrics_json TEXT,
+                 total_return REAL, cagr REAL, sharpe REAL, sortino REAL,
+                 vol REAL, maxdd REAL, PRIMARY KEY(run_id, combo_id),
+                 FOREIGN KEY(run_id) REFERENCES runs(run_id))
   portfolio_weights(id INTEGER PK, run_id TEXT, symbol TEXT, weight REAL,
                     FOREIGN KEY(run_id) REFERENCES runs(run_id))
+  engine_state(run_id TEXT, ticker TEXT, params_json TEXT, state_json TEXT, bars INTEGER,
+               updated_at REAL, PRIMARY KEY(run_id, ticker, params_json))
 
 Lightweight helper functions:
   init_db(db_path) -> ensures schema
   ensure_run_row(run_id, mode, config_dict)
   insert_strategy_metrics(run_id, symbol, params, metrics)
   insert_portfolio_metrics(run_id, metrics, weights_dict)
+  insert_portfolio_grid_metrics(run_id, combo_id, params, metrics) -> one row per PORTFOLIO_PARAM_GRID combo
+  save_engine_state / load_engine_state(run_id, ticker, params) -> end-of-run state for resume
 
 Design goals:
   - Keep common numeric metrics in dedicated columns for fast filtering.
@@ -27,11 +35,14 @@ Design goals:
   - Avoid long-lived connections; open per operation (sufficient for modest run sizes).
 """
 from __future__ import annotations
-import os, json, sqlite3, time, threading
+import os, json, sqlite3, time, threading, base64
 from typing import Dict, Any, List
 
 _lock = threading.Lock()
 
+_GRID_CORE = ["total_return", "cagr", "sharpe", "sortino", "vol", "maxdd",
+              "win_rate", "net_win_rate", "avg_trade_pnl", "trades_total"]
+
 # ------------ Path handling ------------
 def _normalize_path(path: str) -> str:
     if path.lower().endswith((".db", ".sqlite")):
@@ -159,6 +170,27 @@ def init_db(db_path: str) -> str:
           FOREIGN KEY(run_id) REFERENCES runs(run_id)
         );""")
         
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS portfolio_grid(
+          run_id TEXT,
+          combo_id INTEGER,
+          params_json TEXT,
+          total_return REAL,
+          cagr REAL,
+          sharpe REAL,
+          sortino REAL,
+          vol REAL,
+          maxdd REAL,
+          win_rate REAL,
+          net_win_rate REAL,
+          avg_trade_pnl REAL,
+          trades_total INTEGER,
+          metrics_json TEXT,
+          created_at REAL,
+          PRIMARY KEY(run_id, combo_id),
+          FOREIGN KEY(run_id) REFERENCES runs(run_id)
+        );""")
+        
         cur.execute("""
         CREATE TABLE IF NOT EXISTS portfolio_weights(
           run_id TEXT,
@@ -183,6 +215,18 @@ def init_db(db_path: str) -> str:
           FOREIGN KEY(run_id) REFERENCES runs(run_id)
         );""")
         
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS engine_state(
+          run_id TEXT,
+          ticker TEXT,
+          params_json TEXT,
+          state_json TEXT,
+          bars INTEGER,
+          updated_at REAL,
+          PRIMARY KEY(run_id, ticker, params_json),
+          FOREIGN KEY(run_id) REFERENCES runs(run_id)
+        );""")
+        
         # Restore backup data if we reset
         if needs_reset and backup_data:
             try:
@@ -291,6 +335,18 @@ def insert_portfolio_metrics(db_file: str, run_id: str, metrics: Dict[str, Any],
         ))
         con.commit()
 
+def insert_portfolio_grid_metrics(db_file: str, run_id: str, combo_id: int,
+                                  params: Dict[str, Any], metrics: Dict[str, Any]):
+    """One row per PORTFOLIO_PARAM_GRID combo (metrics only; the best combo's full run goes to portfolio)."""
+    core = [metrics.get(k) for k in _GRID_CORE]
+    with _lock, sqlite3.connect(db_file) as con:
+        con.execute(f"""
+        INSERT OR REPLACE INTO portfolio_grid(run_id,combo_id,params_json,{",".join(_GRID_CORE)},
+                                              metrics_json,created_at)
+        VALUES ({",".join("?" * (len(_GRID_CORE) + 5))})
+        """, (run_id, int(combo_id), _json(params), *core, _json(metrics), time.time()))
+        con.commit()
+
 def insert_portfolio_weights(db_file: str, run_id: str, weights: Dict[str, float]):
     if not weights: return
     rows = [(run_id, t, float(w)) for t, w in weights.items()]
@@ -325,8 +381,61 @@ def insert_trades(db_file: str, run_id: str, trades: List[Dict[str, Any]]):
         VALUES (?,?,?,?,?,?,?,?,?)""", rows)
         con.commit()
 
+# ------------ Engine state (incremental resume) ------------
+PORTFOLIO_STATE_TICKER = "__portfolio__"
+
+def _encode_state(obj: Any) -> Any:
+    # arrays go in as raw bytes so floats round-trip bit for bit
+    import numpy as np
+    if isinstance(obj, np.ndarray):
+        arr = np.ascontiguousarray(obj)
+        return {"__ndarray__": base64.b64encode(arr.tobytes()).decode("ascii"),
+                "dtype": arr.dtype.str, "shape": list(arr.shape)}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, dict):
+        return {k: _encode_state(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_encode_state(v) for v in obj]
+    return obj
+
+def _decode_state(obj: Any) -> Any:
+    import numpy as np
+    if isinstance(obj, dict):
+        if "__ndarray__" in obj:
+            raw = base64.b64decode(obj["__ndarray__"])
+            return np.frombuffer(raw, dtype=np.dtype(obj["dtype"])).reshape(obj["shape"]).copy()
+        return {k: _decode_state(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_decode_state(v) for v in obj]
+    return obj
+
+def save_engine_state(db_file: str, run_id: str, ticker: str,
+                      params: Dict[str, Any], state: Dict[str, Any]):
+    """Persist an engine end-of-run state (run_symbol / simulate_portfolio return_state)."""
+    bars = len(state.get("index_ns", []))
+    with _lock, sqlite3.connect(db_file) as con:
+        con.execute("""
+        INSERT OR REPLACE INTO engine_state(run_id,ticker,params_json,state_json,bars,updated_at)
+        VALUES (?,?,?,?,?,?)""", (run_id, ticker, _json(params), json.dumps(_encode_state(state)),
+                                  bars, time.time()))
+        con.commit()
+
+def load_engine_state(db_file: str, run_id: str, ticker: str,
+                      params: Dict[str, Any] = None) -> Dict[str, Any] | None:
+    """Latest saved state for (run_id, ticker[, params]); None when nothing was saved."""
+    sql = "SELECT state_json FROM engine_state WHERE run_id=? AND ticker=?"
+    args: list = [run_id, ticker]
+    if params is not None:
+        sql += " AND params_json=?"
+        args.append(_json(params))
+    with _lock, sqlite3.connect(db_file) as con:
+        row = con.execute(sql + " ORDER BY updated_at DESC LIMIT 1;", args).fetchone()
+    return _decode_state(json.loads(row[0])) if row else None
+
 __all__ = [
     "init_db","ensure_run","finalize_run","update_run_benchmark",
-    "insert_strategy_metrics","insert_portfolio_metrics",
-    "insert_portfolio_weights","insert_trades"
+    "insert_strategy_metrics","insert_portfolio_metrics","insert_portfolio_grid_metrics",
+    "insert_portfolio_weights","insert_trades",
+    "save_engine_state","load_engine_state","PORTFOLIO_STATE_TICKER"
 ]
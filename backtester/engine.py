@@ -1,10 +1,15 @@
 # backtester/engine.py
 from __future__ import annotations
+from dataclasses import dataclass, asdict
+import numpy as np
 import pandas as pd
 from .settings import get
-from .indicators import compute_basic
-from .signals import build_signals
-from .metrics import kpis_from_equity
+from .indicators import compute_basic, compute_basic_batch, rsi_sma_state, rsi_sma_resume
+from .signals import build_signals, build_signals_batch
+from .metrics import kpis_from_equity, kpis_from_array
+from .grid import plan_grid
+
+ENGINES = ("vectorized", "batch", "loop")
 
 def _exec_price(open_px: float, close_px: float, side: str, when: str) -> float:
     """
@@ -18,43 +23,437 @@ def _exec_price(open_px: float, close_px: float, side: str, when: str) -> float:
         base = close_px
     return base * (1.0 + slip) if side == "buy" else base * (1.0 - slip)
 
-def run_symbol(
-    df: pd.DataFrame, *,
-    rsi_period: int,
-    rsi_buy_below: float = None,
-    rsi_sell_above: float = None,
-    rsi_bb_period: int = None,
-    rsi_bb_std_dev: float = None,
-    use_rsi_bb: bool = False
-) -> dict:
+#========================= Execution params =========================
+@dataclass(frozen=True)
+class ExecParams:
+    """Execution settings frozen once per run so the kernel never touches CONFIG."""
+    order_type: str
+    when: str
+    fee_in: float
+    fee_out: float
+    target_w: float
+    init_cap: float
+    slip_bps_open: float
+    slip_bps_close: float
+
+    @property
+    def slip(self) -> float:
+        return (self.slip_bps_open if self.when == "next_open" else self.slip_bps_close) / 1e4
+
+    @property
+    def slip_bps(self) -> float:
+        return self.slip_bps_open if self.when == "next_open" else self.slip_bps_close
+
+def exec_params() -> ExecParams:
+    """Snapshot the execution settings from CONFIG."""
+    order_type = get("ORDER_TYPE")
+    return ExecParams(
+        order_type=order_type,
+        when="next_open" if order_type == "MOO" else "next_close",
+        fee_in=float(get("ENTRY_FEES_BPS", 0.0)) / 1e4,
+        fee_out=float(get("EXIT_FEES_BPS", 0.0)) / 1e4,
+        target_w=float(get("TARGET_WEIGHT", 1.0)),
+        init_cap=float(get("INITIAL_CAPITAL", 100_000.0)),
+        slip_bps_open=float(get("SLIP_OPEN_BPS", 0.0)),
+        slip_bps_close=float(get("SLIP_CLOSE_BPS", 0.0)),
+    )
+
+#========================= Array kernel =========================
+def simulate(opens: np.ndarray, closes: np.ndarray,
+             entry: np.ndarray, exit_: np.ndarray, p: ExecParams, *,
+             out: np.ndarray = None, record_fills: bool = True, state: dict = None) -> dict:
     """
-    Backtest RSI long only with MOO or MOC and integer shares.
-    Decide at bar i close, execute at bar i+1 open or close, mark to bar i+1 close.
-    Returns dict with equity series, metrics, and event markers.
-    
-    Args:
-        df: OHLCV DataFrame
-        rsi_period: RSI calculation period (e.g., 14)
-        rsi_buy_below: Fixed RSI threshold for entry (e.g., 30) - ignored if use_rsi_bb=True
-        rsi_sell_above: Fixed RSI threshold for exit (e.g., 70) - ignored if use_rsi_bb=True
-        rsi_bb_period: Bollinger Band period for RSI (e.g., 20)
-        rsi_bb_std_dev: Bollinger Band std dev multiplier (e.g., 2.0)
-        use_rsi_bb: If True, use Bollinger Bands instead of fixed thresholds
+    Long-only state machine over raw arrays. Same rules as the reference loop:
+    decide at bar i close, fill at bar i+1 open/close, mark to bar i+1 close.
+
+    Instead of visiting every bar, the kernel jumps between signal bars with
+    searchsorted and fills the flat/held stretches of the equity curve with
+    slice assignments, so interpreted work scales with trades, not bars.
+
+    Returns dict with equity (float64 array), fills (bar, side, price, qty, fee),
+    entries, exits, wins, closed_round_trips, round_trip_pnls and the closing
+    cash, shares, buy_px.
+    out: optional preallocated float64 buffer (len >= n) reused as the equity array.
+    record_fills: False skips the fill log (metrics-only sweeps).
+    state: closing cash/shares/buy_px/counters of a previous call; the arrays then
+           start at that call's last bar (its pending decision bar). round_trip_pnls
+           only lists the new round trips.
     """
-    # indicators and signals
-    ind = compute_basic(
-        df, 
-        rsi_period=int(rsi_period),
-        rsi_bb_period=rsi_bb_period,
-        rsi_bb_std_dev=rsi_bb_std_dev
+    n = closes.shape[0]
+    equity = out[:n] if out is not None else np.empty(n, dtype="float64")
+    fills: list[tuple] = []
+    round_trip_pnls: list[float] = []
+    st = state or {}
+    cash = st.get("cash", p.init_cap)
+    shares = st.get("shares", 0)
+    buy_px = st.get("buy_px", 0.0)
+    entries = st.get("entries", 0)
+    exits = st.get("exits", 0)
+    wins = st.get("wins", 0)
+    closed_round_trips = st.get("closed_round_trips", 0)
+
+    def _result():
+        return dict(equity=equity, fills=fills, entries=entries, exits=exits, wins=wins,
+                    closed_round_trips=closed_round_trips, round_trip_pnls=round_trip_pnls,
+                    cash=cash, shares=shares, buy_px=buy_px)
+
+    if n == 0:
+        return _result()
+
+    base = opens if p.when == "next_open" else closes
+    buy_mult = 1.0 + p.slip
+    sell_mult = 1.0 - p.slip
+    entry_bars = np.flatnonzero(entry[:n - 1])
+    exit_bars = np.flatnonzero(exit_[:n - 1])
+
+    seg_start = 0   # first bar not yet written to equity
+    scan = 0        # first decision bar eligible for an entry
+
+    while True:
+        if shares == 0:
+            k = int(np.searchsorted(entry_bars, scan))
+            if k >= entry_bars.size:
+                break
+            i = int(entry_bars[k])
+            px = base[i + 1] * buy_mult
+            target_dollars = p.target_w * cash
+            affordable = int(cash // (px * (1.0 + p.fee_in)))
+            target_q = int(target_dollars // px)
+            qty = max(0, min(affordable, target_q))
+            if qty <= 0:
+                scan = i + 1
+                continue
+
+            # flat stretch up to (and including) the decision bar
+            equity[seg_start:i + 1] = cash
+            buy_px = px
+            notional = qty * px
+            fee = p.fee_in * notional
+            cash -= notional + fee
+            shares = qty
+            entries += 1
+            if record_fills:
+                fills.append((i + 1, "buy", float(px), int(qty), float(fee)))
+            seg_start = i + 1
+
+        # held from seg_start: the first exit decision at or after it closes the trade
+        k = int(np.searchsorted(exit_bars, seg_start))
+        if k >= exit_bars.size:
+            equity[seg_start:] = cash + shares * closes[seg_start:]
+            seg_start = n
+            break
+        j = int(exit_bars[k])
+        equity[seg_start:j + 1] = cash + shares * closes[seg_start:j + 1]
+
+        px = base[j + 1] * sell_mult
+        gross_pnl = (px - buy_px) * shares
+        fee_cost = (buy_px * shares * p.fee_in) + (px * shares * p.fee_out)
+        net_pnl = gross_pnl - fee_cost
+        round_trip_pnls.append(net_pnl)
+        closed_round_trips += 1
+        if net_pnl > 0:
+            wins += 1
+        notional = shares * px
+        fee = p.fee_out * notional
+        cash += notional - fee
+        exits += 1
+        if record_fills:
+            fills.append((j + 1, "sell", float(px), int(shares), float(fee)))
+        shares = 0
+        seg_start = j + 1
+        scan = j + 1
+
+    equity[seg_start:] = cash
+    return _result()
+
+def simulate_batch(opens: np.ndarray, closes: np.ndarray,
+                   entry: np.ndarray, exit_: np.ndarray, p: ExecParams, *,
+                   record_fills: bool = True) -> dict:
+    """
+    Lockstep version of simulate() for a whole threshold grid.
+    entry/exit are (n_params, n_bars) matrices from build_signals_batch; every
+    param set advances bar by bar together, so the grid costs one pass over the data.
+
+    Returns dict with equity (n_params, n_bars), fills and round_trip_pnls (one list
+    per param set; empty when record_fills is False), and per-param arrays entries,
+    exits, wins, closed_round_trips, pnl_sum.
+    """
+    n_params, n = entry.shape
+    equity = np.empty((n_params, n), dtype="float64")
+    fills: list[list[tuple]] = [[] for _ in range(n_params)]
+    round_trip_pnls: list[list[float]] = [[] for _ in range(n_params)]
+    cash = np.full(n_params, p.init_cap, dtype="float64")
+    shares = np.zeros(n_params, dtype="int64")
+    buy_px = np.zeros(n_params, dtype="float64")
+    entries = np.zeros(n_params, dtype="int64")
+    exits = np.zeros(n_params, dtype="int64")
+    wins = np.zeros(n_params, dtype="int64")
+    pnl_sum = np.zeros(n_params, dtype="float64")
+    if n == 0:
+        return dict(equity=equity, fills=fills, entries=entries, exits=exits, wins=wins,
+                    closed_round_trips=exits.copy(), pnl_sum=pnl_sum,
+                    round_trip_pnls=round_trip_pnls)
+
+    base = opens if p.when == "next_open" else closes
+    buy_mult = 1.0 + p.slip
+    sell_mult = 1.0 - p.slip
+    equity[:, 0] = cash
+
+    for i in range(n - 1):
+        flat = shares == 0
+        buy = flat & entry[:, i]
+        sell = ~flat & exit_[:, i]
+
+        if buy.any():
+            px = base[i + 1] * buy_mult
+            rows = np.flatnonzero(buy)
+            c = cash[rows]
+            affordable = c // (px * (1.0 + p.fee_in))
+            target_q = (p.target_w * c) // px
+            qty = np.maximum(0, np.minimum(affordable, target_q)).astype("int64")
+            ok = qty > 0
+            rows, qty = rows[ok], qty[ok]
+            if rows.size:
+                notional = qty * px
+                fee = p.fee_in * notional
+                cash[rows] -= notional + fee
+                shares[rows] = qty
+                buy_px[rows] = px
+                entries[rows] += 1
+                if record_fills:
+                    for r, q, f in zip(rows.tolist(), qty.tolist(), fee.tolist()):
+                        fills[r].append((i + 1, "buy", float(px), q, f))
+
+        if sell.any():
+            px = base[i + 1] * sell_mult
+            rows = np.flatnonzero(sell)
+            q = shares[rows]
+            bp = buy_px[rows]
+            gross_pnl = (px - bp) * q
+            fee_cost = (bp * q * p.fee_in) + (px * q * p.fee_out)
+            net_pnl = gross_pnl - fee_cost
+            pnl_sum[rows] += net_pnl
+            wins[rows] += net_pnl > 0
+            notional = q * px
+            fee = p.fee_out * notional
+            cash[rows] += notional - fee
+            shares[rows] = 0
+            exits[rows] += 1
+            if record_fills:
+                for r, qq, f, pnl in zip(rows.tolist(), q.tolist(), fee.tolist(), net_pnl.tolist()):
+                    fills[r].append((i + 1, "sell", float(px), qq, f))
+                    round_trip_pnls[r].append(pnl)
+
+        # mark to close of i+1
+        equity[:, i + 1] = cash + shares * closes[i + 1]
+
+    return dict(equity=equity, fills=fills, entries=entries, exits=exits, wins=wins,
+                closed_round_trips=exits.copy(), pnl_sum=pnl_sum,
+                    round_trip_pnls=round_trip_pnls)
+
+def _events_from_fills(fills: list[tuple], idx: pd.Index, p: ExecParams) -> list[dict]:
+    return [{
+        "ts": idx[bar],
+        "type": side,
+        "price": price,
+        "qty": qty,
+        "fee": fee,
+        "order_type": p.order_type,
+        "slippage_bps": p.slip_bps,
+    } for bar, side, price, qty, fee in fills]
+
+def _finalize(equity, init_cap: float, entries: int, exits: int,
+              wins: int, closed_round_trips: int, round_trip_pnls: list) -> dict:
+    # Series -> pandas KPIs; raw buffer (metrics-only) -> array KPIs
+    m = kpis_from_equity(equity) if isinstance(equity, pd.Series) else kpis_from_array(equity)
+    win_rate = (wins / closed_round_trips) if closed_round_trips > 0 else None
+    net_win_rate = (wins / closed_round_trips) if closed_round_trips > 0 else None
+    avg_trade_pnl = (sum(round_trip_pnls) / len(round_trip_pnls)) if round_trip_pnls else None
+    m.update({
+        "init_cap": init_cap,
+        "trades_total": entries + exits,
+        "trades_entry": entries,
+        "trades_exit": exits,
+        "win_rate": win_rate,
+        "net_win_rate": net_win_rate,
+        "avg_trade_pnl": avg_trade_pnl,
+    })
+    return m
+
+def _run_kernel(df: pd.DataFrame, entry_sig: pd.Series, exit_sig: pd.Series, *,
+                metrics_only: bool = False, out: np.ndarray = None) -> dict:
+    p = exec_params()
+    sim = simulate(
+        df["Open"].to_numpy(dtype="float64"),
+        df["Close"].to_numpy(dtype="float64"),
+        entry_sig.to_numpy(dtype=bool),
+        exit_sig.to_numpy(dtype=bool),
+        p,
+        out=out if metrics_only else None,
+        record_fills=not metrics_only,
     )
-    entry_sig, exit_sig = build_signals(
+    if metrics_only:
+        m = _finalize(sim["equity"], p.init_cap, sim["entries"], sim["exits"], sim["wins"],
+                      sim["closed_round_trips"], sim["round_trip_pnls"])
+        return {"equity": None, "metrics": m, "events": None}
+    equity_s = pd.Series(sim["equity"], index=df.index, name="equity")
+    m = _finalize(equity_s, p.init_cap, sim["entries"], sim["exits"], sim["wins"],
+                  sim["closed_round_trips"], sim["round_trip_pnls"])
+    return {"equity": equity_s, "metrics": m, "events": _events_from_fills(sim["fills"], df.index, p),
+            "round_trip_pnls": sim["round_trip_pnls"]}
+
+def _run_batch(df: pd.DataFrame, ind: dict[str, pd.Series], group: list[dict], *,
+               metrics_only: bool = False) -> list[dict]:
+    """Run a fixed-threshold param group through simulate_batch; one result per param set."""
+    p = exec_params()
+    entry, exit_ = build_signals_batch(
         ind,
-        rsi_buy_below=float(rsi_buy_below) if rsi_buy_below is not None else None,
-        rsi_sell_above=float(rsi_sell_above) if rsi_sell_above is not None else None,
-        use_rsi_bb=use_rsi_bb
+        rsi_buy_below=[None if g.get("rsi_buy_below") is None else float(g["rsi_buy_below"]) for g in group],
+        rsi_sell_above=[None if g.get("rsi_sell_above") is None else float(g["rsi_sell_above"]) for g in group],
+    )
+    sim = simulate_batch(
+        df["Open"].to_numpy(dtype="float64"),
+        df["Close"].to_numpy(dtype="float64"),
+        entry, exit_, p,
+        record_fills=not metrics_only,
     )
+    out = []
+    for k in range(len(group)):
+        closed = int(sim["closed_round_trips"][k])
+        if metrics_only:
+            equity_s = None
+            m = kpis_from_array(sim["equity"][k])
+        else:
+            equity_s = pd.Series(sim["equity"][k], index=df.index, name="equity")
+            m = kpis_from_equity(equity_s)
+        m.update({
+            "init_cap": p.init_cap,
+            "trades_total": int(sim["entries"][k] + sim["exits"][k]),
+            "trades_entry": int(sim["entries"][k]),
+            "trades_exit": int(sim["exits"][k]),
+            "win_rate": (int(sim["wins"][k]) / closed) if closed > 0 else None,
+            "net_win_rate": (int(sim["wins"][k]) / closed) if closed > 0 else None,
+            "avg_trade_pnl": (float(sim["pnl_sum"][k]) / closed) if closed > 0 else None,
+        })
+        events = None if metrics_only else _events_from_fills(sim["fills"][k], df.index, p)
+        pnls = None if metrics_only else sim["round_trip_pnls"][k]
+        out.append({"equity": equity_s, "metrics": m, "events": events, "round_trip_pnls": pnls})
+    return out
+
+#========================= Incremental resume =========================
+STATE_VERSION = 2
+
+def _index_state(idx: pd.DatetimeIndex) -> dict:
+    return {"index_ns": idx.asi8.copy(), "index_unit": idx.unit,
+            "index_tz": str(idx.tz) if idx.tz is not None else None, "index_name": idx.name}
+
+def _index_from_state(state: dict) -> pd.DatetimeIndex:
+    raw = np.asarray(state["index_ns"], dtype="int64")
+    idx = pd.DatetimeIndex(raw.view(f"M8[{state['index_unit']}]"))
+    if state["index_tz"] is not None:
+        idx = idx.tz_localize("UTC").tz_convert(state["index_tz"])
+    idx.name = state["index_name"]
+    return idx
+
+def _run_resumable(df: pd.DataFrame, params: dict, *, state: dict = None,
+                   ind: dict[str, pd.Series] = None, metrics_only: bool = False) -> dict:
+    """
+    Kernel run that also returns its end-of-run state. With `state`, df holds only
+    the bars appended after that state; the run continues from the saved cash,
+    position, RSI running sums, counters and fills, and equity/metrics/events match
+    a full rerun bit for bit.
+    """
+    p = exec_params()
+    if state is None:
+        if ind is None:
+            ind = compute_basic(df, rsi_period=params["rsi_period"])
+        rsi = ind["RSI"]
+        rsi_state = rsi_sma_state(df["Close"], params["rsi_period"])
+        opens = df["Open"].to_numpy(dtype="float64")
+        closes = df["Close"].to_numpy(dtype="float64")
+        idx = df.index
+        prev_equity = np.empty(0, dtype="float64")
+        prev_pnls: list[float] = []
+        prev_fills: list = []
+        offset = 0
+    else:
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported engine state version {state.get('version')}")
+        if state["params"] != params:
+            raise ValueError(f"Engine state was saved for {state['params']}, not {params}")
+        if state["exec"] != asdict(p):
+            raise ValueError("Execution settings changed since the engine state was saved; rerun in full")
+        prev_idx = _index_from_state(state)
+        if len(df) and len(prev_idx) and df.index[0] <= prev_idx[-1]:
+            raise ValueError(f"Resume bars must start after {prev_idx[-1]}")
+        new_rsi, rsi_state = rsi_sma_resume(df["Close"], params["rsi_period"], state["rsi"])
+        # the saved last bar is still a pending decision bar: prepend it
+        rsi = pd.Series(np.concatenate(([np.float32(state["last_rsi"])], new_rsi.to_numpy())),
+                        dtype="float32")
+        opens = np.concatenate(([state["last_open"]], df["Open"].to_numpy(dtype="float64")))
+        closes = np.concatenate(([state["last_close"]], df["Close"].to_numpy(dtype="float64")))
+        idx = prev_idx.append(df.index)
+        prev_equity = np.asarray(state["equity"], dtype="float64")
+        prev_pnls = list(state["round_trip_pnls"])
+        prev_fills = state["fills"]
+        if prev_fills is None and not metrics_only:
+            raise ValueError("Engine state was saved by a metrics-only run and has no fills; rerun in full")
+        offset = 1
+
+    entry_sig, exit_sig = build_signals(
+        {"RSI": rsi},
+        rsi_buy_below=params["rsi_buy_below"],
+        rsi_sell_above=params["rsi_sell_above"],
+    )
+    sim = simulate(opens, closes, entry_sig.to_numpy(dtype=bool), exit_sig.to_numpy(dtype=bool),
+                   p, record_fills=not metrics_only, state=state)
+    equity = np.concatenate((prev_equity, sim["equity"][offset:]))
+    pnls = prev_pnls + sim["round_trip_pnls"]
+    if metrics_only:
+        fills = None
+    else:
+        # fill bars are positions in the full index; the prepended bar is prev_idx[-1]
+        base = len(idx) - len(opens)
+        fills = list(prev_fills) + [(bar + base, *rest) for bar, *rest in sim["fills"]]
+
+    if metrics_only:
+        equity_s, events = None, None
+        m = _finalize(equity, p.init_cap, sim["entries"], sim["exits"], sim["wins"],
+                      sim["closed_round_trips"], pnls)
+    else:
+        equity_s = pd.Series(equity, index=idx, name="equity")
+        m = _finalize(equity_s, p.init_cap, sim["entries"], sim["exits"], sim["wins"],
+                      sim["closed_round_trips"], pnls)
+        events = _events_from_fills(fills, idx, p)
+
+    new_state = {
+        "version": STATE_VERSION,
+        "params": params,
+        "exec": asdict(p),
+        **_index_state(idx),
+        "equity": equity,
+        "last_open": float(opens[-1]) if opens.size else None,
+        "last_close": float(closes[-1]) if closes.size else None,
+        "last_rsi": float(rsi.iloc[-1]) if len(rsi) else float("nan"),
+        "rsi": rsi_state,
+        "cash": float(sim["cash"]),
+        "shares": int(sim["shares"]),
+        "buy_px": float(sim["buy_px"]),
+        "entries": int(sim["entries"]),
+        "exits": int(sim["exits"]),
+        "wins": int(sim["wins"]),
+        "closed_round_trips": int(sim["closed_round_trips"]),
+        "round_trip_pnls": [float(x) for x in pnls],
+        "fills": fills,
+    }
+    return {"equity": equity_s, "metrics": m, "events": events,
+            "round_trip_pnls": None if metrics_only else pnls, "state": new_state}
 
+#========================= Reference loop =========================
+def _run_loop(df: pd.DataFrame, entry_sig: pd.Series, exit_sig: pd.Series) -> dict:
+    """
+    Original per-bar loop. Kept as the reference implementation for parity tests.
+    """
     # config
     order_type = get("ORDER_TYPE")
     when = "next_open" if order_type == "MOO" else "next_close"
@@ -141,20 +540,128 @@ def run_symbol(
         equity.append(cash + shares * closes[i + 1])
 
     equity_s = pd.Series(equity, index=idx[:len(equity)], name="equity")
+    m = _finalize(equity_s, init_cap, entries, exits, wins, closed_round_trips, round_trip_pnls)
+    return {"equity": equity_s, "metrics": m, "events": events, "round_trip_pnls": round_trip_pnls}
 
-    # kpis
-    m = kpis_from_equity(equity_s)
-    win_rate = (wins / closed_round_trips) if closed_round_trips > 0 else None
-    net_win_rate = (wins / closed_round_trips) if closed_round_trips > 0 else None
-    avg_trade_pnl = (sum(round_trip_pnls) / len(round_trip_pnls)) if round_trip_pnls else None
-    m.update({
-        "init_cap": init_cap,
-        "trades_total": entries + exits,
-        "trades_entry": entries,
-        "trades_exit": exits,
-        "win_rate": win_rate,
-        "net_win_rate": net_win_rate,
-        "avg_trade_pnl": avg_trade_pnl,
-    })
+#========================= Public entry point =========================
+def run_symbol(
+    df: pd.DataFrame, *,
+    rsi_period: int,
+    rsi_buy_below: float = None,
+    rsi_sell_above: float = None,
+    rsi_bb_period: int = None,
+    rsi_bb_std_dev: float = None,
+    use_rsi_bb: bool = False,
+    engine: str = None,
+    ind: dict[str, pd.Series] = None,
+    metrics_only: bool = False,
+    out: np.ndarray = None,
+    state: dict = None,
+    return_state: bool = False
+) -> dict:
+    """
+    Backtest RSI long only with MOO or MOC and integer shares.
+    Decide at bar i close, execute at bar i+1 open or close, mark to bar i+1 close.
+    Returns dict with equity series, metrics, event markers and the net PnL of
+    each closed round trip (round_trip_pnls).
 
-    return {"equity": equity_s, "metrics": m, "events": events}
+    Args:
+        df: OHLCV DataFrame
+        rsi_period: RSI calculation period (e.g., 14)
+        rsi_buy_below: Fixed RSI threshold for entry (e.g., 30) - ignored if use_rsi_bb=True
+        rsi_sell_above: Fixed RSI threshold for exit (e.g., 70) - ignored if use_rsi_bb=True
+        rsi_bb_period: Bollinger Band period for RSI (e.g., 20)
+        rsi_bb_std_dev: Bollinger Band std dev multiplier (e.g., 2.0)
+        use_rsi_bb: If True, use Bollinger Bands instead of fixed thresholds
+        engine: "vectorized" (array kernel), "batch" (lockstep grid kernel) or "loop"
+                (reference); defaults to config ENGINE
+        ind: Precomputed compute_basic() output for these indicator params (grid reuse)
+        metrics_only: Only compute KPIs; equity and events come back as None
+        out: Preallocated float64 equity buffer reused across metrics_only calls
+        state: End-of-run state from a previous return_state run; df then holds only
+               the appended bars and the run resumes bit-identically (fixed thresholds only)
+        return_state: Add a compact end-of-run "state" to the result (vectorized kernel)
+    """
+    engine = engine or get("ENGINE", "vectorized")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown ENGINE '{engine}'. Expected one of {ENGINES}")
+
+    if state is not None or return_state:
+        if use_rsi_bb:
+            raise ValueError("Engine state resume supports fixed RSI thresholds only (use_rsi_bb=False)")
+        params = dict(
+            rsi_period=int(rsi_period),
+            rsi_buy_below=float(rsi_buy_below) if rsi_buy_below is not None else None,
+            rsi_sell_above=float(rsi_sell_above) if rsi_sell_above is not None else None,
+        )
+        return _run_resumable(df, params, state=state, ind=ind, metrics_only=metrics_only)
+
+    # indicators and signals
+    if ind is None:
+        ind = compute_basic(
+            df,
+            rsi_period=int(rsi_period),
+            rsi_bb_period=rsi_bb_period,
+            rsi_bb_std_dev=rsi_bb_std_dev
+        )
+    entry_sig, exit_sig = build_signals(
+        ind,
+        rsi_buy_below=float(rsi_buy_below) if rsi_buy_below is not None else None,
+        rsi_sell_above=float(rsi_sell_above) if rsi_sell_above is not None else None,
+        use_rsi_bb=use_rsi_bb
+    )
+
+    if engine == "loop":
+        res = _run_loop(df, entry_sig, exit_sig)
+        if metrics_only:
+            res = {"equity": None, "metrics": res["metrics"], "events": None}
+        return res
+    return _run_kernel(df, entry_sig, exit_sig, metrics_only=metrics_only, out=out)
+
+def _batchable(group: list[dict]) -> bool:
+    return len(group) > 1 and not any(g.get("use_rsi_bb", False) for g in group)
+
+def run_grid(df: pd.DataFrame, params_list: list[dict], *, engine: str = None,
+             metrics_only: bool = False, indicators: dict[tuple, dict[str, pd.Series]] = None):
+    """
+    Run every param set from rsi_param_grid on one symbol.
+    Indicators are computed once per indicator group (see grid.plan_grid), the RSI of
+    every period in one compute_basic_batch pass, and the threshold/signal stage fans
+    out over the group. With engine "batch", fixed-threshold
+    groups run through simulate_batch in a single pass. metrics_only reuses one
+    equity buffer for the whole grid and skips curves/events.
+    indicators: precomputed compute_basic() outputs keyed by grid.indicator_key,
+                aligned with df (e.g. slices of a full-history computation).
+    Yields (params, result) in plan order.
+    """
+    engine = engine or get("ENGINE", "vectorized")
+    buf = np.empty(len(df), dtype="float64") if metrics_only else None
+    if indicators is None:
+        indicators = compute_basic_batch(df, params_list)
+    for key, group in plan_grid(params_list):
+        first = group[0]
+        ind = indicators.get(key)
+        if ind is None:
+            ind = compute_basic(
+                df,
+                rsi_period=int(first["rsi_period"]),
+                rsi_bb_period=first.get("rsi_bb_period"),
+                rsi_bb_std_dev=first.get("rsi_bb_std_dev")
+            )
+        if engine == "batch" and _batchable(group):
+            yield from zip(group, _run_batch(df, ind, group, metrics_only=metrics_only))
+            continue
+        for params in group:
+            yield params, run_symbol(
+                df,
+                rsi_period=params["rsi_period"],
+                rsi_buy_below=params.get("rsi_buy_below"),
+                rsi_sell_above=params.get("rsi_sell_above"),
+                rsi_bb_period=params.get("rsi_bb_period"),
+                rsi_bb_std_dev=params.get("rsi_bb_std_dev"),
+                use_rsi_bb=params.get("use_rsi_bb", False),
+                engine=engine,
+                ind=ind,
+                metrics_only=metrics_only,
+                out=buf,
+            )
@@ -1,6 +1,10 @@
 # backtester/grid.py
 from itertools import product
-from typing import Dict, List
+from typing import Dict, List, Tuple
+
+# Param keys that change indicator values. Everything else (thresholds, BB toggle)
+# only affects the cheap signal stage.
+INDICATOR_KEYS = ("rsi_period", "rsi_bb_period", "rsi_bb_std_dev")
 
 def rsi_param_grid(cfg: Dict) -> List[Dict]:
     """
@@ -62,3 +66,62 @@ def rsi_param_grid(cfg: Dict) -> List[Dict]:
                 use_rsi_bb=False
             ))
         return out
+
+
+def indicator_key(params: Dict) -> Tuple:
+    """Tuple of the indicator-affecting values of one param set."""
+    return tuple(params.get(k) for k in INDICATOR_KEYS)
+
+def plan_grid(params_list: List[Dict]) -> List[Tuple[Tuple, List[Dict]]]:
+    """
+    Group param sets by indicator_key so each indicator set is computed once.
+    Groups keep first-seen order and params keep their order inside a group,
+    so for grids from rsi_param_grid the flattened output order is unchanged.
+    """
+    groups: Dict[Tuple, List[Dict]] = {}
+    for params in params_list:
+        groups.setdefault(indicator_key(params), []).append(params)
+    return list(groups.items())
+
+# Metrics where a smaller value ranks higher
+LOWER_IS_BETTER = {"maxdd", "vol"}
+
+def rank_score(metrics: Dict, key: str) -> float:
+    """Sort key for one metric: smaller is better; None/NaN sort last."""
+    v = metrics.get(key)
+    if v is None or v != v:
+        return float("inf")
+    return v if key in LOWER_IS_BETTER else -v
+
+def top_combos(records: List[Tuple[str, Dict]], *, top_by, k: int,
+               min_trades: int = 0) -> List[int]:
+    """
+    Pick the best combos per symbol for each TOP_BY metric.
+
+    Args:
+        records: (symbol, metrics) per grid point, in sweep order
+        top_by: Metric name or list of names (e.g. ["total_return", "sharpe"])
+        k: How many to keep per symbol and metric (PRINT_TOP_K)
+        min_trades: Skip combos with fewer trades_total (MIN_TRADES_FOR_TOPS)
+
+    Returns:
+        Sorted positions into records (union across metrics)
+    """
+    keys = [top_by] if isinstance(top_by, str) else list(top_by or [])
+    by_symbol: Dict[str, List[int]] = {}
+    for pos, (sym, m) in enumerate(records):
+        if (m.get("trades_total") or 0) >= min_trades:
+            by_symbol.setdefault(sym, []).append(pos)
+
+    keep = set()
+    for positions in by_symbol.values():
+        for key in keys:
+            scored = []
+            for pos in positions:
+                v = records[pos][1].get(key)
+                if v is None or v != v:  # None / NaN never ranks
+                    continue
+                scored.append((v if key in LOWER_IS_BETTER else -v, pos))
+            scored.sort()
+            keep.update(pos for _, pos in scored[:int(k)])
+    return sorted(keep)
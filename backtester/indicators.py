@@ -1,9 +1,11 @@
 """
 Indicators. RSI uses SMA of gains/losses.
 """
+from collections import deque
 import numpy as np
 import pandas as pd
 from .settings import get
+from .grid import plan_grid
 
 EPS32 = np.finfo(np.float32).eps
 
@@ -27,6 +29,31 @@ def rsi_sma(close: pd.Series, period: int) -> pd.Series:
     sum_g = csg[period:] - csg[:-period]
     sum_l = csl[period:] - csl[:-period]
 
+    out[period:] = _rsi_from_sums(sum_g, sum_l, period)
+    return pd.Series(out, index=close.index, dtype="float32")
+
+def rsi_sma_batch(close: pd.Series, periods: list[int]) -> np.ndarray:
+    """
+    rsi_sma for several periods in one pass: one float64 cumsum of gains/losses serves
+    every window. Returns a float32 (len(periods), len(close)) array whose rows are
+    bit-identical to rsi_sma(close, period).
+    """
+    c = pd.Series(close).astype("float32").to_numpy().ravel()
+    n = c.size
+    out = np.full((len(periods), n), np.nan, dtype=np.float32)
+
+    diff = np.zeros(n, dtype=np.float32)
+    diff[1:] = c[1:] - c[:-1]
+    csg = np.maximum(diff, 0.0).cumsum(dtype=np.float64)
+    csl = np.maximum(-diff, 0.0).cumsum(dtype=np.float64)
+
+    for row, period in enumerate(periods):
+        period = int(period)
+        if n > period:
+            out[row, period:] = _rsi_from_sums(csg[period:] - csg[:-period], csl[period:] - csl[:-period], period)
+    return out
+
+def _rsi_from_sums(sum_g: np.ndarray, sum_l: np.ndarray, period: int) -> np.ndarray:
     avg_g = sum_g / period
     avg_l = sum_l / period
 
@@ -41,9 +68,105 @@ def rsi_sma(close: pd.Series, period: int) -> pd.Series:
     rsi[onlyl] = 0.0
     rs = avg_g[other] / np.maximum(avg_l[other], EPS32)
     rsi[other] = 100.0 - 100.0 / (1.0 + rs)
+    return rsi
 
-    out[period:] = rsi
-    return pd.Series(out, index=close.index, dtype="float32")
+#========================= Incremental RSI =========================
+def rsi_sma_state(close: pd.Series, period: int) -> dict:
+    """
+    End-of-series state for rsi_sma: bar count, last close and the trailing
+    `period` running gain/loss sums. Feed it to rsi_sma_resume when bars are appended.
+    """
+    c = pd.Series(close).astype("float32").to_numpy().ravel()
+    diff = np.zeros(c.size, dtype=np.float32)
+    diff[1:] = c[1:] - c[:-1]
+    csg = np.maximum(diff, 0.0).cumsum(dtype=np.float64)
+    csl = np.maximum(-diff, 0.0).cumsum(dtype=np.float64)
+    return {
+        "bars": int(c.size),
+        "last_close": float(c[-1]) if c.size else None,
+        "gain_sums": csg[-period:].copy(),
+        "loss_sums": csl[-period:].copy(),
+    }
+
+def rsi_sma_resume(close: pd.Series, period: int, state: dict) -> tuple[pd.Series, dict]:
+    """
+    rsi_sma over bars appended after `state` (from rsi_sma_state or a previous resume).
+    The running sums continue the original float64 cumsum, so values are bit-identical
+    to rsi_sma over the full history. Returns (rsi for the new bars, new state).
+    """
+    c = pd.Series(close).astype("float32").to_numpy().ravel()
+    n_prev, m = int(state["bars"]), c.size
+    out = np.full(m, np.nan, dtype=np.float32)
+    if m == 0:
+        return pd.Series(out, index=close.index, dtype="float32"), state
+
+    diff = np.empty(m, dtype=np.float32)
+    if n_prev:
+        diff[0] = c[0] - np.float32(state["last_close"])
+    else:
+        diff[0] = 0.0
+    diff[1:] = c[1:] - c[:-1]
+
+    tail_g = np.asarray(state["gain_sums"], dtype=np.float64)
+    tail_l = np.asarray(state["loss_sums"], dtype=np.float64)
+    # seed the cumsum with the last running sum: same addition order as a full pass
+    seed_g = tail_g[-1:] if tail_g.size else np.zeros(0)
+    seed_l = tail_l[-1:] if tail_l.size else np.zeros(0)
+    csg = np.concatenate((seed_g, np.maximum(diff, 0.0))).cumsum(dtype=np.float64)[seed_g.size:]
+    csl = np.concatenate((seed_l, np.maximum(-diff, 0.0))).cumsum(dtype=np.float64)[seed_l.size:]
+    full_g = np.concatenate((tail_g, csg))
+    full_l = np.concatenate((tail_l, csl))
+
+    t = np.arange(n_prev, n_prev + m)
+    valid = t >= period
+    pos = t[valid] - (n_prev - tail_g.size)
+    sum_g = full_g[pos] - full_g[pos - period]
+    sum_l = full_l[pos] - full_l[pos - period]
+    out[valid] = _rsi_from_sums(sum_g, sum_l, period)
+
+    new_state = {
+        "bars": n_prev + m,
+        "last_close": float(c[-1]),
+        "gain_sums": full_g[-period:].copy(),
+        "loss_sums": full_l[-period:].copy(),
+    }
+    return pd.Series(out, index=close.index, dtype="float32"), new_state
+
+class OnlineRsiSma:
+    """
+    rsi_sma one bar at a time, O(1) per bar. Keeps the trailing `period` running
+    gain/loss sums of the float64 cumsum, so every value is bit-identical to rsi_sma
+    over the full history. Warm-start from rsi_sma_state (or a resume state).
+    """
+    def __init__(self, period: int, state: dict = None):
+        self.period = int(period)
+        state = state or {"bars": 0, "last_close": None, "gain_sums": [], "loss_sums": []}
+        self.bars = int(state["bars"])
+        self.last_close = state["last_close"]
+        self.gain_sums = deque(np.asarray(state["gain_sums"], dtype=np.float64).tolist(), maxlen=self.period)
+        self.loss_sums = deque(np.asarray(state["loss_sums"], dtype=np.float64).tolist(), maxlen=self.period)
+
+    def update(self, close: float) -> np.float32:
+        c = np.float32(close)
+        diff = c - np.float32(self.last_close) if self.bars else np.float32(0.0)
+        gain = float(np.maximum(diff, np.float32(0.0)))
+        loss = float(np.maximum(-diff, np.float32(0.0)))
+        csg = (self.gain_sums[-1] if self.gain_sums else 0.0) + gain
+        csl = (self.loss_sums[-1] if self.loss_sums else 0.0) + loss
+        out = np.float32(np.nan)
+        if self.bars >= self.period:
+            sums = (np.array([csg - self.gain_sums[0]]), np.array([csl - self.loss_sums[0]]))
+            out = _rsi_from_sums(*sums, self.period)[0]
+        self.gain_sums.append(csg)
+        self.loss_sums.append(csl)
+        self.bars += 1
+        self.last_close = float(c)
+        return out
+
+    def state(self) -> dict:
+        """Same layout as rsi_sma_state."""
+        return {"bars": self.bars, "last_close": self.last_close,
+                "gain_sums": np.array(self.gain_sums), "loss_sums": np.array(self.loss_sums)}
 
 def rsi_bollinger_bands(rsi: pd.Series, period: int, std_dev: float = 2.0) -> tuple[pd.Series, pd.Series, pd.Series]:
     """
@@ -91,3 +214,26 @@ def compute_basic(df: pd.DataFrame, *,
             out["RSI_BB_UPPER"] = upper
             out["RSI_BB_LOWER"] = lower
     return out
+
+def compute_basic_batch(df: pd.DataFrame, params_list: list[dict]) -> dict[tuple, dict[str, pd.Series]]:
+    """
+    compute_basic for every indicator group of a grid (grid.plan_grid), with the RSI
+    of all distinct periods from one rsi_sma_batch pass.
+    Returns {indicator_key: compute_basic output}, the layout run_grid(indicators=...) takes.
+    """
+    groups = plan_grid(params_list)
+    periods = sorted({int(group[0]["rsi_period"]) for _, group in groups})
+    rsi = rsi_sma_batch(df["Close"], periods) if get("RSI_ENABLED") else None
+
+    out = {}
+    for key, group in groups:
+        first = group[0]
+        ind: dict[str, pd.Series] = {}
+        if rsi is not None:
+            ind["RSI"] = pd.Series(rsi[periods.index(int(first["rsi_period"]))], index=df.index, dtype="float32")
+            if first.get("rsi_bb_period") is not None:
+                bb_std = float(first["rsi_bb_std_dev"]) if first.get("rsi_bb_std_dev") is not None else 2.0
+                middle, upper, lower = rsi_bollinger_bands(ind["RSI"], int(first["rsi_bb_period"]), bb_std)
+                ind.update(RSI_BB_MIDDLE=middle, RSI_BB_UPPER=upper, RSI_BB_LOWER=lower)
+        out[key] = ind
+    return out
@@ -11,12 +11,14 @@ def _downside_std(excess: pd.Series) -> float:
     neg[neg > 0] = 0.0
     return float(neg.std(ddof=1))
 
-def max_drawdown(equity: pd.Series) -> float:
-    eq = equity.astype("float64").to_numpy()
+def _max_drawdown_arr(eq: np.ndarray) -> float:
     run_max = np.maximum.accumulate(eq)
     dd = 1.0 - (eq / np.maximum(run_max, 1e-12))
     return float(dd.max(initial=0.0))
 
+def max_drawdown(equity: pd.Series) -> float:
+    return _max_drawdown_arr(equity.astype("float64").to_numpy())
+
 def kpis_from_equity(equity: pd.Series) -> dict:
     init_cap = float(get("INITIAL_CAPITAL", 100_000.0))
     per_year = float(get("PERIODS_PER_YEAR", 252))
@@ -48,6 +50,45 @@ def kpis_from_equity(equity: pd.Series) -> dict:
     return dict(end_cap=end_cap, total_return=total_return, cagr=cagr,
                 sharpe=sharpe, sortino=sortino, vol=vol, maxdd=mdd, bars=len(eq))
 
+def kpis_from_array(eq: np.ndarray) -> dict:
+    """
+    kpis_from_equity on a raw float64 equity buffer (metrics-only grid sweeps).
+    Same definitions; no pandas objects are built.
+    """
+    init_cap = float(get("INITIAL_CAPITAL", 100_000.0))
+    per_year = float(get("PERIODS_PER_YEAR", 252))
+    rf_annual = float(get("RF_ANNUAL", 0.0))
+    rf_daily = rf_annual / per_year if per_year > 0 else 0.0
+
+    end_cap = float(eq[-1])
+    total_return = end_cap / init_cap - 1.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = eq[1:] / eq[:-1] - 1.0
+    rets = rets[~np.isnan(rets)]
+
+    if rets.size == 0:
+        return dict(end_cap=end_cap, total_return=total_return,
+                    cagr=np.nan, sharpe=np.nan, sortino=np.nan,
+                    vol=np.nan, maxdd=np.nan, bars=len(eq))
+
+    years = rets.size / per_year if per_year > 0 else np.nan
+    cagr = (end_cap / init_cap) ** (1.0 / years) - 1.0 if years and years > 0 else np.nan
+
+    excess = rets - rf_daily
+    mu = float(excess.mean())
+    if rets.size > 1:
+        sd = float(excess.std(ddof=1))
+        dsd = float(np.minimum(excess, 0.0).std(ddof=1))
+        vol = float(rets.std(ddof=1)) * np.sqrt(per_year)
+    else:
+        sd = dsd = vol = np.nan
+    sharpe = (mu / sd) * np.sqrt(per_year) if sd > 0 else np.nan
+    sortino = (mu / dsd) * np.sqrt(per_year) if dsd > 0 else np.nan
+    mdd = _max_drawdown_arr(eq)
+
+    return dict(end_cap=end_cap, total_return=total_return, cagr=cagr,
+                sharpe=sharpe, sortino=sortino, vol=vol, maxdd=mdd, bars=len(eq))
+
 # ---------- series providers (computed once) ----------
 _bench_eq_full: pd.Series | None = None
 
@@ -77,11 +118,16 @@ def get_buyhold_equity(close: pd.Series) -> pd.Series | None:
 _bench_cache: dict[tuple[int,int,int], dict] = {}
 _bh_cache: dict[tuple[int,int,int], dict] = {}
 
-def summarize_comparisons(strat_eq: pd.Series,
+def summarize_comparisons(strat_eq: pd.Series | None,
                           bench_eq_full: pd.Series | None,
-                          bh_eq_full: pd.Series | None) -> dict:
-    """Align benchmark/buy-hold to strategy window and return KPI summaries once per window."""
-    if len(strat_eq) == 0:
+                          bh_eq_full: pd.Series | None,
+                          index: pd.Index | None = None) -> dict:
+    """
+    Align benchmark/buy-hold to strategy window and return KPI summaries once per window.
+    Pass index= instead of strat_eq when the curve was not built (metrics-only runs).
+    """
+    window = strat_eq.index if strat_eq is not None else index
+    if window is None or len(window) == 0:
         return dict(
             bars_aligned=0,
             bench_end_cap=None, bench_total_return=None, bench_cagr=None,
@@ -90,13 +136,13 @@ def summarize_comparisons(strat_eq: pd.Series,
             buyhold_sharpe=None, buyhold_sortino=None, buyhold_maxdd=None,
         )
 
-    key = (strat_eq.index[0].value, strat_eq.index[-1].value, len(strat_eq))
-    out = dict(bars_aligned=len(strat_eq))
+    key = (window[0].value, window[-1].value, len(window))
+    out = dict(bars_aligned=len(window))
 
     # Benchmark
     if bench_eq_full is not None:
         if key not in _bench_cache:
-            bm = bench_eq_full.reindex(strat_eq.index).ffill()
+            bm = bench_eq_full.reindex(window).ffill()
             _bench_cache[key] = kpis_from_equity(bm)
         b = _bench_cache[key]
         out.update(
@@ -112,7 +158,7 @@ def summarize_comparisons(strat_eq: pd.Series,
     # Buy-and-hold
     if bh_eq_full is not None:
         if key not in _bh_cache:
-            bh = bh_eq_full.reindex(strat_eq.index).ffill()
+            bh = bh_eq_full.reindex(window).ffill()
             _bh_cache[key] = kpis_from_equity(bh)
         h = _bh_cache[key]
         out.update(
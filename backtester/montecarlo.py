@@ -0,0 +1,112 @@
+# backtester/montecarlo.py
+"""
+Monte Carlo trade resampling.
+Round-trip PnLs (run_symbol's round_trip_pnls, or the pnl of portfolio sell
+trades) are bootstrapped with replacement into synthetic equity paths.
+Paths are simulated as a (paths x trades) matrix in fixed-size chunks; every
+chunk draws from its own SeedSequence child stream, so results depend only on
+MC_SEED and MC_CHUNK_PATHS, never on how chunks are spread across threads.
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .settings import get
+
+#========================= Inputs =========================
+def pnls_from_trades(trades: list[dict]) -> list[float]:
+    """Net PnL of each closed portfolio trade (sell rows carry a pnl field)."""
+    return [float(t["pnl"]) for t in trades if t.get("side") == "sell" and t.get("pnl") is not None]
+
+#========================= Simulation =========================
+def _simulate_chunk(pnls: np.ndarray, n_paths: int, init_cap: float, years: float,
+                    seed: np.random.SeedSequence) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    n_trades = pnls.size
+    draws = pnls[rng.integers(0, n_trades, size=(n_paths, n_trades))]
+
+    equity = np.empty((n_paths, n_trades + 1), dtype="float64")
+    equity[:, 0] = init_cap
+    np.cumsum(draws, axis=1, out=equity[:, 1:])
+    equity[:, 1:] += init_cap
+    # a path that loses all capital stays ruined
+    ruined = np.minimum.accumulate(equity, axis=1) <= 0
+    equity[ruined] = 0.0
+
+    end = equity[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = np.where(end > 0, (end / init_cap) ** (1.0 / years) - 1.0, -1.0) if years > 0 \
+            else np.full(n_paths, np.nan)
+
+        run_max = np.maximum.accumulate(equity, axis=1)
+        maxdd = (1.0 - equity / np.maximum(run_max, 1e-12)).max(axis=1)
+
+        # per-trade returns on the equity before each trade, annualized by trade frequency
+        before = equity[:, :-1]
+        rets = np.where(before > 0, (equity[:, 1:] - before) / before, 0.0)
+        mu = rets.mean(axis=1)
+        sd = rets.std(axis=1, ddof=1) if n_trades > 1 else np.full(n_paths, np.nan)
+        per_year = n_trades / years if years > 0 else np.nan
+        sharpe = np.where(sd > 0, mu / sd * np.sqrt(per_year), np.nan)
+    return cagr, maxdd, sharpe
+
+def _summary(values: np.ndarray) -> dict:
+    v = values[~np.isnan(values)]
+    if v.size == 0:
+        return {"mean": None, "p5": None, "p25": None, "p50": None, "p75": None, "p95": None}
+    p5, p25, p50, p75, p95 = np.percentile(v, [5, 25, 50, 75, 95])
+    return {"mean": float(v.mean()), "p5": float(p5), "p25": float(p25), "p50": float(p50),
+            "p75": float(p75), "p95": float(p95)}
+
+def monte_carlo(pnls, *, years: float, n_paths: int = None, init_cap: float = None,
+                seed: int = None, chunk_paths: int = None, workers: int = 1) -> dict:
+    """
+    Bootstrap round-trip PnLs into synthetic equity paths.
+
+    Args:
+        pnls: Net PnL per closed round trip, in trade order
+        years: Calendar span the trades came from (sets CAGR and the Sharpe annualization)
+        n_paths: Number of synthetic paths (MC_PATHS)
+        init_cap: Starting equity (INITIAL_CAPITAL)
+        seed: Root seed (MC_SEED)
+        chunk_paths: Paths per chunk/RNG stream (MC_CHUNK_PATHS); bounds peak memory
+        workers: Threads running chunks; results do not depend on it
+
+    Returns:
+        Dict with per-path arrays cagr, maxdd, sharpe, their summaries
+        (mean and 5/25/50/75/95th percentiles), prob_loss, n_paths, n_trades
+    """
+    pnls = np.asarray(pnls, dtype="float64")
+    n_paths = int(n_paths or get("MC_PATHS", 10_000))
+    init_cap = float(init_cap or get("INITIAL_CAPITAL", 100_000.0))
+    seed = get("MC_SEED", 0) if seed is None else seed
+    chunk_paths = max(1, int(chunk_paths or get("MC_CHUNK_PATHS", 2048)))
+    if pnls.size == 0:
+        raise ValueError("Monte Carlo needs at least one closed trade")
+
+    sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(pnls, size, init_cap, float(years), ss) for size, ss in zip(sizes, streams)]
+    if workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:  # numpy releases the GIL
+            parts = list(pool.map(lambda job: _simulate_chunk(*job), jobs))
+    else:
+        parts = [_simulate_chunk(*job) for job in jobs]
+
+    cagr, maxdd, sharpe = (np.concatenate(col) for col in zip(*parts))
+    return {
+        "cagr": cagr, "maxdd": maxdd, "sharpe": sharpe,
+        "summary": {"cagr": _summary(cagr), "maxdd": _summary(maxdd), "sharpe": _summary(sharpe)},
+        "prob_loss": float((cagr < 0).mean()),
+        "n_paths": n_paths,
+        "n_trades": int(pnls.size),
+    }
+
+def mc_metrics(mc: dict) -> dict:
+    """Flat mc_* KPIs for CSV/DB rows."""
+    s = mc["summary"]
+    return {
+        "mc_cagr_p5": s["cagr"]["p5"], "mc_cagr_p50": s["cagr"]["p50"], "mc_cagr_p95": s["cagr"]["p95"],
+        "mc_maxdd_p50": s["maxdd"]["p50"], "mc_maxdd_p95": s["maxdd"]["p95"],
+        "mc_sharpe_p5": s["sharpe"]["p5"], "mc_sharpe_p50": s["sharpe"]["p50"],
+        "mc_prob_loss": mc["prob_loss"],
+    }
@@ -0,0 +1,215 @@
+# backtester/parallel.py
+"""
+Process-pool grid execution.
+Each symbol's OHLCV columns are copied into shared memory once; workers attach
+by name, rebuild a zero-copy DataFrame and run grid chunks with engine.run_grid.
+Results stream back to the parent in submission order (symbol, then plan order),
+so CSV/DB output is deterministic regardless of which worker finishes first.
+"""
+from __future__ import annotations
+import itertools, math, os
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from .settings import get, CONFIG
+from .engine import run_grid, run_symbol, _index_from_state
+from .grid import plan_grid, top_combos
+
+#========================= Worker count =========================
+def grid_workers() -> int:
+    """GRID_WORKERS from config; None/0 = one per core."""
+    w = get("GRID_WORKERS", None)
+    if not w:
+        return os.cpu_count() or 1
+    return max(1, int(w))
+
+#========================= Shared memory =========================
+def _share_frame(df: pd.DataFrame, handles: list) -> dict:
+    """Copy every column and the index into shared memory. Returns a picklable spec."""
+    def _put(arr: np.ndarray) -> tuple:
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+        handles.append(shm)
+        return (shm.name, arr.shape, arr.dtype.str)
+
+    idx = df.index
+    spec = {
+        "columns": {c: _put(df[c].to_numpy()) for c in df.columns},
+        "index": None,
+        "index_name": idx.name,
+    }
+    if isinstance(idx, pd.DatetimeIndex):
+        spec["index"] = _put(idx.asi8)
+        spec["index_unit"] = idx.unit
+        spec["index_tz"] = str(idx.tz) if idx.tz is not None else None
+    else:
+        spec["index"] = _put(idx.to_numpy())
+    return spec
+
+_SWEEPS = itertools.count()
+
+@contextmanager
+def shared_frames(frames: dict[str, pd.DataFrame]):
+    """
+    Share every frame for the duration of one sweep; yields {key: spec}. The parent
+    closes and unlinks the segments on exit, and workers drop the previous sweep's
+    segments as soon as they see a new one (a pool can serve many sweeps).
+    """
+    handles: list[shared_memory.SharedMemory] = []
+    sweep = f"{os.getpid()}:{next(_SWEEPS)}"
+    try:
+        specs = {key: _share_frame(df, handles) for key, df in frames.items()}
+        for spec in specs.values():
+            spec["sweep"] = sweep
+        yield specs
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+# worker-side: keep the current sweep's segments attached between tasks
+_ATTACHED: dict[str, shared_memory.SharedMemory] = {}
+_FRAMES: dict[str, pd.DataFrame] = {}  # keyed by index segment name
+_SWEEP = None
+
+def _release_segments() -> None:
+    _FRAMES.clear()
+    for shm in _ATTACHED.values():
+        try:
+            shm.close()
+        except BufferError:
+            pass  # a result still views the buffer; the mapping goes with that view
+    _ATTACHED.clear()
+
+def _attach(entry: tuple) -> np.ndarray:
+    name, shape, dtype = entry
+    shm = _ATTACHED.get(name)
+    if shm is None:
+        # workers share the parent's resource tracker, so the parent's unlink() covers cleanup
+        shm = shared_memory.SharedMemory(name=name)
+        _ATTACHED[name] = shm
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+def _frame_from_spec(spec: dict) -> pd.DataFrame:
+    global _SWEEP
+    if spec.get("sweep") != _SWEEP:
+        _release_segments()  # the parent has unlinked them: keep nothing mapped past its sweep
+        _SWEEP = spec.get("sweep")
+    key = spec["index"][0]
+    df = _FRAMES.get(key)
+    if df is not None:
+        return df
+    raw_idx = _attach(spec["index"])
+    if "index_unit" in spec:
+        idx = pd.DatetimeIndex(raw_idx.view(f"M8[{spec['index_unit']}]"))
+        if spec["index_tz"] is not None:
+            idx = idx.tz_localize("UTC").tz_convert(spec["index_tz"])
+    else:
+        idx = pd.Index(raw_idx)
+    idx.name = spec["index_name"]
+    cols = {c: _attach(e) for c, e in spec["columns"].items()}
+    df = pd.DataFrame(cols, index=idx, copy=False)
+    _FRAMES[key] = df
+    return df
+
+#========================= Worker =========================
+def _init_worker(config_snapshot: dict) -> None:
+    # run_backtest.py mutates CONFIG at runtime; make workers see the same values
+    CONFIG.clear()
+    CONFIG.update(config_snapshot)
+
+def grid_pool(workers: int) -> ProcessPoolExecutor:
+    """Worker pool seeded with the current CONFIG; pass it to iter_grid(pool=) to reuse it across sweeps."""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dict(CONFIG),))
+
+def _run_chunk(spec: dict, params_chunk: list[dict], engine: str | None,
+               metrics_only: bool) -> list:
+    df = _frame_from_spec(spec)
+    return list(run_grid(df, params_chunk, engine=engine, metrics_only=metrics_only))
+
+def _chunks(params_list: list[dict], workers: int, n_symbols: int) -> list[list[dict]]:
+    """Split a grid (in plan order) into roughly 4 chunks per worker across all symbols."""
+    ordered = [p for _, group in plan_grid(params_list) for p in group]
+    size = get("GRID_CHUNK_SIZE", None)
+    if not size:
+        per_symbol = max(1, math.ceil(4 * workers / max(1, n_symbols)))
+        size = math.ceil(len(ordered) / per_symbol)
+    size = max(1, int(size))
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+#========================= Driver =========================
+def iter_grid(dfs: dict[str, pd.DataFrame], symbols: list[str], params_list: list[dict], *,
+              workers: int = None, engine: str = None, metrics_only: bool = False,
+              pool: ProcessPoolExecutor = None):
+    """
+    Run params_list for every symbol. Yields (symbol, params, result) in
+    deterministic order: symbols as given, params in plan order.
+    workers <= 1 runs serially in-process; pool reuses a running grid_pool
+    (workers then only sizes the chunks) instead of starting one per call.
+    """
+    workers = grid_workers() if workers is None else max(1, int(workers))
+    if workers <= 1 and pool is None:
+        for sym in symbols:
+            for params, res in run_grid(dfs[sym], params_list, engine=engine,
+                                        metrics_only=metrics_only):
+                yield sym, params, res
+        return
+
+    chunks = _chunks(params_list, workers, len(symbols))
+    with shared_frames({sym: dfs[sym] for sym in symbols}) as specs, \
+            nullcontext(pool) if pool is not None else grid_pool(workers) as executor:
+        futures = [
+            (sym, executor.submit(_run_chunk, specs[sym], chunk, engine, metrics_only))
+            for sym in symbols for chunk in chunks
+        ]
+        for sym, fut in futures:
+            for params, res in fut.result():
+                yield sym, params, res
+
+def iter_grid_top(dfs: dict[str, pd.DataFrame], symbols: list[str], params_list: list[dict], *,
+                  workers: int = None, engine: str = None):
+    """
+    Metrics-only sweep, then a full re-run of the top combos only.
+    The sweep keeps KPIs (no curves/events); combos picked by grid.top_combos
+    (TOP_BY / PRINT_TOP_K / MIN_TRADES_FOR_TOPS) are re-run in full mode so their
+    curves and trades can be persisted. Yields (symbol, params, result) in the
+    same order as iter_grid; non-top results have equity/events set to None.
+    """
+    sweep = list(iter_grid(dfs, symbols, params_list, workers=workers, engine=engine,
+                           metrics_only=True))
+    keep = top_combos(
+        [(sym, res["metrics"]) for sym, _, res in sweep],
+        top_by=get("TOP_BY", ["total_return"]),
+        k=int(get("PRINT_TOP_K", 3)),
+        min_trades=int(get("MIN_TRADES_FOR_TOPS", 0)),
+    )
+    full: dict[int, dict] = {}
+    for sym in symbols:
+        by_id = {id(sweep[pos][1]): pos for pos in keep if sweep[pos][0] == sym}
+        rerun = [sweep[pos][1] for pos in by_id.values()]
+        for params, res in run_grid(dfs[sym], rerun, engine=engine):
+            full[by_id[id(params)]] = res
+    for pos, (sym, params, res) in enumerate(sweep):
+        yield sym, params, full.get(pos, res)
+
+def iter_resume(dfs: dict[str, pd.DataFrame], symbols: list[str], params_list: list[dict], *,
+                load_state=None, save_state=None, engine: str = None):
+    """
+    Per-(symbol, params) runs that carry engine state across runs (nightly updates).
+    load_state(symbol, params) returns a saved state or None; with a state only the
+    bars after its last date are simulated and equity/metrics/events match a full
+    rerun. save_state(symbol, params, state) stores
+    each end-of-run state. Fixed RSI thresholds only. Yields like iter_grid.
+    """
+    for sym in symbols:
+        df = dfs[sym]
+        for params in params_list:
+            state = load_state(sym, params) if load_state is not None else None
+            bars = df if state is None else df[df.index > _index_from_state(state)[-1]]
+            res = run_symbol(bars, engine=engine, state=state, return_state=save_state is not None, **params)
+            if save_state is not None:
+                save_state(sym, params, res.pop("state"))
+            yield sym, params, res
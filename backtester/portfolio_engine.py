@@ -1,10 +1,14 @@
 # filepath: c:\Users\mabso\MyBot\backtester\portfolio_engine.py
 import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 
 from .settings import get
 from .metrics import kpis_from_equity
+from .engine import STATE_VERSION, _index_state, _index_from_state
 
 # ---- Robust RSI resolver (handles absence of rsi in indicators) ----
 _rsi_alias = None
@@ -18,14 +22,16 @@ except Exception:
         _rsi_alias = None
 
 def _fallback_rsi(series: pd.Series, period: int) -> pd.Series:
+    return _wilder_rsi_raw(series, period).bfill()
+
+def _wilder_rsi_raw(series: pd.Series, period: int) -> pd.Series:
     delta = series.diff()
     gain = delta.clip(lower=0)
     loss = -delta.clip(upper=0)
     avg_gain = gain.ewm(alpha=1/period, adjust=False, min_periods=period).mean()
     avg_loss = loss.ewm(alpha=1/period, adjust=False, min_periods=period).mean()
     rs = avg_gain / avg_loss.replace(0, np.nan)
-    r = 100 - (100 / (1 + rs))
-    return r.bfill()
+    return 100 - (100 / (1 + rs))
 
 def _rsi(series: pd.Series, period: int) -> pd.Series:
     if _rsi_alias is not None:
@@ -36,39 +42,109 @@ def _rsi(series: pd.Series, period: int) -> pd.Series:
     return _fallback_rsi(series, period)
 # -------------------------------------------------------------------
 
+# ---- Incremental Wilder RSI (engine state resume) ----
+def _ewm_continue(vals: np.ndarray, period: int, st: dict) -> tuple[np.ndarray, dict]:
+    """
+    pandas ewm(alpha=1/period, adjust=False, min_periods=period).mean() continued
+    from st = {weighted, old_wt, nobs}; same recurrence and arithmetic as pandas,
+    so outputs are bit-identical to a single pass over the full history.
+    """
+    alpha = 1. / (1. + (1 - 1 / period) / (1 / period))  # pandas goes through center of mass
+    old_wt_factor = 1. - alpha
+    weighted, old_wt, nobs = st["weighted"], st["old_wt"], st["nobs"]
+    out = np.empty(len(vals), dtype="float64")
+    for i, cur in enumerate(vals):
+        is_observation = cur == cur
+        nobs += is_observation
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != cur:
+                    weighted = old_wt * weighted + alpha * cur
+                    weighted /= (old_wt + alpha)
+                old_wt = 1.
+        elif is_observation:
+            weighted = cur
+        out[i] = weighted if nobs >= period else np.nan
+    return out, {"weighted": float(weighted), "old_wt": float(old_wt), "nobs": int(nobs)}
+
+def _rsi_state(close: pd.Series, period: int, raw: pd.Series) -> dict:
+    """End-of-series Wilder RSI state: ewm internals, last close, trailing NaN count."""
+    delta = close.diff()
+    fresh = {"weighted": np.nan, "old_wt": 1., "nobs": 0}
+    _, gain_st = _ewm_continue(delta.clip(lower=0).to_numpy(), period, fresh)
+    _, loss_st = _ewm_continue((-delta.clip(upper=0)).to_numpy(), period, fresh)
+    vals = raw.to_numpy()
+    valid = np.flatnonzero(~np.isnan(vals))
+    pending = len(vals) - (int(valid[-1]) + 1 if valid.size else 0)
+    return {"period": int(period), "last_close": float(close.iloc[-1]),
+            "gain": gain_st, "loss": loss_st, "pending": pending}
+
+def _rsi_resume(close: pd.Series, st: dict) -> tuple[pd.Series, pd.Series, dict]:
+    """Wilder RSI for appended bars. Returns (rsi, raw rsi, new state)."""
+    if st["pending"]:
+        # trailing NaNs of the saved run would be back-filled from the new bars
+        raise ValueError("RSI was undefined at the end of the saved run; rerun in full")
+    period = st["period"]
+    delta = pd.concat([pd.Series([st["last_close"]]), pd.Series(close.to_numpy())],
+                      ignore_index=True).diff().iloc[1:]
+    avg_gain, gain_st = _ewm_continue(delta.clip(lower=0).to_numpy(), period, st["gain"])
+    avg_loss, loss_st = _ewm_continue((-delta.clip(upper=0)).to_numpy(), period, st["loss"])
+    avg_loss = pd.Series(avg_loss, index=close.index)
+    rs = pd.Series(avg_gain, index=close.index) / avg_loss.replace(0, np.nan)
+    raw = 100 - (100 / (1 + rs))
+    vals = raw.to_numpy()
+    valid = np.flatnonzero(~np.isnan(vals))
+    pending = len(vals) - (int(valid[-1]) + 1 if valid.size else 0)
+    new_st = {"period": period, "last_close": float(close.iloc[-1]) if len(close) else st["last_close"],
+              "gain": gain_st, "loss": loss_st, "pending": pending}
+    return raw.bfill(), raw, new_st
+# -------------------------------------------------------------------
+
+def comparison_kpis(equity, prefix: str) -> dict:
+    """{prefix}_total_return ... {prefix}_maxdd for a buy & hold / benchmark curve."""
+    if equity is None or len(equity) == 0:
+        return {}
+    m = kpis_from_equity(equity)
+    return {f"{prefix}_{k}": m.get(k) for k in ("total_return", "cagr", "sharpe", "sortino", "vol", "maxdd")}
+
 class PortfolioResult:
-    def __init__(self, equity, per_ticker_equity, trades, buyhold_equity, benchmark_equity, per_ticker_positions):
+    """
+    tickers, positions and ticker_equity hold the per-ticker history as two
+    dates x tickers matrices (columns in tickers order); per_ticker_equity and
+    per_ticker_positions build {ticker: ...} views of them on access.
+    """
+    def __init__(self, equity, trades, buyhold_equity, benchmark_equity, tickers=(), positions=None,
+                 ticker_equity=None):
         self.equity = equity
-        self.per_ticker_equity = per_ticker_equity
         self.trades = trades
         self.buyhold_equity = buyhold_equity
         self.benchmark_equity = benchmark_equity
-        self.per_ticker_positions = per_ticker_positions
+        self.tickers = list(tickers)
+        self.positions = positions
+        self.ticker_equity = ticker_equity
         self.metrics = kpis_from_equity(equity)
         
-        # Add buy & hold metrics
-        if buyhold_equity is not None and len(buyhold_equity) > 0:
-            bh_metrics = kpis_from_equity(buyhold_equity)
-            self.metrics['buyhold_total_return'] = bh_metrics.get('total_return')
-            self.metrics['buyhold_cagr'] = bh_metrics.get('cagr')
-            self.metrics['buyhold_sharpe'] = bh_metrics.get('sharpe')
-            self.metrics['buyhold_sortino'] = bh_metrics.get('sortino')
-            self.metrics['buyhold_vol'] = bh_metrics.get('vol')
-            self.metrics['buyhold_maxdd'] = bh_metrics.get('maxdd')
-        
-        # Add benchmark metrics
-        if benchmark_equity is not None and len(benchmark_equity) > 0:
-            bench_metrics = kpis_from_equity(benchmark_equity)
-            self.metrics['bench_total_return'] = bench_metrics.get('total_return')
-            self.metrics['bench_cagr'] = bench_metrics.get('cagr')
-            self.metrics['bench_sharpe'] = bench_metrics.get('sharpe')
-            self.metrics['bench_sortino'] = bench_metrics.get('sortino')
-            self.metrics['bench_vol'] = bench_metrics.get('vol')
-            self.metrics['bench_maxdd'] = bench_metrics.get('maxdd')
+        # Add buy & hold and benchmark metrics
+        self.metrics.update(comparison_kpis(buyhold_equity, "buyhold"))
+        self.metrics.update(comparison_kpis(benchmark_equity, "bench"))
         
         # Add trade-specific metrics
         self._add_trade_metrics()
     
+    @property
+    def per_ticker_equity(self) -> dict[str, pd.Series]:
+        if self.ticker_equity is None:
+            return {}
+        return {t: pd.Series(self.ticker_equity[:, j], index=self.equity.index, name=f"{t}_equity")
+                for j, t in enumerate(self.tickers)}
+    
+    @property
+    def per_ticker_positions(self) -> dict[str, np.ndarray]:
+        if self.positions is None:
+            return {}
+        return {t: self.positions[:, j] for j, t in enumerate(self.tickers)}
+    
     def _add_trade_metrics(self):
         """Calculate trade-specific metrics from trades list."""
         if not self.trades:
@@ -119,7 +195,681 @@ def _load_price_series(symbol, data_adapter, start, end):
     return df[['close']].copy()
 
 
-def simulate_portfolio(data_adapter):
+#========================= Settings =========================
+REBALANCE_MODES = ("none", "monthly", "quarterly", "drift")
+
+def _portfolio_settings(strategies: dict = None, tickers: list[str] = None,
+                        config_weights: bool = True) -> dict:
+    """
+    Validated portfolio config: tickers, strategies, normalized weights, costs.
+    strategies: per-ticker RSI settings (default PORTFOLIO_STRATEGIES).
+    tickers: symbols to trade (default TICKERS).
+    config_weights: False = equal weights, ignoring PORTFOLIO_WEIGHTS.
+    """
+    tickers = list(get("TICKERS", []) if tickers is None else tickers)
+    strategies = get("PORTFOLIO_STRATEGIES", {}) if strategies is None else strategies
+    weights_cfg = get("PORTFOLIO_WEIGHTS", None) if config_weights else None
+
+    if not tickers:
+        raise ValueError("No TICKERS configured for portfolio mode.")
+    if not strategies:
+        raise ValueError("PORTFOLIO_STRATEGIES empty.")
+
+    # Weights
+    if weights_cfg:
+        # Keep only weights for active tickers; warn on extras
+        extra = [k for k in weights_cfg.keys() if k not in tickers]
+        if extra:
+            print(f"[Portfolio] Ignoring weights for non-listed symbols: {extra}")
+        weights = {k: float(v) for k, v in weights_cfg.items() if k in tickers}
+        if not weights:
+            raise ValueError("After filtering, no valid weights remained.")
+        total_w = sum(weights.values())
+        if not np.isclose(total_w, 1.0):
+            weights = {k: v / total_w for k, v in weights.items()}
+    else:
+        eq_w = 1.0 / len(tickers)
+        weights = {t: eq_w for t in tickers}
+
+    rebalance = str(get("PORTFOLIO_REBALANCE", None) or "none").lower()
+    if rebalance not in REBALANCE_MODES:
+        raise ValueError(f"PORTFOLIO_REBALANCE must be one of {REBALANCE_MODES}, got {rebalance!r}")
+
+    return {
+        "tickers": tickers, "weights": weights,
+        "utilization": float(get("PORTFOLIO_TARGET_UTILIZATION", 1.0)),
+        "init_cap": float(get("INITIAL_CAPITAL", 100_000.0)),
+        "strategies": {t: {k: strategies[t][k] for k in ("rsi_period", "rsi_buy_below", "rsi_sell_above")}
+                       for t in tickers},
+        "fees_bps": [float(get("ENTRY_FEES_BPS", 0)), float(get("EXIT_FEES_BPS", 0))],
+        "slip_bps": [float(get("SLIP_OPEN_BPS", 0)), float(get("SLIP_CLOSE_BPS", 0))],
+        "rebalance": rebalance,
+        "drift_band": float(get("PORTFOLIO_DRIFT_BAND", 0.05)),
+    }
+
+#========================= Loading =========================
+class LoadSummary:
+    """Outcome of a price load: loaded symbols, failures ({symbol: error}) and timings."""
+    def __init__(self):
+        self.loaded: list[str] = []
+        self.failed: dict[str, str] = {}
+        self.seconds: dict[str, float] = {}
+        self.wall = 0.0
+
+    def as_dict(self) -> dict:
+        return {"loaded": list(self.loaded), "failed": dict(self.failed),
+                "seconds": dict(self.seconds), "wall": self.wall}
+
+    def __str__(self):
+        n = len(self.loaded) + len(self.failed)
+        msg = f"loaded {len(self.loaded)}/{n} symbols in {self.wall:.1f}s"
+        if self.failed:
+            msg += " | failed: " + ", ".join(f"{s} ({e})" for s, e in self.failed.items())
+        return msg
+
+def load_workers() -> int:
+    """PORTFOLIO_LOAD_WORKERS from config (threads fetching prices at once)."""
+    return max(1, int(get("PORTFOLIO_LOAD_WORKERS", 8) or 1))
+
+def iter_prices(data_adapter, symbols: list[str], start, end, *, workers: int = None,
+                summary: LoadSummary = None):
+    """
+    Yield (symbol, close frame) in symbol order while up to `workers` symbols load
+    concurrently; at most 2 * workers results are in flight, so memory stays bounded
+    however long the list. Symbols that fail are recorded in summary.failed and skipped.
+    """
+    workers = load_workers() if workers is None else max(1, int(workers))
+    summary = LoadSummary() if summary is None else summary
+    t0 = time.perf_counter()
+
+    def _one(sym):
+        t = time.perf_counter()
+        try:
+            df, err = _load_price_series(sym, data_adapter, start, end), None
+        except Exception as e:
+            df, err = None, f"{type(e).__name__}: {e}"
+        return sym, df, err, time.perf_counter() - t
+
+    def _record(sym, df, err, secs):
+        summary.seconds[sym] = secs
+        if err is None:
+            summary.loaded.append(sym)
+        else:
+            summary.failed[sym] = err
+        return df
+
+    if workers <= 1:
+        for sym in symbols:
+            df = _record(*_one(sym))
+            if df is not None:
+                yield sym, df
+    else:
+        pending_syms = iter(symbols)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque(pool.submit(_one, sym) for _, sym in zip(range(2 * workers), pending_syms))
+            while pending:
+                sym, df, err, secs = pending.popleft().result()
+                nxt = next(pending_syms, None)
+                if nxt is not None:
+                    pending.append(pool.submit(_one, nxt))
+                df = _record(sym, df, err, secs)
+                if df is not None:
+                    yield sym, df
+    summary.wall = time.perf_counter() - t0
+
+def load_prices(data_adapter, symbols: list[str], start, end, *,
+                workers: int = None) -> tuple[dict[str, pd.DataFrame], LoadSummary]:
+    """Fetch symbols concurrently (iter_prices). Returns ({symbol: close frame}, LoadSummary)."""
+    summary = LoadSummary()
+    price_map = dict(iter_prices(data_adapter, list(dict.fromkeys(symbols)), start, end,
+                                 workers=workers, summary=summary))
+    return price_map, summary
+
+def _drop_tickers(settings: dict, failed: list[str]) -> dict:
+    """Settings without the failed tickers; remaining weights renormalized to sum to 1."""
+    tickers = [t for t in settings["tickers"] if t not in failed]
+    if not tickers:
+        raise ValueError(f"No portfolio symbol could be loaded: {failed}")
+    total_w = sum(settings["weights"][t] for t in tickers)
+    return {**settings, "tickers": tickers,
+            "weights": {t: settings["weights"][t] / total_w for t in tickers},
+            "strategies": {t: settings["strategies"][t] for t in tickers}}
+
+#========================= Matrices =========================
+def close_matrix(price_map: dict[str, pd.DataFrame], tickers: list[str],
+                 fill: dict[str, float] = None) -> tuple[pd.DatetimeIndex, np.ndarray]:
+    """
+    Align tickers on the intersection of their dates (forward-filled) into one
+    dates x tickers float64 close matrix. fill: value for leading gaps per ticker
+    (last close of a resumed run).
+    """
+    common_index = None
+    for t in tickers:
+        idx = price_map[t].index
+        common_index = idx if common_index is None else common_index.intersection(idx)
+    common_index = common_index.sort_values()
+
+    close = np.empty((len(common_index), len(tickers)), dtype="float64")
+    for j, t in enumerate(tickers):
+        col = price_map[t]['close'].reindex(common_index).ffill()
+        if fill is not None:
+            col = col.fillna(fill[t])
+        close[:, j] = col.to_numpy(dtype="float64")
+    return common_index, close
+
+def union_close_matrix(closes: dict[str, pd.Series], tickers: list[str]) -> tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
+    """
+    Align tickers on the union of their dates. Returns (index, close, tradable):
+    close is forward-filled after each ticker's first bar (NaN before it) and
+    tradable marks the dates a ticker actually has a bar. Columns are scattered
+    straight into the matrix, no per-ticker reindexed frames.
+    """
+    index = None
+    for t in tickers:
+        idx = closes[t].index
+        index = idx if index is None else index.union(idx)
+    index = index.sort_values()
+    n = len(index)
+
+    close = np.full((n, len(tickers)), np.nan, dtype="float64")
+    tradable = np.zeros((n, len(tickers)), dtype=bool)
+    rows = np.arange(n)
+    for j, t in enumerate(tickers):
+        s = closes[t]
+        vals = s.to_numpy(dtype="float64")
+        ok = ~np.isnan(vals)
+        pos = index.get_indexer(s.index)[ok]
+        tradable[pos, j] = True
+        col = np.full(n, np.nan)
+        col[pos] = vals[ok]
+        last = np.maximum.accumulate(np.where(tradable[:, j], rows, -1))
+        close[:, j] = np.where(last >= 0, col[np.maximum(last, 0)], np.nan)
+    return index, close, tradable
+
+def last_bars(tradable: np.ndarray) -> np.ndarray:
+    """Row of each ticker's final bar when its history ends before the calendar does, else -1."""
+    n = tradable.shape[0]
+    last = n - 1 - np.argmax(tradable[::-1], axis=0)
+    return np.where(tradable.any(axis=0) & (last < n - 1), last, -1)
+
+def align_prices(price_map: dict[str, pd.DataFrame], tickers: list[str], *, after=None,
+                 fill: dict[str, float] = None, calendar: str = "intersection"):
+    """
+    Align loaded close frames; after: keep only later bars.
+    Returns (index, close, tradable); tradable is None for the intersection calendar.
+    """
+    price_map = {t: price_map[t] for t in tickers}
+    if after is not None:
+        price_map = {t: df[df.index > after] for t, df in price_map.items()}
+    if calendar == "union":
+        return union_close_matrix({t: df['close'] for t, df in price_map.items()}, tickers)
+    if calendar != "intersection":
+        raise ValueError(f"PORTFOLIO_CALENDAR must be 'intersection' or 'union', got {calendar!r}")
+    return (*close_matrix(price_map, tickers, fill), None)
+
+def load_close_matrix(data_adapter, tickers: list[str], start, end, *, after=None,
+                      fill: dict[str, float] = None, calendar: str = "intersection"):
+    """Load every ticker concurrently and align it (align_prices); any failed symbol raises."""
+    price_map, summary = load_prices(data_adapter, tickers, start, end)
+    if summary.failed:
+        raise ValueError(f"Could not load prices: {summary.failed}")
+    return align_prices(price_map, tickers, after=after, fill=fill, calendar=calendar)
+
+def rsi_matrix(close: np.ndarray, index: pd.Index, periods: list[int],
+               tradable: np.ndarray = None) -> np.ndarray:
+    """
+    Wilder RSI per column (one period per ticker), same values as _rsi on each series.
+    tradable: RSI runs on each ticker's own bars only and is NaN elsewhere.
+    """
+    out = np.empty_like(close)
+    if tradable is not None:
+        out[:] = np.nan
+        for j, period in enumerate(periods):
+            mask = tradable[:, j]
+            if mask.any():
+                own = pd.Series(close[mask, j], index=index[mask])
+                out[mask, j] = _rsi(own, period).to_numpy(dtype="float64")
+        return out
+    if _rsi_alias is not None:
+        for j, period in enumerate(periods):
+            out[:, j] = _rsi(pd.Series(close[:, j], index=index), period).to_numpy(dtype="float64")
+        return out
+    # built-in RSI: pandas runs ewm column by column, so one frame per distinct period gives the same values
+    by_period: dict[int, list[int]] = {}
+    for j, period in enumerate(periods):
+        by_period.setdefault(period, []).append(j)
+    for period, cols in by_period.items():
+        frame = pd.DataFrame(close[:, cols], index=index)
+        out[:, cols] = _fallback_rsi(frame, period).to_numpy(dtype="float64")
+    return out
+
+def buyhold_curve(close: np.ndarray, weights: np.ndarray, utilization: float,
+                  init_cap: float, tradable: np.ndarray = None) -> tuple[np.ndarray, float, np.ndarray]:
+    """
+    Buy & hold from the first row: (shares per ticker, leftover cash, equity curve).
+    tradable: each ticker is bought on its own first bar; its allocation stays cash until then.
+    """
+    bh_shares = np.zeros(close.shape[1], dtype="int64")
+    remaining = init_cap
+    if tradable is not None:
+        first = np.argmax(tradable, axis=0)
+        rows = np.arange(close.shape[0])[:, None]
+        held = tradable.any(axis=0) & (rows >= first)
+        spent = np.zeros(close.shape[1])
+        for j in range(close.shape[1]):
+            if tradable[:, j].any():
+                price = close[first[j], j]
+                bh_shares[j] = math.floor((init_cap * weights[j] * utilization) / price)
+                spent[j] = bh_shares[j] * price
+                remaining -= spent[j]
+        terms = np.where(held, bh_shares * np.nan_to_num(close) - spent, 0.0)
+        return bh_shares, remaining, _sequential_rowsum(init_cap, terms)
+    for j in range(close.shape[1]):
+        alloc = init_cap * weights[j]
+        price = close[0, j]
+        shares = math.floor((alloc * utilization) / price)
+        bh_shares[j] = shares
+        remaining -= shares * price
+    return bh_shares, remaining, _sequential_rowsum(remaining, close * bh_shares)
+
+def _sequential_rowsum(start, terms: np.ndarray) -> np.ndarray:
+    """start + terms[:, 0] + terms[:, 1] + ... in column order (the loop's summation order)."""
+    acc = np.full(terms.shape[0], start, dtype="float64")
+    for j in range(terms.shape[1]):
+        acc = acc + terms[:, j]
+    return acc
+
+#========================= Rebalancing =========================
+def rebalance_schedule(index: pd.DatetimeIndex, mode: str, prev=None) -> np.ndarray:
+    """
+    Calendar rebalance rows: the first bar of each month/quarter (bool per row).
+    prev: last date before index (resumed runs), so a period change at row 0 counts.
+    None for "none" and "drift" (drift is checked every bar).
+    """
+    if mode in ("none", "drift"):
+        return None
+    if mode == "monthly":
+        period = lambda idx: np.asarray(idx.year * 12 + idx.month)
+    elif mode == "quarterly":
+        period = lambda idx: np.asarray(idx.year * 4 + (idx.month - 1) // 3)
+    else:
+        raise ValueError(f"Unknown rebalance mode {mode!r}")
+    key = period(index)
+    out = np.zeros(len(index), dtype=bool)
+    if len(index):
+        out[1:] = key[1:] != key[:-1]
+        out[0] = prev is not None and key[0] != period(pd.DatetimeIndex([prev]))[0]
+    return out
+
+def _rebalance(i: int, row: np.ndarray, positions: np.ndarray, cost_basis: np.ndarray, cash: float,
+               target_w: np.ndarray, active: np.ndarray, drift_band: float, fees_bps, slip_bps,
+               trades: list) -> tuple[float, np.ndarray]:
+    """
+    Resize the held (active) positions to target_w of current equity in one
+    vectorized delta: trims first, then adds (scaled down pro rata if cash is short).
+    drift_band: only trade when some held weight is off target by more than this.
+    Returns (cash, per-ticker share delta).
+    """
+    entry_fee_bps, exit_fee_bps = fees_bps
+    slip_open_bps, slip_close_bps = slip_bps
+    px = np.where(active, row, 1.0)
+    value = np.where(positions > 0, positions * row, 0.0)  # halted holdings still count at their last close
+    total = cash + value.sum()
+    delta = np.zeros(len(row), dtype="int64")
+    if total <= 0:
+        return cash, delta
+    if drift_band is not None and not (np.abs(value / total - target_w)[active] > drift_band).any():
+        return cash, delta
+
+    target = np.floor(total * target_w / px).astype("int64")
+    delta = np.where(active, target - positions, 0)
+
+    sells = np.flatnonzero(delta < 0)
+    if sells.size:
+        qty = -delta[sells]
+        exec_px = row[sells] * (1 - slip_close_bps / 10000.0)
+        gross = qty * exec_px
+        fees = gross * (exit_fee_bps / 10000.0)
+        pnl = (exec_px - cost_basis[sells]) * qty - fees
+        cash += float((gross - fees).sum())
+        trades.extend(zip([i] * sells.size, sells.tolist(), ["sell"] * sells.size, qty.tolist(),
+                          exec_px, fees, pnl, ["rebalance"] * sells.size))
+        cost_basis[sells] = np.where(positions[sells] + delta[sells] > 0, cost_basis[sells], 0.0)
+
+    buys = np.flatnonzero(delta > 0)
+    if buys.size:
+        exec_px = row[buys] * (1 + slip_open_bps / 10000.0)
+        unit_cost = exec_px * (1 + entry_fee_bps / 10000.0)
+        qty = delta[buys]
+        need = float((qty * unit_cost).sum())
+        if need > cash:
+            qty = np.floor(qty * (cash / need)).astype("int64")
+            delta[buys] = qty
+        gross = qty * exec_px
+        fees = gross * (entry_fee_bps / 10000.0)
+        cash -= float((gross + fees).sum())
+        held_qty = positions[buys]
+        cost_basis[buys] = np.where(qty > 0, (cost_basis[buys] * held_qty + exec_px * qty) / (held_qty + qty),
+                                    cost_basis[buys])
+        fill = qty > 0
+        trades.extend(zip([i] * int(fill.sum()), buys[fill].tolist(), ["buy"] * int(fill.sum()),
+                          qty[fill].tolist(), exec_px[fill], fees[fill], [None] * int(fill.sum()),
+                          ["rebalance"] * int(fill.sum())))
+
+    positions += delta
+    return cash, delta
+
+#========================= Kernel =========================
+def run_portfolio_kernel(close: np.ndarray, rsi: np.ndarray, buy_below: np.ndarray,
+                         sell_above: np.ndarray, weights: np.ndarray, *, cash: float,
+                         positions: np.ndarray, cost_basis: np.ndarray, utilization: float,
+                         fees_bps: tuple, slip_bps: tuple, tradable: np.ndarray = None,
+                         last_bar: np.ndarray = None, rebalance: np.ndarray = None,
+                         drift_band: float = None) -> dict:
+    """
+    RSI portfolio over integer positions. Each bar, triggered tickers are found with
+    one vectorized comparison and then filled in ticker order (cash is shared, so
+    order matters); portfolio value only sums the held columns.
+
+    tradable: (n_dates x n_tickers) bool; no signals or fills where a ticker has no bar.
+    last_bar: per-ticker row where its history ends early (-1 = never); a position
+    still open there is sold at that bar's close, and no entry is taken on it.
+    rebalance: bool per row (rebalance_schedule); held positions are resized to
+    weights * utilization of equity after that bar's signals.
+    drift_band: check every bar and rebalance when a held weight drifts past it.
+
+    Returns dict with equity (n_dates,), positions (n_dates x n_tickers int64),
+    trades (row, col, side, shares, price, fees, pnl, reason) and the closing cash,
+    positions, cost_basis.
+    """
+    entry_fee_bps, exit_fee_bps = fees_bps
+    slip_open_bps, slip_close_bps = slip_bps
+    n, k = close.shape
+    positions = np.array(positions, dtype="int64")
+    cost_basis = np.array(cost_basis, dtype="float64")
+    pos_delta = np.zeros((n, k), dtype="int64")
+    start_positions = positions.copy()
+    equity = np.empty(n, dtype="float64")
+    trades = []
+    target_w = np.asarray(weights, dtype="float64") * utilization
+
+    held = [j for j in range(k) if positions[j] > 0]
+    for i in range(n):
+        row = close[i]
+        # 0 + q*px over held columns in ticker order, exactly like sum() over all tickers
+        total_equity_before = cash + sum([positions[j] * row[j] for j in held], 0)
+
+        flat = positions == 0
+        r = rsi[i]
+        hit = (flat & (r <= buy_below)) | (~flat & (r >= sell_above))
+        if last_bar is not None:
+            # final row: close what is open, open nothing that could never be sold
+            hit |= ~flat & (last_bar == i)
+            hit &= ~(flat & (last_bar == i))
+        if tradable is not None:
+            hit &= tradable[i]
+        triggered = np.flatnonzero(hit)
+        changed = False
+        for j in triggered.tolist():
+            close_px = row[j]
+            if positions[j] == 0:
+                target_dollars = total_equity_before * weights[j] * utilization
+                desired = math.floor(target_dollars / close_px)
+                max_afford = math.floor(cash / close_px) if close_px > 0 else 0
+                qty = min(desired, max_afford)
+                if qty > 0:
+                    exec_price = close_px * (1 + slip_open_bps / 10000.0)
+                    gross = qty * exec_price
+                    fees = gross * (entry_fee_bps / 10000.0)
+                    total_cost = gross + fees
+                    if total_cost <= cash:
+                        cash -= total_cost
+                        positions[j] += qty
+                        pos_delta[i, j] = qty
+                        cost_basis[j] = exec_price
+                        trades.append((i, j, "buy", qty, exec_price, fees, None, None))
+                        changed = True
+            else:
+                qty = int(positions[j])
+                exec_price = close_px * (1 - slip_close_bps / 10000.0)
+                gross = qty * exec_price
+                fees = gross * (exit_fee_bps / 10000.0)
+                proceeds = gross - fees
+                cash += proceeds
+                pnl = (exec_price - cost_basis[j]) * qty - fees
+                trades.append((i, j, "sell", qty, exec_price, fees, pnl, None))
+                pos_delta[i, j] = -qty
+                positions[j] = 0
+                cost_basis[j] = 0.0
+                changed = True
+        if held and ((rebalance is not None and rebalance[i]) or drift_band is not None):
+            active = positions > 0
+            if tradable is not None:
+                active &= tradable[i]
+            if active.any():
+                cash, delta = _rebalance(i, row, positions, cost_basis, cash, target_w, active, drift_band,
+                                         fees_bps, slip_bps, trades)
+                pos_delta[i] += delta
+                changed = changed or bool(delta.any())
+        if changed:
+            held = [j for j in range(k) if positions[j] > 0]
+
+        equity[i] = cash + sum([positions[j] * row[j] for j in held], 0)
+
+    return {
+        "equity": equity,
+        "positions": start_positions + np.cumsum(pos_delta, axis=0),
+        "trades": trades,
+        "cash": cash,
+        "final_positions": positions,
+        "cost_basis": cost_basis,
+    }
+
+def _trade_dicts(trades: list[tuple], index: pd.Index, tickers: list[str]) -> list[dict]:
+    out = []
+    for i, j, side, qty, price, fees, pnl, reason in trades:
+        tr = {"date": index[i], "ticker": tickers[j], "side": side,
+              "shares": int(qty), "price": price, "fees": fees}
+        if side == "sell":
+            tr["pnl"] = pnl
+        if reason is not None:
+            tr["reason"] = reason
+        out.append(tr)
+    return out
+
+#========================= Driver =========================
+def simulate_portfolio(data_adapter, state: dict = None, return_state: bool = False, *,
+                       settings: dict = None, prices: tuple = None):
+    """
+    Run the configured portfolio on aligned dates x tickers close/RSI matrices.
+    return_state: attach a compact end-of-run state as result.state.
+    state: resume from a saved state; only bars after its last date are loaded and
+           simulated, and the result is bit-identical to a full rerun.
+    settings: from _portfolio_settings (default: built from config).
+    prices: preloaded (index, close matrix) in settings["tickers"] order; skips loading.
+    Tickers that fail to load are dropped (weights renormalized) and listed in
+    result.load_summary; result.weights holds the weights actually used.
+    A missing benchmark only drops the benchmark curve.
+    """
+    if state is not None and prices is not None:
+        raise ValueError("Resuming from engine state loads its own prices")
+    settings = _portfolio_settings() if settings is None else settings
+    tickers, weights = settings["tickers"], settings["weights"]
+    strategies = settings["strategies"]
+    utilization, init_cap = settings["utilization"], settings["init_cap"]
+    start = get("START", None)
+    end = get("END", None)
+
+    if state is not None:
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported engine state version {state.get('version')}")
+        if state["settings"] != settings:
+            raise ValueError("Portfolio settings changed since the engine state was saved; rerun in full")
+        if _rsi_alias is not None:
+            raise ValueError("Engine state resume needs the built-in Wilder RSI")
+        prev_index = _index_from_state(state)
+        last_dt = prev_index[-1]
+        start = (last_dt + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+
+    # Load price data: tickers and benchmark together on a thread pool (PORTFOLIO_LOAD_WORKERS).
+    # PORTFOLIO_CALENDAR="union" keeps every date with a per-ticker tradable mask.
+    calendar = str(get("PORTFOLIO_CALENDAR", "intersection")).lower()
+    bench_symbol = get("BENCHMARK_SYMBOL", None)
+    want_bench = bool(get("BENCHMARK_ENABLED", False) and bench_symbol
+                      and (state is None or state["bench_first"] is not None))
+    if prices is not None:
+        common_index, close, tradable = (*prices, None)[:3]
+        price_map, load_summary = load_prices(data_adapter, [bench_symbol] if want_bench else [], start, end)
+    else:
+        price_map, load_summary = load_prices(data_adapter, tickers + ([bench_symbol] if want_bench else []),
+                                              start, end)
+        failed = [t for t in tickers if t in load_summary.failed]
+        if failed and (state is not None or return_state):
+            raise ValueError(f"Engine state needs every portfolio symbol; could not load: "
+                             f"{ {t: load_summary.failed[t] for t in failed} }")
+        if failed:
+            print(f"[Portfolio] Dropping symbols that failed to load: {failed}")
+            settings = _drop_tickers(settings, failed)
+            tickers, weights, strategies = settings["tickers"], settings["weights"], settings["strategies"]
+        if state is None:
+            common_index, close, tradable = align_prices(price_map, tickers, calendar=calendar)
+        else:
+            common_index, close, tradable = align_prices(price_map, tickers, after=last_dt,
+                                                         fill={t: state["rsi"][t]["last_close"] for t in tickers})
+    if load_summary.failed:
+        print(f"[Portfolio] {load_summary}")
+    if tradable is not None and (state is not None or return_state):
+        raise ValueError("Engine state resume needs PORTFOLIO_CALENDAR='intersection'")
+
+    # RSI matrix
+    rsi_states = {}
+    if state is None and not return_state:
+        rsi = rsi_matrix(close, common_index, [strategies[t]["rsi_period"] for t in tickers], tradable)
+    else:
+        rsi = np.empty_like(close)
+        for j, t in enumerate(tickers):
+            col = pd.Series(close[:, j], index=common_index)
+            if state is not None:
+                r, _, rsi_states[t] = _rsi_resume(col, state["rsi"][t])
+            else:
+                raw = _wilder_rsi_raw(col, strategies[t]["rsi_period"])
+                r = raw.bfill()
+                rsi_states[t] = _rsi_state(col, strategies[t]["rsi_period"], raw)
+            rsi[:, j] = r.to_numpy(dtype="float64")
+
+    # Buy & Hold baseline
+    if state is None:
+        bh_vec, remaining_bh_cash, buyhold_vals = buyhold_curve(
+            close, np.array([weights[t] for t in tickers]), utilization, init_cap, tradable)
+        bh_shares = {t: int(q) for t, q in zip(tickers, bh_vec)}
+    else:
+        bh_shares = dict(state["bh_shares"])
+        remaining_bh_cash = state["remaining_bh_cash"]
+        bh_vec = np.array([bh_shares[t] for t in tickers], dtype="int64")
+        buyhold_vals = _sequential_rowsum(remaining_bh_cash, close * bh_vec)
+
+    # Benchmark (loaded with the tickers; a failed load only drops the comparison curve)
+    benchmark_vals = None
+    bench_first = bench_last = None
+    if want_bench:
+        if bench_symbol not in price_map:
+            if state is not None:
+                raise ValueError(f"Could not load benchmark {bench_symbol}: {load_summary.failed.get(bench_symbol)}")
+        else:
+            bench_df = price_map[bench_symbol]
+            if state is not None:
+                bench_df = bench_df[bench_df.index > last_dt]
+            bp = bench_df.reindex(common_index).ffill()['close']
+            if state is None:
+                bench_first = bp.iloc[0]
+            else:
+                bp = bp.fillna(state["bench_last"])
+                bench_first = state["bench_first"]
+            benchmark_vals = ((bp / bench_first) * init_cap).to_numpy()
+            bench_last = float(bp.iloc[-1]) if len(bp) else (state or {}).get("bench_last")
+
+    # Simulation
+    if state is None:
+        cash = init_cap
+        start_pos = np.zeros(len(tickers), dtype="int64")
+        start_basis = np.zeros(len(tickers), dtype="float64")
+    else:
+        cash = state["cash"]
+        start_pos = np.array([state["positions"][t] for t in tickers], dtype="int64")
+        start_basis = np.array([state["cost_basis"][t] for t in tickers], dtype="float64")
+    sim = run_portfolio_kernel(
+        close, rsi,
+        np.array([strategies[t]["rsi_buy_below"] for t in tickers], dtype="float64"),
+        np.array([strategies[t]["rsi_sell_above"] for t in tickers], dtype="float64"),
+        np.array([weights[t] for t in tickers], dtype="float64"),
+        cash=cash, positions=start_pos, cost_basis=start_basis, utilization=utilization,
+        fees_bps=settings["fees_bps"], slip_bps=settings["slip_bps"],
+        tradable=tradable, last_bar=last_bars(tradable) if tradable is not None else None,
+        rebalance=rebalance_schedule(common_index, settings["rebalance"],
+                                     prev=last_dt if state is not None else None),
+        drift_band=settings["drift_band"] if settings["rebalance"] == "drift" else None,
+    )
+    equity_vals = sim["equity"]
+    pos_mat = sim["positions"]
+    # before a ticker's first bar its close is NaN and it holds nothing
+    ticker_eq = pos_mat * (close if tradable is None else np.nan_to_num(close))
+    trades = _trade_dicts(sim["trades"], common_index, tickers)
+
+    # Resumed runs extend the saved curves and trade log
+    index = common_index
+    if state is not None:
+        index = prev_index.append(common_index)
+        equity_vals = np.concatenate((state["equity"], equity_vals))
+        buyhold_vals = np.concatenate((state["buyhold_equity"], buyhold_vals))
+        if benchmark_vals is not None:
+            benchmark_vals = np.concatenate((state["benchmark_equity"], benchmark_vals))
+        ticker_eq = np.concatenate((state["ticker_equity"], ticker_eq))
+        pos_mat = np.concatenate((state["positions_history"], pos_mat))
+        trades = [{**tr, "date": pd.Timestamp(tr["date"])} for tr in state["trades"]] + trades
+
+    buyhold_equity = pd.Series(buyhold_vals, index=index, name="buyhold_equity")
+    benchmark_equity = None
+    if benchmark_vals is not None:
+        benchmark_equity = pd.Series(benchmark_vals, index=index, name="benchmark_equity")
+    equity = pd.Series(equity_vals, index=index, name="portfolio_equity")
+
+    result = PortfolioResult(equity, trades, buyhold_equity, benchmark_equity, tickers, pos_mat, ticker_eq)
+    result.load_summary = load_summary
+    result.weights = dict(weights)  # normalized target weights of the tickers actually traded
+    result.state = None
+    if return_state or state is not None:
+        if _rsi_alias is not None:
+            raise ValueError("Engine state export needs the built-in Wilder RSI")
+        result.state = {
+            "version": STATE_VERSION,
+            "settings": settings,
+            **_index_state(index),
+            "cash": float(sim["cash"]),
+            "positions": {t: int(q) for t, q in zip(tickers, sim["final_positions"])},
+            "cost_basis": {t: float(v) for t, v in zip(tickers, sim["cost_basis"])},
+            "bh_shares": {t: int(q) for t, q in bh_shares.items()},
+            "remaining_bh_cash": float(remaining_bh_cash),
+            "bench_first": float(bench_first) if bench_first is not None else None,
+            "bench_last": bench_last,
+            "rsi": rsi_states,
+            # curves keep their dtype so a resumed result matches a full rerun exactly
+            "equity": np.asarray(equity_vals),
+            "buyhold_equity": np.asarray(buyhold_vals),
+            "benchmark_equity": benchmark_vals,
+            "ticker_equity": ticker_eq,
+            "positions_history": pos_mat,
+            "trades": [{**tr, "date": tr["date"].isoformat(),
+                        **{k: float(tr[k]) for k in ("price", "fees", "pnl") if k in tr},
+                        "shares": int(tr["shares"])} for tr in trades],
+        }
+    return result
+
+#========================= Reference loop =========================
+def _simulate_portfolio_loop(data_adapter):
+    """
+    Original per-date, per-ticker .loc loop. Kept as the reference implementation
+    for parity tests.
+    """
     tickers = list(get("TICKERS", []))
     strategies = get("PORTFOLIO_STRATEGIES", {})
     weights_cfg = get("PORTFOLIO_WEIGHTS", None)
@@ -266,7 +1016,7 @@ def simulate_portfolio(data_adapter):
             per_ticker_positions[t].append(positions[t])
 
     equity = pd.Series(equity_series, index=common_index, name="portfolio_equity")
-    per_ticker_equity = {t: pd.Series(vals, index=common_index, name=f"{t}_equity")
-                         for t, vals in per_ticker_equity.items()}
 
-    return PortfolioResult(equity, per_ticker_equity, trades, buyhold_equity, benchmark_equity, per_ticker_positions)
\ No newline at end of file
+    return PortfolioResult(equity, trades, buyhold_equity, benchmark_equity, tickers,
+                           np.column_stack([per_ticker_positions[t] for t in tickers]).astype("int64"),
+                           np.column_stack([per_ticker_equity[t] for t in tickers]).astype("float64"))
\ No newline at end of file
@@ -0,0 +1,126 @@
+# backtester/portfolio_grid.py
+"""
+Portfolio parameter grid (PORTFOLIO_USE_PARAM_GRID).
+Every combination of the per-ticker candidates in PORTFOLIO_PARAM_GRID is run as
+one portfolio. Prices (and the benchmark) are loaded concurrently and aligned once into a dates x tickers close
+matrix, and RSI is computed once per (ticker, distinct period); each combo only
+picks its RSI columns and runs the portfolio kernel. Combos run on a process
+pool (GRID_WORKERS) with the matrices in shared memory.
+"""
+from __future__ import annotations
+import itertools, math
+import numpy as np
+import pandas as pd
+from .settings import get
+from .parallel import grid_workers, grid_pool, shared_frames, _frame_from_spec
+from .portfolio_engine import (
+    PortfolioResult, _portfolio_settings, load_prices, align_prices, rsi_matrix,
+    run_portfolio_kernel, buyhold_curve, comparison_kpis, last_bars, rebalance_schedule,
+)
+
+#========================= Combos =========================
+def portfolio_param_combos(param_grid: dict[str, list[dict]], tickers: list[str]) -> list[dict[str, dict]]:
+    """Cartesian product of per-ticker candidates, in TICKERS order: [{ticker: strategy}, ...]."""
+    missing = [t for t in tickers if not param_grid.get(t)]
+    if missing:
+        raise ValueError(f"PORTFOLIO_PARAM_GRID has no candidates for: {missing}")
+    return [dict(zip(tickers, combo)) for combo in itertools.product(*(param_grid[t] for t in tickers))]
+
+#========================= Shared matrix =========================
+def portfolio_frame(index: pd.Index, close: np.ndarray, tickers: list[str],
+                    combos: list[dict[str, dict]], tradable: np.ndarray = None) -> pd.DataFrame:
+    """
+    Close columns "close:{t}" plus one RSI column "rsi:{t}:{period}" per distinct
+    period a ticker uses in any combo; "tradable:{t}" masks on a union calendar.
+    """
+    cols = {}
+    for j, t in enumerate(tickers):
+        cols[f"close:{t}"] = close[:, j]
+        mask = tradable[:, [j]] if tradable is not None else None
+        if mask is not None:
+            cols[f"tradable:{t}"] = mask[:, 0]
+        for period in sorted({int(c[t]["rsi_period"]) for c in combos}):
+            cols[f"rsi:{t}:{period}"] = rsi_matrix(close[:, [j]], index, [period], mask)[:, 0]
+    return pd.DataFrame(cols, index=index)
+
+#========================= Combo runs =========================
+def run_combo(frame: pd.DataFrame, settings: dict, strategies: dict[str, dict]) -> dict:
+    """Portfolio metrics for one combo (same values simulate_portfolio reports, minus buy & hold/benchmark)."""
+    tickers = settings["tickers"]
+    close = frame[[f"close:{t}" for t in tickers]].to_numpy()
+    rsi = frame[[f"rsi:{t}:{int(strategies[t]['rsi_period'])}" for t in tickers]].to_numpy()
+    tradable = None
+    if f"tradable:{tickers[0]}" in frame.columns:
+        tradable = frame[[f"tradable:{t}" for t in tickers]].to_numpy(dtype=bool)
+    n_t = len(tickers)
+    sim = run_portfolio_kernel(
+        close, rsi,
+        np.array([strategies[t]["rsi_buy_below"] for t in tickers], dtype="float64"),
+        np.array([strategies[t]["rsi_sell_above"] for t in tickers], dtype="float64"),
+        np.array([settings["weights"][t] for t in tickers], dtype="float64"),
+        cash=settings["init_cap"], positions=np.zeros(n_t, dtype="int64"),
+        cost_basis=np.zeros(n_t, dtype="float64"), utilization=settings["utilization"],
+        fees_bps=settings["fees_bps"], slip_bps=settings["slip_bps"],
+        tradable=tradable, last_bar=last_bars(tradable) if tradable is not None else None,
+        rebalance=rebalance_schedule(frame.index, settings["rebalance"]),
+        drift_band=settings["drift_band"] if settings["rebalance"] == "drift" else None,
+    )
+    trades = [{"side": side, "pnl": pnl} for _, _, side, _, _, _, pnl, _ in sim["trades"]]
+    equity = pd.Series(sim["equity"], index=frame.index, name="portfolio_equity")
+    return PortfolioResult(equity, trades, None, None).metrics
+
+def _run_combos(spec: dict, settings: dict, chunk: list[dict[str, dict]]) -> list[dict]:
+    frame = _frame_from_spec(spec)
+    return [run_combo(frame, settings, strategies) for strategies in chunk]
+
+#========================= Driver =========================
+def iter_portfolio_grid(data_adapter, *, workers: int = None, report=None):
+    """
+    Run every PORTFOLIO_PARAM_GRID combo. Yields (combo_id, strategies, metrics)
+    in combo order; metrics carry the shared buy & hold/benchmark KPIs.
+    report(n_combos, n_rsi_series, workers) is called once before the sweep.
+    """
+    tickers = list(get("TICKERS", []))
+    combos = portfolio_param_combos(get("PORTFOLIO_PARAM_GRID", {}) or {}, tickers)
+    settings = _portfolio_settings(combos[0])
+    workers = grid_workers() if workers is None else max(1, int(workers))
+    init_cap = settings["init_cap"]
+    start, end = get("START", None), get("END", None)
+
+    calendar = str(get("PORTFOLIO_CALENDAR", "intersection")).lower()
+    bench_symbol = get("BENCHMARK_SYMBOL", None)
+    want_bench = bool(get("BENCHMARK_ENABLED", False) and bench_symbol)
+    price_map, load_summary = load_prices(data_adapter, tickers + ([bench_symbol] if want_bench else []), start, end)
+    failed = {t: e for t, e in load_summary.failed.items() if t in tickers}
+    if failed:
+        raise ValueError(f"Could not load prices for the parameter grid: {failed}")
+    index, close, tradable = align_prices(price_map, tickers, calendar=calendar)
+    frame = portfolio_frame(index, close, tickers, combos, tradable)
+    if report is not None:
+        report(len(combos), sum(c.startswith("rsi:") for c in frame.columns), workers)
+
+    # Buy & hold and benchmark do not depend on the strategies: score them once
+    _, _, bh_vals = buyhold_curve(close, np.array([settings["weights"][t] for t in tickers]),
+                                  settings["utilization"], init_cap, tradable)
+    shared = comparison_kpis(pd.Series(bh_vals, index=index), "buyhold")
+    if bench_symbol in price_map:
+        bp = price_map[bench_symbol].reindex(index).ffill()['close']
+        shared.update(comparison_kpis((bp / bp.iloc[0]) * init_cap, "bench"))
+
+    def _emit(combo_id, metrics):
+        return combo_id, combos[combo_id], {**metrics, **shared}
+
+    if workers <= 1:
+        for combo_id, strategies in enumerate(combos):
+            yield _emit(combo_id, run_combo(frame, settings, strategies))
+        return
+
+    size = int(get("GRID_CHUNK_SIZE", None) or math.ceil(len(combos) / (4 * workers)))
+    chunks = [combos[i:i + size] for i in range(0, len(combos), size)]
+    with shared_frames({"portfolio": frame}) as specs, grid_pool(workers) as pool:
+        futures = [pool.submit(_run_combos, specs["portfolio"], settings, chunk) for chunk in chunks]
+        combo_id = 0
+        for fut in futures:
+            for metrics in fut.result():
+                yield _emit(combo_id, metrics)
+                combo_id += 1
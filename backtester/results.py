@@ -43,7 +43,7 @@ def write_metrics_csv(run_id: str, symbol: str, config: Dict[str, Any],
 
     row = [
         ts, run_id, symbol,
-        params["rsi_period"], params["rsi_buy_below"], params["rsi_sell_above"],
+        params.get("rsi_period"), params.get("rsi_buy_below"), params.get("rsi_sell_above"),
         config.get("ORDER_TYPE"), config.get("ENTRY_FEES_BPS"), config.get("EXIT_FEES_BPS"),
         config.get("SLIP_OPEN_BPS"), config.get("SLIP_CLOSE_BPS"),
         metrics["init_cap"], metrics["end_cap"], metrics["total_return"], metrics["cagr"],
@@ -0,0 +1,116 @@
+# backtester/search.py
+"""
+Adaptive parameter search: successive halving over rsi_param_grid.
+Every candidate is scored on a short prefix of the history; the best 1/eta
+(by the first TOP_BY metric) survive and are re-scored on an eta-times longer
+prefix, until the window covers the full series. Ties are broken by a seeded
+permutation so results are reproducible. The full-length rung runs in full mode,
+so its results are the survivors' final runs; one worker pool serves every rung.
+"""
+from __future__ import annotations
+import math
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+from .settings import get
+from .grid import rank_score
+from .parallel import iter_grid, grid_pool, grid_workers
+
+def _params_key(params: dict) -> tuple:
+    return tuple(sorted(params.items()))
+
+def successive_halving(df: pd.DataFrame, params_list: list[dict], *,
+                       eta: float = None, min_bars: int = None, keep: int = None,
+                       seed: int = None, workers: int = None, engine: str = None,
+                       full_results: bool = False, pool=None) -> dict:
+    """
+    Prune params_list on growing prefixes of df.
+
+    Args:
+        df: OHLCV DataFrame for one symbol
+        params_list: Candidates from rsi_param_grid
+        eta: Keep 1/eta of the candidates per rung and grow the window by eta (HALVING_ETA)
+        min_bars: First rung window length (HALVING_MIN_BARS)
+        keep: Never prune below this many candidates (default PRINT_TOP_K)
+        seed: Tie-break seed (HALVING_SEED)
+        full_results: Run the full-length rung in full mode and add its (params, result)
+                      pairs as "results" (plan order)
+        pool: Running parallel.grid_pool to use (default: one pool for all rungs)
+
+    Returns:
+        Dict with survivors (in params_list order), rungs (bars, candidates per rung),
+        bar_evals, full_grid_bar_evals, saved_bar_evals, saved_pct
+    """
+    eta = float(eta or get("HALVING_ETA", 3))
+    min_bars = int(min_bars or get("HALVING_MIN_BARS", 504))
+    keep = max(1, int(keep or get("PRINT_TOP_K", 3)))
+    seed = get("HALVING_SEED", 0) if seed is None else seed
+    if eta <= 1:
+        raise ValueError("HALVING_ETA must be > 1")
+
+    top_by = get("TOP_BY", ["total_return"])
+    key = top_by if isinstance(top_by, str) else top_by[0]
+
+    n = len(df)
+    order = np.random.default_rng(seed).permutation(len(params_list))
+    tiebreak = {pos: int(r) for r, pos in enumerate(order)}
+    candidates = list(range(len(params_list)))
+    window = min(n, max(2, min_bars))
+    rungs = []
+    bar_evals = 0
+    results = []
+
+    workers = grid_workers() if workers is None else max(1, int(workers))
+    with nullcontext(pool) if pool is not None or workers <= 1 else grid_pool(workers) as pool:
+        while True:
+            final = window >= n
+            sweep = iter_grid({"_": df.iloc[:window]}, ["_"], [params_list[pos] for pos in candidates],
+                              workers=workers, engine=engine, metrics_only=not (final and full_results),
+                              pool=pool)
+            # results arrive in plan order and, from workers, as copies: match by value
+            by_key = {_params_key(params_list[pos]): pos for pos in candidates}
+            scores = {}
+            for _, params, res in sweep:
+                pos = by_key[_params_key(params)]
+                scores[pos] = rank_score(res["metrics"], key)
+                if final and full_results:
+                    results.append((params_list[pos], res))
+            bar_evals += window * len(candidates)
+            rungs.append({"bars": window, "candidates": len(candidates)})
+
+            if final:
+                break
+            n_keep = max(keep, math.ceil(len(candidates) / eta))
+            candidates = sorted(candidates, key=lambda pos: (scores[pos], tiebreak[pos]))[:n_keep]
+            candidates.sort()
+            window = min(n, int(math.ceil(window * eta)))
+
+    full = n * len(params_list)
+    return {
+        "survivors": [params_list[pos] for pos in candidates],
+        "rungs": rungs,
+        "bar_evals": bar_evals,
+        "full_grid_bar_evals": full,
+        "saved_bar_evals": full - bar_evals,
+        "saved_pct": (1.0 - bar_evals / full) if full else 0.0,
+        **({"results": results} if full_results else {}),
+    }
+
+def iter_halving(dfs: dict[str, pd.DataFrame], symbols: list[str], params_list: list[dict], *,
+                 workers: int = None, engine: str = None, report=None):
+    """
+    Successive halving per symbol; the survivors' results are the full-length rung's
+    full-mode runs. Yields (symbol, params, result) like parallel.iter_grid.
+    report(symbol, stats) is called once per symbol with the successive_halving stats.
+    One worker pool is shared by every symbol and rung.
+    """
+    workers = grid_workers() if workers is None else max(1, int(workers))
+    with grid_pool(workers) if workers > 1 else nullcontext() as pool:
+        for sym in symbols:
+            stats = successive_halving(dfs[sym], params_list, workers=workers, engine=engine,
+                                       full_results=True, pool=pool)
+            results = stats.pop("results")
+            if report is not None:
+                report(sym, stats)
+            for params, res in results:
+                yield sym, params, res
@@ -36,6 +36,31 @@ DEFAULTS = {
     "VICE_VERSA": True,
     "ALLOW_PARTIAL_FILLS": False,
     "EXIT_MODE": "ANY",
+    "ENGINE": "vectorized",
+    "GRID_WORKERS": None,
+    "GRID_CHUNK_SIZE": None,
+    "GRID_METRICS_ONLY": False,
+    "SEARCH_MODE": "grid",
+    "HALVING_ETA": 3,
+    "HALVING_MIN_BARS": 504,
+    "HALVING_SEED": 0,
+    "WALK_FORWARD": False,
+    "WF_TRAIN_BARS": 756,
+    "WF_TEST_BARS": 252,
+    "WF_STEP_BARS": None,
+    "MONTE_CARLO": False,
+    "MC_PATHS": 10_000,
+    "MC_SEED": 0,
+    "MC_CHUNK_PATHS": 2048,
+    "SAVE_ENGINE_STATE": False,
+    "RESUME_FROM_RUN": None,
+    "PORTFOLIO_CALENDAR": "intersection",
+    "PORTFOLIO_LOAD_WORKERS": 8,
+    "PORTFOLIO_REBALANCE": None,
+    "PORTFOLIO_DRIFT_BAND": 0.05,
+    "PORTFOLIO_UNIVERSE": None,
+    "PORTFOLIO_UNIVERSE_STRATEGY": {"rsi_period": 14, "rsi_buy_below": 30, "rsi_sell_above": 70},
+    "UNIVERSE_REPORT_EVERY": 100,
 
     # Risk toggles (engine may ignore in MVP)
     "STOP_ENABLED": False,
@@ -3,6 +3,7 @@ Builds boolean entry/exit signals from indicator series.
 Supports RSI thresholds and RSI Bollinger Band crossovers.
 """
 
+import numpy as np
 import pandas as pd
 from .settings import get
 
@@ -50,3 +51,31 @@ def build_signals(ind: dict[str, pd.Series], *,
 
     return entry.astype(bool), exit_.astype(bool)
 
+
+def build_signals_batch(ind: dict[str, pd.Series], *,
+                        rsi_buy_below, rsi_sell_above
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batched fixed-threshold signals for many (buy_below, sell_above) pairs at once.
+
+    Args:
+        ind: Dictionary of indicator series (needs RSI)
+        rsi_buy_below: Sequence of entry thresholds, one per param set (None = no entry)
+        rsi_sell_above: Sequence of exit thresholds, one per param set (None = no exit)
+
+    Returns:
+        Tuple of (entry, exit) boolean matrices shaped (n_params, n_bars)
+    """
+    n_params = len(rsi_buy_below)
+    idx = next(iter(ind.values())).index
+    if "RSI" not in ind:
+        empty = np.zeros((n_params, len(idx)), dtype=bool)
+        return empty, empty.copy()
+
+    r = ind["RSI"].to_numpy()
+    # compare in the RSI dtype so results match build_signals bit for bit
+    buys = np.array([np.nan if b is None else b for b in rsi_buy_below], dtype=r.dtype)
+    sells = np.array([np.nan if s is None else s for s in rsi_sell_above], dtype=r.dtype)
+    entry = r[None, :] < buys[:, None]
+    exit_ = r[None, :] > sells[:, None]
+    return entry, exit_
@@ -0,0 +1,136 @@
+# backtester/universe.py
+"""
+Large-universe portfolio mode (PORTFOLIO_UNIVERSE, e.g. "spy503.csv").
+Symbols come from the CSV's Symbol column; names without a PORTFOLIO_STRATEGIES
+entry trade PORTFOLIO_UNIVERSE_STRATEGY at equal weight. Tickers are loaded on a
+bounded thread pool (PORTFOLIO_LOAD_WORKERS) and only their close column is kept
+until the aligned close matrix is filled; symbols that fail to load are skipped.
+The portfolio kernel only sums held positions and writes per-ticker equity into
+one preallocated matrix.
+
+Wall time and peak RSS are recorded every UNIVERSE_REPORT_EVERY loaded tickers
+and after the simulation, so scaling with universe size can be checked.
+"""
+from __future__ import annotations
+import csv, sys, time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .settings import get
+from .portfolio_engine import LoadSummary, iter_prices, _portfolio_settings, simulate_portfolio, union_close_matrix
+
+DEFAULT_STRATEGY = {"rsi_period": 14, "rsi_buy_below": 30, "rsi_sell_above": 70}
+
+#========================= Universe =========================
+def load_universe(path: str = None) -> list[str]:
+    """Symbols from a universe CSV (Symbol column), with share-class dots as dashes (BRK.B -> BRK-B)."""
+    path = Path(path or get("PORTFOLIO_UNIVERSE"))
+    if not path.is_absolute() and not path.exists():
+        path = Path(__file__).resolve().parent.parent / path
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    if not rows or "Symbol" not in rows[0]:
+        raise ValueError(f"Universe file {path} has no Symbol column")
+    return list(dict.fromkeys(r["Symbol"].strip().replace(".", "-") for r in rows if r["Symbol"].strip()))
+
+def universe_strategies(tickers: list[str]) -> dict[str, dict]:
+    """PORTFOLIO_STRATEGIES where given, PORTFOLIO_UNIVERSE_STRATEGY for the rest."""
+    configured = get("PORTFOLIO_STRATEGIES", {}) or {}
+    default = get("PORTFOLIO_UNIVERSE_STRATEGY", None) or DEFAULT_STRATEGY
+    return {t: configured.get(t, default) for t in tickers}
+
+#========================= Profiling =========================
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (MB); NaN where resource is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+#========================= Loading =========================
+def load_universe_matrix(data_adapter, tickers: list[str], start=None, end=None, *,
+                         calendar: str = "intersection", report_every: int = 100, report=None):
+    """
+    Load tickers lazily into an aligned, forward-filled float64 close matrix
+    (calendar "intersection", or "union" with a tradable mask).
+    Returns (index, close, tradable or None, loaded tickers, {skipped ticker: error}, checkpoints);
+    each checkpoint is {stage, tickers, seconds, peak_rss_mb} and is passed to report.
+    """
+    t0 = time.perf_counter()
+    closes: dict[str, pd.Series] = {}
+    summary = LoadSummary()
+    skipped = summary.failed
+    checkpoints = []
+    common_index = None
+
+    def _checkpoint(stage, n):
+        cp = {"stage": stage, "tickers": n, "seconds": time.perf_counter() - t0, "peak_rss_mb": peak_rss_mb()}
+        checkpoints.append(cp)
+        if report is not None:
+            report(cp)
+
+    done = 0
+    def _progress(n):
+        nonlocal done
+        while done < n:
+            done += 1
+            if report_every and done % report_every == 0:
+                _checkpoint("load", done)
+
+    for t, df in iter_prices(data_adapter, tickers, start, end, summary=summary):
+        s = df['close'].astype("float64")
+        closes[t] = s
+        if calendar != "union":
+            common_index = s.index if common_index is None else common_index.intersection(s.index)
+        _progress(len(closes) + len(skipped))  # failures ahead of t are already recorded
+    _progress(len(tickers))
+    if not closes:
+        raise ValueError("No universe symbol could be loaded")
+
+    loaded = list(closes)
+    tradable = None
+    if calendar == "union":
+        common_index, close, tradable = union_close_matrix(closes, loaded)
+        closes.clear()
+    else:
+        common_index = common_index.sort_values()
+        close = np.empty((len(common_index), len(loaded)), dtype="float64")
+        for j, t in enumerate(loaded):
+            close[:, j] = closes.pop(t).reindex(common_index).ffill().to_numpy()
+    _checkpoint("align", len(loaded))
+    return common_index, close, tradable, loaded, skipped, checkpoints
+
+#========================= Driver =========================
+def simulate_universe(data_adapter, tickers: list[str] = None, *, report=None):
+    """
+    Run the RSI portfolio over a universe (default: load_universe()).
+    Returns the PortfolioResult with .skipped ({ticker: error}) and .scaling
+    (load/simulate checkpoints of wall time and peak RSS).
+    RESUME_FROM_RUN raises ValueError; SAVE_ENGINE_STATE is ignored with a warning.
+    """
+    # Universe runs rebuild their settings from the loaded symbols, so there is no engine state to resume
+    if get("RESUME_FROM_RUN", None):
+        raise ValueError("RESUME_FROM_RUN is not supported with PORTFOLIO_UNIVERSE")
+    if get("SAVE_ENGINE_STATE", False):
+        print("[Universe] SAVE_ENGINE_STATE is not supported with PORTFOLIO_UNIVERSE; no state is saved")
+    tickers = load_universe() if tickers is None else list(tickers)
+    report_every = int(get("UNIVERSE_REPORT_EVERY", 100) or 0)
+    index, close, tradable, loaded, skipped, checkpoints = load_universe_matrix(
+        data_adapter, tickers, get("START", None), get("END", None),
+        calendar=str(get("PORTFOLIO_CALENDAR", "intersection")).lower(),
+        report_every=report_every, report=report)
+
+    settings = _portfolio_settings(universe_strategies(loaded), tickers=loaded, config_weights=False)
+    t0 = time.perf_counter()
+    result = simulate_portfolio(data_adapter, settings=settings, prices=(index, close, tradable))
+    sim = {"stage": "simulate", "tickers": len(loaded),
+           "seconds": time.perf_counter() - t0, "peak_rss_mb": peak_rss_mb()}
+    checkpoints.append(sim)
+    if report is not None:
+        report(sim)
+
+    result.skipped = skipped
+    result.scaling = checkpoints
+    return result
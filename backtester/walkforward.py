@@ -0,0 +1,196 @@
+# backtester/walkforward.py
+"""
+Walk-forward optimization.
+History is cut into rolling train/test windows (WF_TRAIN_BARS / WF_TEST_BARS,
+advancing by WF_STEP_BARS). Each window picks the best grid combo on train by the
+first TOP_BY metric and runs it on the following test bars; the test curves are
+chained into one out-of-sample equity curve.
+
+Indicators are computed once per indicator group over the full history and sliced
+per window, so RSI on a window has no warm-up gap and never sees future bars.
+Windows run on a process pool (GRID_WORKERS) with the bars and indicators in
+shared memory.
+"""
+from __future__ import annotations
+import pandas as pd
+from .settings import get
+from .indicators import compute_basic_batch
+from .engine import run_grid, run_symbol
+from .grid import indicator_key, rank_score
+from .metrics import kpis_from_equity
+from .parallel import grid_workers, grid_pool, shared_frames, _frame_from_spec
+
+#========================= Windows =========================
+def walk_forward_windows(n: int, train_bars: int, test_bars: int,
+                         step_bars: int = None) -> list[tuple[int, int, int]]:
+    """
+    Rolling (train_start, test_start, test_end) bar positions; train is
+    [train_start, test_start) and test is [test_start, test_end).
+    The last test window is cut at n.
+    """
+    train_bars, test_bars = int(train_bars), int(test_bars)
+    step = int(step_bars or test_bars)
+    if train_bars <= 0 or test_bars <= 0 or step <= 0:
+        raise ValueError("WF_TRAIN_BARS, WF_TEST_BARS and WF_STEP_BARS must be > 0")
+    out = []
+    a = 0
+    while a + train_bars < n:
+        b = a + train_bars
+        c = min(n, b + test_bars)
+        out.append((a, b, c))
+        if c == n:
+            break
+        a += step
+    return out
+
+#========================= Indicators =========================
+def _indicator_frame(df: pd.DataFrame, params_list: list[dict]) -> tuple[pd.DataFrame, dict]:
+    """
+    OHLCV plus every indicator group's series as extra columns, so one frame
+    (one shared-memory spec) carries everything a window needs.
+    Returns (frame, {indicator_key: {indicator name: column}}).
+    """
+    cols = {c: df[c] for c in df.columns}
+    layout = {}
+    for g, (key, ind) in enumerate(compute_basic_batch(df, params_list).items()):
+        layout[key] = {}
+        for name, s in ind.items():
+            col = f"{name}#{g}"
+            cols[col] = s
+            layout[key][name] = col
+    return pd.DataFrame(cols, index=df.index), layout
+
+def _slice_indicators(frame: pd.DataFrame, layout: dict) -> dict:
+    return {key: {name: frame[col] for name, col in names.items()} for key, names in layout.items()}
+
+#========================= One window =========================
+def run_window(frame: pd.DataFrame, layout: dict, params_list: list[dict],
+               window: tuple[int, int, int], engine: str = None) -> dict:
+    """Optimize on the train slice, then run the chosen params on the test slice."""
+    a, b, c = window
+    top_by = get("TOP_BY", ["total_return"])
+    key = top_by if isinstance(top_by, str) else top_by[0]
+    min_trades = int(get("MIN_TRADES_FOR_TOPS", 0))
+
+    train = frame.iloc[a:b]
+    scored = []
+    for pos, (params, res) in enumerate(run_grid(train, params_list, engine=engine, metrics_only=True,
+                                                 indicators=_slice_indicators(train, layout))):
+        m = res["metrics"]
+        enough = (m.get("trades_total") or 0) >= min_trades
+        scored.append((not enough, rank_score(m, key), pos, params, m))
+    scored.sort(key=lambda r: r[:3])  # combos meeting MIN_TRADES_FOR_TOPS first, plan order breaks ties
+    _, _, _, best, train_metrics = scored[0]
+
+    test = frame.iloc[b:c]
+    res = run_symbol(
+        test,
+        rsi_period=best["rsi_period"],
+        rsi_buy_below=best.get("rsi_buy_below"),
+        rsi_sell_above=best.get("rsi_sell_above"),
+        rsi_bb_period=best.get("rsi_bb_period"),
+        rsi_bb_std_dev=best.get("rsi_bb_std_dev"),
+        use_rsi_bb=best.get("use_rsi_bb", False),
+        engine=engine,
+        ind=_slice_indicators(test, layout)[indicator_key(best)],
+    )
+    pnls = res["round_trip_pnls"]
+    return {"window": window, "params": best, "train_metrics": train_metrics, "result": res,
+            "wins": sum(pnl > 0 for pnl in pnls), "round_trip_pnls": pnls}
+
+def _run_window_shared(spec: dict, layout: dict, params_list: list[dict],
+                       window: tuple[int, int, int], engine: str | None) -> dict:
+    return run_window(_frame_from_spec(spec), layout, params_list, window, engine)
+
+#========================= Stitching =========================
+def stitch(runs: list[dict], index: pd.Index) -> dict:
+    """
+    Chain test-window results into one out-of-sample run. Every window starts
+    flat with INITIAL_CAPITAL, so each curve is rescaled to start where the
+    previous one ended. Trade counts, wins and round-trip PnLs are summed over
+    windows (win rate and average PnL are over closed round trips, as in the engine).
+    """
+    init_cap = float(get("INITIAL_CAPITAL", 100_000.0))
+    parts, events, pnls = [], [], []
+    level = init_cap
+    entries = exits = wins = 0
+    for run in runs:
+        res = run["result"]
+        part = res["equity"] * (level / init_cap)
+        parts.append(part)
+        level = float(part.iloc[-1])
+        events.extend(res["events"])
+        pnls.extend(run["round_trip_pnls"])
+        wins += run["wins"]
+        entries += res["metrics"]["trades_entry"]
+        exits += res["metrics"]["trades_exit"]
+
+    equity = pd.concat(parts) if parts else pd.Series([], index=index[:0], dtype="float64")
+    equity.name = "equity"
+    m = kpis_from_equity(equity) if len(equity) else {}
+    m.update({
+        "init_cap": init_cap,
+        "trades_total": entries + exits,
+        "trades_entry": entries,
+        "trades_exit": exits,
+        "win_rate": (wins / len(pnls)) if pnls else None,
+        "net_win_rate": (wins / len(pnls)) if pnls else None,
+        "avg_trade_pnl": (sum(pnls) / len(pnls)) if pnls else None,
+        "wf_windows": len(runs),
+    })
+    return {"equity": equity, "metrics": m, "events": events, "round_trip_pnls": pnls}
+
+def _wf_params(runs: list[dict], index: pd.Index) -> dict:
+    """Params record for CSV/DB: the combo chosen in each window (no single rsi_* values)."""
+    return {
+        "walk_forward": [{
+            "train_start": str(index[a]), "test_start": str(index[b]), "test_end": str(index[c - 1]),
+            **run["params"],
+        } for run in runs for a, b, c in [run["window"]]],
+    }
+
+#========================= Driver =========================
+def iter_walk_forward(dfs: dict[str, pd.DataFrame], symbols: list[str], params_list: list[dict], *,
+                      train_bars: int = None, test_bars: int = None, step_bars: int = None,
+                      workers: int = None, engine: str = None, report=None):
+    """
+    Walk-forward every symbol. Yields (symbol, params, result) like parallel.iter_grid,
+    one stitched out-of-sample result per symbol; params["walk_forward"] lists the
+    combo picked in each window. report(symbol, runs) gets the per-window runs.
+    """
+    train_bars = int(train_bars or get("WF_TRAIN_BARS", 756))
+    test_bars = int(test_bars or get("WF_TEST_BARS", 252))
+    step_bars = step_bars or get("WF_STEP_BARS", None)
+    workers = grid_workers() if workers is None else max(1, int(workers))
+
+    plans = {}
+    for sym in symbols:
+        frame, layout = _indicator_frame(dfs[sym], params_list)
+        windows = walk_forward_windows(len(frame), train_bars, test_bars, step_bars)
+        if not windows:
+            print(f"[{sym}] walk-forward skipped: {len(frame)} bars < WF_TRAIN_BARS + 1")
+        plans[sym] = (frame, layout, windows)
+
+    def _emit(sym, runs):
+        frame = plans[sym][0]
+        if report is not None:
+            report(sym, runs)
+        return sym, _wf_params(runs, frame.index), stitch(runs, frame.index)
+
+    if workers <= 1:
+        for sym in symbols:
+            frame, layout, windows = plans[sym]
+            if windows:
+                yield _emit(sym, [run_window(frame, layout, params_list, w, engine) for w in windows])
+        return
+
+    with shared_frames({sym: plans[sym][0] for sym in symbols if plans[sym][2]}) as specs, \
+            grid_pool(workers) as pool:
+        futures = {
+            sym: [pool.submit(_run_window_shared, specs[sym], plans[sym][1], params_list, w, engine)
+                  for w in plans[sym][2]]
+            for sym in specs
+        }
+        for sym in symbols:
+            if sym in futures:
+                yield _emit(sym, [f.result() for f in futures[sym]])
@@ -1,12 +1,17 @@
 from datetime import datetime
 from backtester.settings import get, resolve_run_id, CONFIG
 from backtester.data import load_bars
-from backtester.engine import run_symbol
-from backtester.grid import rsi_param_grid
+from backtester.parallel import iter_grid, iter_grid_top, iter_resume
+from backtester.search import iter_halving
+from backtester.walkforward import iter_walk_forward
+from backtester.montecarlo import monte_carlo, mc_metrics, pnls_from_trades
+from backtester.grid import rsi_param_grid, rank_score
 from backtester.results import write_metrics_csv
 from backtester.benchmarks import load_benchmark, buy_hold_equity, equity_from_returns
 from backtester.metrics import kpis_from_equity, summarize_comparisons, get_benchmark_equity, get_buyhold_equity
 from backtester.portfolio_engine import simulate_portfolio
+from backtester.portfolio_grid import iter_portfolio_grid
+from backtester.universe import simulate_universe
 from backtester.data import get_data
 import backtester.db as bt_db
 import os
@@ -24,7 +29,8 @@ def main():
     run_id = resolve_run_id()
 
     # Determine mode early
-    is_portfolio = bool(get("PORTFOLIO_MODE", False) and not get("PORTFOLIO_USE_PARAM_GRID", False))
+    is_portfolio = bool(get("PORTFOLIO_MODE", False))
+    is_portfolio_grid = is_portfolio and _bool(get("PORTFOLIO_USE_PARAM_GRID"), False)
     mode = "portfolio" if is_portfolio else "single"
 
     # --- DB init (single place) ---
@@ -33,22 +39,62 @@ def main():
         db_file = bt_db.init_db(get("DB_PATH", "./results/db"))
         bt_db.ensure_run(db_file, run_id, mode, get("NOTES", ""))
 
+    if is_portfolio_grid:
+        print(f"Portfolio Mode (param grid) | Run ID: {run_id}")
+
+        def adapter(sym, start=None, end=None):
+            return get_data(sym, start=start, end=end)
+
+        def _report(n_combos, n_rsi, workers):
+            print(f"[Portfolio] {n_combos} combos | {n_rsi} RSI series | workers: {workers}")
+
+        # Every combo of PORTFOLIO_PARAM_GRID runs against one aligned price/RSI matrix;
+        # each combo's metrics become a portfolio_grid row keyed by combo_id.
+        top_by = get("TOP_BY", ["total_return"])
+        key = top_by if isinstance(top_by, str) else top_by[0]
+        best = None
+        for combo_id, strategies, metrics in iter_portfolio_grid(adapter, report=_report):
+            if best is None or rank_score(metrics, key) < rank_score(best[2], key):
+                best = (combo_id, strategies, metrics)
+            if db_file:
+                bt_db.insert_portfolio_grid_metrics(db_file, run_id, combo_id, strategies, metrics)
+        print(f"[Portfolio] best {key}: combo {best[0]} = {best[2].get(key)} | {best[1]}")
+
+        # The best combo is re-run in full below: its curves, trades and weights are the run's portfolio row
+        CONFIG["PORTFOLIO_STRATEGIES"] = best[1]
+
     if is_portfolio:
         print(f"Portfolio Mode (strategies) | Run ID: {run_id}")
 
         def adapter(sym, start=None, end=None):
             return get_data(sym, start=start, end=end)
 
-        result = simulate_portfolio(adapter)
-
-        # Calculate effective weights (fallback equal weight)
-        weights_eff = get("PORTFOLIO_WEIGHTS", None)
-        if not weights_eff:
-            tlist = get("TICKERS", [])
-            if tlist:
-                weights_eff = {t: 1 / len(tlist) for t in tlist}
-            else:
-                weights_eff = {}
+        # SAVE_ENGINE_STATE stores the end-of-run state; RESUME_FROM_RUN continues a saved run
+        # with only the bars that arrived since (bit-identical to a full rerun).
+        save_state = bool(db_file) and _bool(get("SAVE_ENGINE_STATE"), False)
+        prev_state = None
+        if db_file and get("RESUME_FROM_RUN") and not is_portfolio_grid:
+            prev_state = bt_db.load_engine_state(db_file, get("RESUME_FROM_RUN"), bt_db.PORTFOLIO_STATE_TICKER)
+        # PORTFOLIO_UNIVERSE trades every symbol of a universe CSV at equal weight
+        if get("PORTFOLIO_UNIVERSE") and not is_portfolio_grid:
+            def _report_universe(cp):
+                print(f"[Universe] {cp['stage']} {cp['tickers']} tickers | {cp['seconds']:.1f}s | "
+                      f"peak RSS {cp['peak_rss_mb']:.0f} MB")
+
+            result = simulate_universe(adapter, report=_report_universe)
+            if result.skipped:
+                print(f"[Universe] skipped {len(result.skipped)} symbols: {sorted(result.skipped)}")
+        else:
+            result = simulate_portfolio(adapter, state=prev_state, return_state=save_state)
+
+        # MONTE_CARLO bootstraps the closed-trade PnLs into MC_PATHS synthetic equity paths
+        pnls = pnls_from_trades(result.trades)
+        if _bool(get("MONTE_CARLO"), False) and pnls:
+            years = (len(result.equity) - 1) / float(get("PERIODS_PER_YEAR", 252))
+            result.metrics.update(mc_metrics(monte_carlo(pnls, years=years)))
+
+        # Weights actually traded (failed tickers dropped, renormalized; equal weight in universe mode)
+        weights_eff = result.weights
 
         # --- DB persistence (portfolio) ---
         if db_file:
@@ -58,11 +104,12 @@ def main():
             if result.buyhold_equity is not None:
                 buyhold_json = result.buyhold_equity.to_json(orient='split', date_format='iso')
             per_ticker_json = None
-            if result.per_ticker_equity:
+            per_ticker_equity = result.per_ticker_equity  # {ticker: Series} views of the ticker_equity matrix
+            if per_ticker_equity:
                 # Convert dict of series to JSON
                 per_ticker_json = json.dumps({
                     ticker: eq.to_json(orient='split', date_format='iso')
-                    for ticker, eq in result.per_ticker_equity.items()
+                    for ticker, eq in per_ticker_equity.items()
                 })
             
             # Save benchmark equity for portfolio
@@ -78,6 +125,8 @@ def main():
                 per_ticker_equity_json=per_ticker_json
             )
             bt_db.insert_portfolio_weights(db_file, run_id, weights_eff)
+            if save_state and result.state is not None:
+                bt_db.save_engine_state(db_file, run_id, bt_db.PORTFOLIO_STATE_TICKER, {}, result.state)
             if get("SAVE_TRADES", True):
                 bt_db.insert_trades(db_file, run_id, result.trades)
 
@@ -102,58 +151,89 @@ def main():
         config_json = json.dumps(CONFIG, default=str)
         bt_db.update_run_benchmark(db_file, run_id, bench_json, config_json)
 
-    for sym in symbols:
-        df = dfs[sym]
-        recs = []
-        bh_eq_full = get_buyhold_equity(df["Close"])
-        if bh_eq_full is not None:
-            bh_eq_full.name = f"{sym} Buy & Hold"
-
-        for params in params_list:
-            res = run_symbol(
-                df,
-                rsi_period=params["rsi_period"],
-                rsi_buy_below=params["rsi_buy_below"],
-                rsi_sell_above=params["rsi_sell_above"],
+    # Grid runs on a process pool (GRID_WORKERS); results arrive in symbol/plan order.
+    # GRID_METRICS_ONLY sweeps KPIs only and re-runs the top combos for curves/trades.
+    # SEARCH_MODE="halving" prunes the grid on growing prefixes and only runs survivors in full.
+    def _report_halving(sym, stats):
+        rungs = " -> ".join(f"{r['candidates']}@{r['bars']}" for r in stats["rungs"])
+        print(f"[{sym}] halving {rungs} | survivors: {len(stats['survivors'])} | "
+              f"bar-evals saved: {stats['saved_bar_evals']:,} ({stats['saved_pct']:.1%})")
+
+    # WALK_FORWARD optimizes on rolling train windows and reports the stitched out-of-sample run.
+    def _report_walk_forward(sym, runs):
+        for run in runs:
+            p, m = run["params"], run["result"]["metrics"]
+            print(f"[{sym}] WF test from bar {run['window'][1]}: RSI {p['rsi_period']} "
+                  f"{p.get('rsi_buy_below')}/{p.get('rsi_sell_above')} | OOS return {m['total_return']:.2%}")
+
+    if _bool(get("WALK_FORWARD"), False):
+        results = iter_walk_forward(dfs, symbols, params_list, report=_report_walk_forward)
+    elif str(get("SEARCH_MODE", "grid")).lower() == "halving":
+        results = iter_halving(dfs, symbols, params_list, report=_report_halving)
+    elif _bool(get("GRID_METRICS_ONLY"), False):
+        results = iter_grid_top(dfs, symbols, params_list)
+    elif db_file and (_bool(get("SAVE_ENGINE_STATE"), False) or get("RESUME_FROM_RUN")):
+        # Engine state per (symbol, params): RESUME_FROM_RUN continues that run's saved states
+        # with only the new bars, SAVE_ENGINE_STATE stores this run's for the next one.
+        resume_from = get("RESUME_FROM_RUN")
+        results = iter_resume(
+            dfs, symbols, params_list,
+            load_state=(lambda sym, p: bt_db.load_engine_state(db_file, resume_from, sym, p))
+            if resume_from else None,
+            save_state=(lambda sym, p, st: bt_db.save_engine_state(db_file, run_id, sym, p, st))
+            if _bool(get("SAVE_ENGINE_STATE"), False) else None,
+        )
+    else:
+        results = iter_grid(dfs, symbols, params_list)
+    bh_by_sym = {}
+    for sym, params, res in results:
+        if sym not in bh_by_sym:
+            bh_eq_full = get_buyhold_equity(dfs[sym]["Close"])
+            if bh_eq_full is not None:
+                bh_eq_full.name = f"{sym} Buy & Hold"
+            bh_by_sym[sym] = bh_eq_full
+        bh_eq_full = bh_by_sym[sym]
+
+        m = res["metrics"]
+        if _bool(get("MONTE_CARLO"), False) and res.get("round_trip_pnls"):
+            years = (m["bars"] - 1) / float(get("PERIODS_PER_YEAR", 252))
+            m.update(mc_metrics(monte_carlo(res["round_trip_pnls"], years=years)))
+        strat_eq = res["equity"]
+        events = res.get("events")
+        extras = summarize_comparisons(strat_eq, bench_eq_full, bh_eq_full, index=dfs[sym].index)
+
+        if _bool(get("SAVE_METRICS"), True):
+            out_csv = write_metrics_csv(
+                run_id, sym, CONFIG, m, params,
+                out_dir=get("CSV_DIR"),
+                extras=extras
             )
-            m = res["metrics"]
-            strat_eq = res["equity"]
-            events = res.get("events")
-            extras = summarize_comparisons(strat_eq, bench_eq_full, bh_eq_full)
-
-            if _bool(get("SAVE_METRICS"), True):
-                out_csv = write_metrics_csv(
-                    run_id, sym, CONFIG, m, params,
-                    out_dir=get("CSV_DIR"),
-                    extras=extras
-                )
-
-            # Merge buy & hold comparison metrics into m for database storage
-            m_with_comparisons = {**m, **extras}
-
-            # Serialize equity curve and events for tearsheet generation
-            equity_json = None
-            events_json = None
-            buyhold_json = None
-            if db_file:
-                # Convert equity series to JSON
+
+        # Merge buy & hold comparison metrics into m for database storage
+        m_with_comparisons = {**m, **extras}
+
+        # Serialize equity curve and events for tearsheet generation
+        equity_json = None
+        events_json = None
+        buyhold_json = None
+        if db_file:
+            # Convert equity series to JSON (metrics-only combos have no curve)
+            if strat_eq is not None:
                 strat_eq.name = f"{sym} Strategy"
                 equity_json = strat_eq.to_json(orient='split', date_format='iso')
-                # Convert buy & hold equity to JSON (only if enabled)
-                if bh_eq_full is not None:
-                    buyhold_json = bh_eq_full.to_json(orient='split', date_format='iso')
-                # Convert events list to JSON if exists
-                if events:
-                    events_json = json.dumps(events, default=str)
-                
-                bt_db.insert_strategy_metrics(
-                    db_file, run_id, sym, params, m_with_comparisons,
-                    equity_json=equity_json,
-                    events_json=events_json,
-                    buyhold_json=buyhold_json
-                )
-
-            recs.append((m, params, strat_eq, res.get("events")))
+            # Convert buy & hold equity to JSON (only if enabled)
+            if bh_eq_full is not None:
+                buyhold_json = bh_eq_full.to_json(orient='split', date_format='iso')
+            # Convert events list to JSON if exists
+            if events:
+                events_json = json.dumps(events, default=str)
+            
+            bt_db.insert_strategy_metrics(
+                db_file, run_id, sym, params, m_with_comparisons,
+                equity_json=equity_json,
+                events_json=events_json,
+                buyhold_json=buyhold_json
+            )
 
     if _bool(get("SAVE_METRICS"), True) and out_csv:
         print(f"Metrics saved -> {out_csv}")
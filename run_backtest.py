@@ -13,11 +13,16 @@ from datetime import datetime
 # Import backtester components
 from backtester.settings import CONFIG, resolve_run_id
 from backtester.data import load_bars, get_data
-from backtester.engine import run_symbol
-from backtester.grid import rsi_param_grid
+from backtester.parallel import iter_grid, iter_grid_top, iter_resume
+from backtester.search import iter_halving
+from backtester.walkforward import iter_walk_forward
+from backtester.montecarlo import monte_carlo, mc_metrics, pnls_from_trades
+from backtester.grid import rsi_param_grid, rank_score
 from backtester.results import write_metrics_csv
 from backtester.metrics import summarize_comparisons, get_benchmark_equity, get_buyhold_equity
 from backtester.portfolio_engine import simulate_portfolio
+from backtester.portfolio_grid import iter_portfolio_grid
+from backtester.universe import simulate_universe
 import backtester.db as bt_db
 
 
@@ -71,7 +76,8 @@ def run_backtest(config):
             CONFIG['RUN_ID'] = run_id
 
         # Determine mode
-        is_portfolio = bool(CONFIG.get("PORTFOLIO_MODE", False) and not CONFIG.get("PORTFOLIO_USE_PARAM_GRID", False))
+        is_portfolio = bool(CONFIG.get("PORTFOLIO_MODE", False))
+        is_portfolio_grid = is_portfolio and _bool(CONFIG.get("PORTFOLIO_USE_PARAM_GRID"), False)
         mode = "portfolio" if is_portfolio else "single"
 
         log_progress('running', 5, f'Running in {mode} mode...', run_id=run_id)
@@ -82,22 +88,73 @@ def run_backtest(config):
             db_file = bt_db.init_db(CONFIG.get("DB_PATH", "./results/db"))
             bt_db.ensure_run(db_file, run_id, mode, CONFIG.get("NOTES", ""))
 
-        if is_portfolio:
-            log_progress('running', 20, 'Running portfolio simulation...')
+        if is_portfolio_grid:
+            log_progress('running', 10, 'Preparing portfolio param grid...')
 
             def adapter(sym, start=None, end=None):
                 return get_data(sym, start=start, end=end)
 
-            result = simulate_portfolio(adapter)
+            total = 0
+
+            def _report(n_combos, n_rsi, workers):
+                nonlocal total
+                total = n_combos
+                log_progress('running', 10, f'{n_combos} combos | {n_rsi} RSI series | workers: {workers}')
+
+            # Every combo of PORTFOLIO_PARAM_GRID runs against one aligned price/RSI matrix;
+            # each combo's metrics become a portfolio_grid row keyed by combo_id.
+            top_by = CONFIG.get("TOP_BY", ["total_return"])
+            key = top_by if isinstance(top_by, str) else top_by[0]
+            best = None
+            for combo_id, strategies, metrics in iter_portfolio_grid(adapter, report=_report):
+                if best is None or rank_score(metrics, key) < rank_score(best[2], key):
+                    best = (combo_id, strategies, metrics)
+                if db_file:
+                    bt_db.insert_portfolio_grid_metrics(db_file, run_id, combo_id, strategies, metrics)
+                if total and (combo_id + 1) % max(1, total // 10) == 0:
+                    log_progress('running', 10 + int(40 * (combo_id + 1) / total),
+                                 f'Portfolio combo {combo_id + 1}/{total}')
+
+            # The best combo is re-run in full below: its curves, trades and weights are the run's portfolio row
+            log_progress('running', 50, f'Best {key}: combo {best[0]} = {best[2].get(key)}', best_combo=best[0])
+            CONFIG["PORTFOLIO_STRATEGIES"] = best[1]
+
+        if is_portfolio:
+            log_progress('running', 50 if is_portfolio_grid else 20, 'Running portfolio simulation...')
+
+            def adapter(sym, start=None, end=None):
+                return get_data(sym, start=start, end=end)
 
-            # Calculate effective weights
-            weights_eff = CONFIG.get("PORTFOLIO_WEIGHTS", None)
-            if not weights_eff:
-                tlist = CONFIG.get("TICKERS", [])
-                if tlist:
-                    weights_eff = {t: 1 / len(tlist) for t in tlist}
-                else:
-                    weights_eff = {}
+            # SAVE_ENGINE_STATE stores the end-of-run state; RESUME_FROM_RUN continues a saved run
+            # with only the bars that arrived since (bit-identical to a full rerun).
+            save_state = bool(db_file) and _bool(CONFIG.get("SAVE_ENGINE_STATE"), False)
+            prev_state = None
+            if db_file and CONFIG.get("RESUME_FROM_RUN") and not is_portfolio_grid:
+                prev_state = bt_db.load_engine_state(db_file, CONFIG.get("RESUME_FROM_RUN"), bt_db.PORTFOLIO_STATE_TICKER)
+            # PORTFOLIO_UNIVERSE trades every symbol of a universe CSV at equal weight
+            if CONFIG.get("PORTFOLIO_UNIVERSE") and not is_portfolio_grid:
+                def _report_universe(cp):
+                    log_progress('running', 20, f"Universe {cp['stage']}: {cp['tickers']} tickers | "
+                                 f"{cp['seconds']:.1f}s | peak RSS {cp['peak_rss_mb']:.0f} MB")
+
+                result = simulate_universe(adapter, report=_report_universe)
+                if result.skipped:
+                    log_progress('running', 50, f'Skipped {len(result.skipped)} universe symbols',
+                                 skipped=result.skipped)
+            else:
+                result = simulate_portfolio(adapter, state=prev_state, return_state=save_state)
+                if result.load_summary.failed:
+                    log_progress('running', 50, f'Failed to load {len(result.load_summary.failed)} symbols',
+                                 load_summary=result.load_summary.as_dict())
+
+            # MONTE_CARLO bootstraps the closed-trade PnLs into MC_PATHS synthetic equity paths
+            pnls = pnls_from_trades(result.trades)
+            if _bool(CONFIG.get("MONTE_CARLO"), False) and pnls:
+                years = (len(result.equity) - 1) / float(CONFIG.get("PERIODS_PER_YEAR", 252))
+                result.metrics.update(mc_metrics(monte_carlo(pnls, years=years)))
+
+            # Weights actually traded (failed tickers dropped, renormalized; equal weight in universe mode)
+            weights_eff = result.weights
 
             log_progress('running', 60, 'Saving portfolio results...')
 
@@ -108,10 +165,11 @@ def run_backtest(config):
                 if result.buyhold_equity is not None:
                     buyhold_json = result.buyhold_equity.to_json(orient='split', date_format='iso')
                 per_ticker_json = None
-                if result.per_ticker_equity:
+                per_ticker_equity = result.per_ticker_equity  # {ticker: Series} views of the ticker_equity matrix
+                if per_ticker_equity:
                     per_ticker_json = json.dumps({
                         ticker: eq.to_json(orient='split', date_format='iso')
-                        for ticker, eq in result.per_ticker_equity.items()
+                        for ticker, eq in per_ticker_equity.items()
                     })
                 
                 if result.benchmark_equity is not None:
@@ -126,6 +184,8 @@ def run_backtest(config):
                     per_ticker_equity_json=per_ticker_json
                 )
                 bt_db.insert_portfolio_weights(db_file, run_id, weights_eff)
+                if save_state and result.state is not None:
+                    bt_db.save_engine_state(db_file, run_id, bt_db.PORTFOLIO_STATE_TICKER, {}, result.state)
                 if CONFIG.get("SAVE_TRADES", True):
                     bt_db.insert_trades(db_file, run_id, result.trades)
 
@@ -139,7 +199,7 @@ def run_backtest(config):
                     equity=result.equity,
                     buyhold_equity=result.buyhold_equity,
                     benchmark_equity=result.benchmark_equity,
-                    per_ticker_equity=result.per_ticker_equity if result.per_ticker_equity else {},
+                    per_ticker_equity=result.per_ticker_equity,
                     metrics=result.metrics,
                     weights=weights_eff,
                     trades=result.trades,
@@ -172,58 +232,88 @@ def run_backtest(config):
             total_combos = len(symbols) * len(params_list)
             completed = 0
 
-            for sym_idx, sym in enumerate(symbols):
-                df = dfs[sym]
-                bh_eq_full = get_buyhold_equity(df["Close"])
-                if bh_eq_full is not None:
-                    bh_eq_full.name = f"{sym} Buy & Hold"
-
-                for params in params_list:
-                    res = run_symbol(
-                        df,
-                        rsi_period=params["rsi_period"],
-                        rsi_buy_below=params.get("rsi_buy_below"),
-                        rsi_sell_above=params.get("rsi_sell_above"),
-                        rsi_bb_period=params.get("rsi_bb_period"),
-                        rsi_bb_std_dev=params.get("rsi_bb_std_dev"),
-                        use_rsi_bb=params.get("use_rsi_bb", False)
+            # Grid runs on a process pool (GRID_WORKERS); results arrive in symbol/plan order.
+            # GRID_METRICS_ONLY sweeps KPIs only and re-runs the top combos for curves/trades.
+            # SEARCH_MODE="halving" prunes the grid on growing prefixes and only runs survivors in full.
+            def _report_halving(sym, stats):
+                nonlocal total_combos
+                total_combos -= len(params_list) - len(stats["survivors"])
+                log_progress('running', 20 + int((completed / max(total_combos, 1)) * 70),
+                             f'{sym}: {len(stats["survivors"])}/{len(params_list)} combos survived halving, '
+                             f'{stats["saved_pct"]:.0%} bar-evaluations saved')
+
+            # WALK_FORWARD optimizes on rolling train windows; one stitched out-of-sample row per symbol.
+            if _bool(CONFIG.get("WALK_FORWARD"), False):
+                total_combos = len(symbols)
+                results = iter_walk_forward(dfs, symbols, params_list)
+            elif str(CONFIG.get("SEARCH_MODE", "grid")).lower() == "halving":
+                results = iter_halving(dfs, symbols, params_list, report=_report_halving)
+            elif _bool(CONFIG.get("GRID_METRICS_ONLY"), False):
+                results = iter_grid_top(dfs, symbols, params_list)
+            elif db_file and (_bool(CONFIG.get("SAVE_ENGINE_STATE"), False) or CONFIG.get("RESUME_FROM_RUN")):
+                # Engine state per (symbol, params): RESUME_FROM_RUN continues that run's saved states
+                # with only the new bars, SAVE_ENGINE_STATE stores this run's for the next one.
+                resume_from = CONFIG.get("RESUME_FROM_RUN")
+                results = iter_resume(
+                    dfs, symbols, params_list,
+                    load_state=(lambda sym, p: bt_db.load_engine_state(db_file, resume_from, sym, p))
+                    if resume_from else None,
+                    save_state=(lambda sym, p, st: bt_db.save_engine_state(db_file, run_id, sym, p, st))
+                    if _bool(CONFIG.get("SAVE_ENGINE_STATE"), False) else None,
+                )
+            else:
+                results = iter_grid(dfs, symbols, params_list)
+            bh_by_sym = {}
+            for sym, params, res in results:
+                if sym not in bh_by_sym:
+                    bh_eq_full = get_buyhold_equity(dfs[sym]["Close"])
+                    if bh_eq_full is not None:
+                        bh_eq_full.name = f"{sym} Buy & Hold"
+                    bh_by_sym[sym] = bh_eq_full
+                bh_eq_full = bh_by_sym[sym]
+
+                m = res["metrics"]
+                if _bool(CONFIG.get("MONTE_CARLO"), False) and res.get("round_trip_pnls"):
+                    years = (m["bars"] - 1) / float(CONFIG.get("PERIODS_PER_YEAR", 252))
+                    m.update(mc_metrics(monte_carlo(res["round_trip_pnls"], years=years)))
+                strat_eq = res["equity"]
+                events = res.get("events")
+                extras = summarize_comparisons(strat_eq, bench_eq_full, bh_eq_full, index=dfs[sym].index)
+
+                if CONFIG.get("SAVE_METRICS", True):
+                    out_csv = write_metrics_csv(
+                        run_id, sym, CONFIG, m, params,
+                        out_dir=CONFIG.get("CSV_DIR"),
+                        extras=extras
                     )
-                    m = res["metrics"]
-                    strat_eq = res["equity"]
-                    events = res.get("events")
-                    extras = summarize_comparisons(strat_eq, bench_eq_full, bh_eq_full)
-
-                    if CONFIG.get("SAVE_METRICS", True):
-                        out_csv = write_metrics_csv(
-                            run_id, sym, CONFIG, m, params,
-                            out_dir=CONFIG.get("CSV_DIR"),
-                            extras=extras
-                        )
-
-                    # Merge buy & hold comparison metrics
-                    m_with_comparisons = {**m, **extras}
-
-                    # Save to database
-                    if db_file:
+
+                # Merge buy & hold comparison metrics
+                m_with_comparisons = {**m, **extras}
+
+                # Save to database
+                if db_file:
+                    # metrics-only combos have no curve
+                    equity_json = None
+                    if strat_eq is not None:
                         strat_eq.name = f"{sym} Strategy"
                         equity_json = strat_eq.to_json(orient='split', date_format='iso')
-                        buyhold_json = None
-                        if bh_eq_full is not None:
-                            buyhold_json = bh_eq_full.to_json(orient='split', date_format='iso')
-                        events_json = None
-                        if events:
-                            events_json = json.dumps(events, default=str)
-                        
-                        bt_db.insert_strategy_metrics(
-                            db_file, run_id, sym, params, m_with_comparisons,
-                            equity_json=equity_json,
-                            events_json=events_json,
-                            buyhold_json=buyhold_json
-                        )
-
-                    completed += 1
-                    progress = 20 + int((completed / total_combos) * 70)
-                    log_progress('running', progress, f'Processing {sym} ({completed}/{total_combos})...')
+                    buyhold_json = None
+                    if bh_eq_full is not None:
+                        buyhold_json = bh_eq_full.to_json(orient='split', date_format='iso')
+                    events_json = None
+                    if events:
+                        events_json = json.dumps(events, default=str)
+                    
+                    bt_db.insert_strategy_metrics(
+                        db_file, run_id, sym, params, m_with_comparisons,
+                        equity_json=equity_json,
+                        events_json=events_json,
+                        buyhold_json=buyhold_json
+                    )
+
+                completed += 1
+                progress = 20 + int((completed / total_combos) * 70)
+                log_progress('running', progress, f'Processing {sym} ({completed}/{total_combos})...')
 
         # Finalize
         if db_file: